@@ -1,6 +1,7 @@
 # app_window.py
 
 import logging
+import re
 import time
 import os
 from urllib.parse import urlparse
@@ -12,29 +13,50 @@ from PyQt6.QtWidgets import (
     QLineEdit,
     QPushButton,
     QMessageBox,
-    QTextEdit,
     QSplitter,
     QTreeWidget,
     QTreeWidgetItem,
+    QTreeView,
     QHeaderView,
     QStatusBar,
     QMenu,
     QFileDialog,
-    QTreeWidgetItemIterator,
     QCheckBox,
     QApplication,
     QFrame,
     QStyle,
     QLabel,
     QProgressBar,
+    QSpinBox,
+    QInputDialog,
 )
-from PyQt6.QtCore import QThread, QSettings, QDir, Qt, QPoint
+from PyQt6.QtCore import QSettings, QDir, Qt, QPoint
 from PyQt6.QtGui import QFont, QBrush, QColor
 
-from worker import Worker
+import bandwidth
+from sniff_records import SniffRecord
+from log_console import LogConsole
+from progress import format_bytes, format_eta, format_speed
+from resource_model import ResourceModel, ResourceModelCache
+from task_store import TaskStore
+from worker_pool import WorkerPool
+from task_scheduler import (
+    TaskScheduler,
+    DEFAULT_MAX_CONCURRENT,
+    DEFAULT_PER_HOST_LIMIT,
+    DEFAULT_SNIFF_CONCURRENT,
+)
 
 logger = logging.getLogger(__name__)
 
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>]+")
+
+
+def extract_urls(text):
+    """从任意文本中提取 URL (按出现顺序去重)。"""
+    urls = (url.rstrip(".,;:!?)]}，。；") for url in URL_PATTERN.findall(text))
+    return list(dict.fromkeys(urls))
+
 
 class AppWindow(QMainWindow):
     """
@@ -46,28 +68,48 @@ class AppWindow(QMainWindow):
         self.setWindowTitle("Resource Sniffer GUI")
         self.setGeometry(100, 100, 1200, 800)
 
-        self.download_queue = []
-        self.worker_thread = None
-        self.worker = None
-        self.is_busy = False
+        self.worker_pool = WorkerPool(self)
+        self.download_scheduler = TaskScheduler(
+            "download", pool=self.worker_pool, parent=self
+        )
+        self.download_items = {}
+        self.downloads_cancelled = False
+        self.sniff_scheduler = TaskScheduler(
+            "sniff",
+            max_concurrent=DEFAULT_SNIFF_CONCURRENT,
+            pool=self.worker_pool,
+            parent=self,
+        )
+        self.sniff_jobs = {}
         self.settings = QSettings("MyCompany", "UltimateSnifferGUI")
         self.current_task_data = {}
         self.current_download_base_url = ""
+        self.task_store = TaskStore()
+        # restoring: 正在从任务库恢复界面，不回写；closing: 正在退出，中断产生的结果不写入
+        self.restoring = False
+        self.closing = False
 
         self.setup_ui()
         self.connect_signals()
         self.load_settings()
-        self.set_controls_for_idle()
+        self.update_sniff_controls()
+        self.restore_session()
 
     def setup_ui(self):
         """使用纯Python代码构建UI界面"""
         self.url_input = QLineEdit()
-        self.url_input.setPlaceholderText("在此处粘贴要嗅探的URL")
+        self.url_input.setPlaceholderText("在此处粘贴要嗅探的URL (可粘贴多个)")
         self.url_input.setFont(QFont("Segoe UI", 10))
 
         self.sniff_button = QPushButton(" 嗅探资源")
         self.sniff_button.setObjectName("SniffButton")
 
+        self.batch_button = QPushButton(" 批量...")
+        batch_menu = QMenu(self.batch_button)
+        self.paste_urls_action = batch_menu.addAction("粘贴多个URL...")
+        self.import_urls_action = batch_menu.addAction("从文件导入...")
+        self.batch_button.setMenu(batch_menu)
+
         self.task_tree = QTreeWidget()
         self.task_tree.setHeaderLabels(["任务URL", "标题"])
         self.task_tree.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
@@ -76,28 +118,37 @@ class AppWindow(QMainWindow):
         )
         self.task_tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
 
-        self.resource_tree = QTreeWidget()
-        self.resource_tree.setHeaderLabels(
-            ["资源/格式", "类型/编码", "分辨率", "大小", "链接/备注"]
-        )
-        self.resource_tree.header().setSectionResizeMode(
+        self.resource_filter_input = QLineEdit()
+        self.resource_filter_input.setPlaceholderText("筛选资源 (文件名/链接/格式)")
+        self.resource_filter_input.setClearButtonEnabled(True)
+
+        self.empty_resource_model = ResourceModel()
+        self.resource_view = QTreeView()
+        self.resource_view.setModel(self.empty_resource_model)
+        self.empty_resource_model.modelReset.connect(self.expand_resource_groups)
+        self.resource_view.setUniformRowHeights(True)
+        # 按内容调整列宽时只测量前若干行，避免大列表每次切换都遍历上千行
+        self.resource_view.header().setResizeContentsPrecision(100)
+        self.resource_view.header().setSectionResizeMode(
             0, QHeaderView.ResizeMode.Stretch
         )
-        self.resource_tree.header().setSectionResizeMode(
+        self.resource_view.header().setSectionResizeMode(
             1, QHeaderView.ResizeMode.Stretch
         )
-        self.resource_tree.header().setSectionResizeMode(
+        self.resource_view.header().setSectionResizeMode(
             2, QHeaderView.ResizeMode.ResizeToContents
         )
-        self.resource_tree.setSelectionMode(QTreeWidget.SelectionMode.ExtendedSelection)
+        # 初始不排序 (保持嗅探结果的原始顺序)，点击表头后在模型内排序
+        self.resource_view.header().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.resource_view.setSortingEnabled(True)
+        self.resource_view.setSelectionMode(QTreeView.SelectionMode.ExtendedSelection)
+        self.resource_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
 
         self.path_input = QLineEdit()
         self.path_input.setReadOnly(True)
         self.browse_button = QPushButton(" 浏览...")
 
-        self.log_output = QTextEdit()
-        self.log_output.setReadOnly(True)
-        self.log_output.setFont(QFont("Courier New", 9))
+        self.log_output = LogConsole()
 
         self.merge_audio_checkbox = QCheckBox("自动合并最佳音轨")
         self.merge_audio_checkbox.setChecked(True)
@@ -105,12 +156,50 @@ class AppWindow(QMainWindow):
             "勾选后，仅需选择视频流，程序将为每个视频流自动匹配最佳音轨进行合并。\n对直接下载链接无效。"
         )
 
+        self.remux_hls_checkbox = QCheckBox("HLS转封装为MP4")
+        self.remux_hls_checkbox.setToolTip(
+            "勾选后，m3u8 流下载完成后将使用 ffmpeg 转封装为 mp4 文件。"
+        )
+
         self.download_button = QPushButton(" 下载选中项")
         self.download_button.setObjectName("StartButton")
 
-        self.stop_button = QPushButton(" 停止操作")
+        self.stop_button = QPushButton(" 停止嗅探")
         self.stop_button.setObjectName("StopButton")
 
+        self.max_downloads_spinbox = QSpinBox()
+        self.max_downloads_spinbox.setRange(1, 16)
+        self.max_downloads_spinbox.setToolTip("同时进行的下载任务数")
+        self.per_host_spinbox = QSpinBox()
+        self.per_host_spinbox.setRange(1, 8)
+        self.per_host_spinbox.setToolTip("同一站点同时进行的下载任务数")
+        self.bandwidth_spinbox = QSpinBox()
+        self.bandwidth_spinbox.setRange(0, 1000000)
+        self.bandwidth_spinbox.setSingleStep(100)
+        self.bandwidth_spinbox.setSuffix(" KB/s")
+        self.bandwidth_spinbox.setSpecialValueText("不限速")
+        self.bandwidth_spinbox.setToolTip(
+            "所有下载共享的总带宽上限，运行中修改立即生效。\n有嗅探进行时会为其预留一部分带宽。"
+        )
+
+        self.cancel_downloads_button = QPushButton(" 取消全部下载")
+        self.cancel_downloads_button.setObjectName("StopButton")
+
+        self.download_tree = QTreeWidget()
+        self.download_tree.setHeaderLabels(["下载任务", "状态", "进度", "速度", "剩余"])
+        self.download_tree.header().setSectionResizeMode(
+            0, QHeaderView.ResizeMode.Stretch
+        )
+        self.download_tree.header().setSectionResizeMode(
+            1, QHeaderView.ResizeMode.ResizeToContents
+        )
+        for column in (2, 3, 4):
+            self.download_tree.header().setSectionResizeMode(
+                column, QHeaderView.ResizeMode.ResizeToContents
+            )
+        self.download_tree.setRootIsDecorated(False)
+        self.download_tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
@@ -125,9 +214,18 @@ class AppWindow(QMainWindow):
             style.standardIcon(QStyle.StandardPixmap.SP_ArrowDown)
         )
         self.stop_button.setIcon(style.standardIcon(QStyle.StandardPixmap.SP_MediaStop))
+        self.cancel_downloads_button.setIcon(
+            style.standardIcon(QStyle.StandardPixmap.SP_MediaStop)
+        )
         self.browse_button.setIcon(
             style.standardIcon(QStyle.StandardPixmap.SP_DirOpenIcon)
         )
+        self.resource_models = ResourceModelCache(
+            {
+                "video": style.standardIcon(QStyle.StandardPixmap.SP_MediaPlay),
+                "audio": style.standardIcon(QStyle.StandardPixmap.SP_MediaVolume),
+            }
+        )
 
         url_frame = QFrame()
         url_frame.setObjectName("UrlFrame")
@@ -136,6 +234,8 @@ class AppWindow(QMainWindow):
         url_layout.addWidget(QLabel("URL:"))
         url_layout.addWidget(self.url_input, 1)
         url_layout.addWidget(self.sniff_button)
+        url_layout.addWidget(self.batch_button)
+        url_layout.addWidget(self.stop_button)
 
         download_frame = QFrame()
         download_frame.setObjectName("DownloadFrame")
@@ -149,9 +249,16 @@ class AppWindow(QMainWindow):
 
         action_layout = QHBoxLayout()
         action_layout.addWidget(self.merge_audio_checkbox)
+        action_layout.addWidget(self.remux_hls_checkbox)
         action_layout.addStretch()
+        action_layout.addWidget(QLabel("并发:"))
+        action_layout.addWidget(self.max_downloads_spinbox)
+        action_layout.addWidget(QLabel("单站点:"))
+        action_layout.addWidget(self.per_host_spinbox)
+        action_layout.addWidget(QLabel("限速:"))
+        action_layout.addWidget(self.bandwidth_spinbox)
         action_layout.addWidget(self.download_button)
-        action_layout.addWidget(self.stop_button)
+        action_layout.addWidget(self.cancel_downloads_button)
 
         download_layout.addLayout(path_layout)
         download_layout.addLayout(action_layout)
@@ -167,9 +274,15 @@ class AppWindow(QMainWindow):
         right_panel = QWidget()
         right_layout = QVBoxLayout(right_panel)
         right_layout.setContentsMargins(5, 0, 0, 0)
-        right_layout.addWidget(QLabel("资源详情:"))
-        right_layout.addWidget(self.resource_tree)
+        resource_header_layout = QHBoxLayout()
+        resource_header_layout.addWidget(QLabel("资源详情:"))
+        resource_header_layout.addStretch()
+        resource_header_layout.addWidget(self.resource_filter_input, 1)
+        right_layout.addLayout(resource_header_layout)
+        right_layout.addWidget(self.resource_view, 3)
         right_layout.addWidget(download_frame)
+        right_layout.addWidget(QLabel("下载队列:"))
+        right_layout.addWidget(self.download_tree, 1)
 
         main_splitter = QSplitter(Qt.Orientation.Horizontal)
         main_splitter.addWidget(left_panel)
@@ -192,132 +305,196 @@ class AppWindow(QMainWindow):
         self.sniff_button.clicked.connect(self.start_sniffing)
         self.url_input.returnPressed.connect(self.start_sniffing)
         self.task_tree.currentItemChanged.connect(self.display_resources)
+        self.task_tree.itemDoubleClicked.connect(self.expand_playlist_entry)
         self.task_tree.customContextMenuRequested.connect(self.show_task_context_menu)
+        self.resource_filter_input.textChanged.connect(self.filter_resources)
+        self.resource_view.customContextMenuRequested.connect(
+            self.show_resource_context_menu
+        )
         self.browse_button.clicked.connect(self.browse_path)
         self.download_button.clicked.connect(self.prepare_downloads)
         self.stop_button.clicked.connect(self.stop_task)
+        self.cancel_downloads_button.clicked.connect(self.cancel_all_downloads)
+        self.download_tree.customContextMenuRequested.connect(
+            self.show_download_context_menu
+        )
+        self.max_downloads_spinbox.valueChanged.connect(self.apply_download_limits)
+        self.per_host_spinbox.valueChanged.connect(self.apply_download_limits)
+        self.bandwidth_spinbox.valueChanged.connect(self.apply_bandwidth_limit)
+
+        self.download_scheduler.job_queued.connect(self.on_download_queued)
+        self.download_scheduler.job_started.connect(self.on_download_started)
+        self.download_scheduler.job_progress.connect(self.on_download_progress)
+        self.download_scheduler.job_finished.connect(self.on_download_finished)
+        self.download_scheduler.log.connect(
+            self.log_output.write, Qt.ConnectionType.DirectConnection
+        )
+        self.download_scheduler.idle.connect(self.on_downloads_idle)
+
+        self.paste_urls_action.triggered.connect(self.paste_multiple_urls)
+        self.import_urls_action.triggered.connect(self.import_urls_from_file)
+        self.sniff_scheduler.job_queued.connect(self.on_sniff_queued)
+        self.sniff_scheduler.job_started.connect(self.on_sniff_started)
+        self.sniff_scheduler.job_finished.connect(self.on_sniff_job_finished)
+        self.sniff_scheduler.log.connect(
+            self.log_output.write, Qt.ConnectionType.DirectConnection
+        )
 
-    def start_task(self, task_type, **kwargs):
-        """统一的线程启动器，管理线程生命周期。"""
-        if self.is_busy and self.worker_thread is not None:
-            self.log_output.append("<font color='orange'>警告：已有任务在运行。</font>")
+    def start_sniffing(self):
+        urls = extract_urls(self.url_input.text())
+        if not urls:
             return
+        self.url_input.clear()
+        self.sniff_urls(urls)
 
-        self.is_busy = True
-        if task_type == "sniff":
-            self.set_controls_for_busy("正在嗅探...")
-
-        self.worker_thread = QThread()
-        self.worker = Worker(task_type, **kwargs)
-        self.worker.moveToThread(self.worker_thread)
-
-        self.worker.sniff_finished.connect(self.on_sniff_finished)
-        self.worker.download_progress.connect(self.update_progress)
-        self.worker.download_finished.connect(self.on_single_download_finished)
-        self.worker.log.connect(self.log_output.append)
-
-        self.worker_thread.started.connect(self.worker.run)
-
-        self.worker.sniff_finished.connect(self.worker_thread.quit)
-        self.worker.download_finished.connect(self.worker_thread.quit)
-
-        self.worker_thread.finished.connect(self.worker.deleteLater)
-        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
-        self.worker_thread.finished.connect(self.on_thread_finished)
+    def paste_multiple_urls(self):
+        text, ok = QInputDialog.getMultiLineText(
+            self, "批量嗅探", "每行一个URL (也可以直接粘贴包含链接的文本):"
+        )
+        if ok:
+            self.sniff_urls(extract_urls(text))
 
-        self.worker_thread.start()
+    def import_urls_from_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "导入URL列表", QDir.homePath(), "文本文件 (*.txt *.csv);;所有文件 (*)"
+        )
+        if not path:
+            return
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                urls = extract_urls(f.read())
+        except OSError as e:
+            QMessageBox.warning(self, "导入失败", f"无法读取文件: {e}")
+            return
+        if not urls:
+            QMessageBox.warning(self, "提示", "文件中没有找到URL。")
+            return
+        self.sniff_urls(urls)
+
+    def sniff_urls(self, urls):
+        if len(urls) > 1:
+            self.log_output.append(f"<b>批量嗅探 {len(urls)} 个URL...</b>")
+        for url in urls:
+            self.sniff_url(url, select=len(urls) == 1)
+
+    def sniff_url(self, url, force=False, select=False):
+        """把一个 URL 交给嗅探调度器，结果到达前先在任务列表中占位。"""
+        if url in self.sniff_jobs:
+            self.statusBar().showMessage(f"该URL已在嗅探队列中: {url}", 3000)
+            return
+        self.log_output.append(
+            f"<b>{'强制重新嗅探' if force else '开始嗅探'}: {url}</b>"
+        )
+        task_item = self.find_task_item(url) or QTreeWidgetItem(self.task_tree, [url])
+        task_item.setText(1, "等待嗅探...")
+        task_item.setForeground(1, QBrush(QColor("#6d7789")))
+        if select:
+            self.task_tree.setCurrentItem(task_item)
+        self.task_store.add_task(url)
+        self.sniff_scheduler.submit({"url": url, "force": force}, url=url)
+
+    def on_sniff_queued(self, job):
+        self.sniff_jobs[job.kwargs["url"]] = job
+        self.update_sniff_controls()
+
+    def on_sniff_started(self, job):
+        job.worker.sniff_finished.connect(self.on_sniff_finished)
+        job.worker.sniff_cached.connect(self.on_sniff_finished)
+        job.worker.sniff_entry.connect(self.on_sniff_entry)
+        if task_item := self.find_task_item(job.kwargs["url"]):
+            task_item.setText(1, "正在嗅探...")
+        self.update_sniff_controls()
+
+    def on_sniff_job_finished(self, job):
+        url = job.kwargs["url"]
+        self.sniff_jobs.pop(url, None)
+        if job.status == "cancelled" and url not in self.current_task_data:
+            if task_item := self.find_task_item(url):
+                task_item.setText(1, "[已取消]")
+            self.task_store.remove_tasks([url])
+        self.update_sniff_controls()
+
+    def find_task_item(self, url):
+        existing_items = self.task_tree.findItems(
+            url, Qt.MatchFlag.MatchExactly | Qt.MatchFlag.MatchRecursive, 0
+        )
+        return existing_items[0] if existing_items else None
 
-    def start_sniffing(self):
-        url = self.url_input.text().strip()
-        if not url:
+    def on_sniff_entry(self, entry, playlist_url):
+        """播放列表条目逐条到达，作为可按需展开的子任务加入任务列表。"""
+        if not entry.get("url"):
             return
-        self.log_output.append(f"<b>开始嗅探: {url}</b>")
-        self.url_input.clear()
-        self.start_task("sniff", url=url)
+        playlist_item = self.find_task_item(playlist_url)
+        if playlist_item is None:
+            playlist_item = QTreeWidgetItem(
+                self.task_tree, [playlist_url, "正在展开播放列表..."]
+            )
+        if entry["url"] in self.current_task_data:
+            return
+        entry_item = QTreeWidgetItem(
+            playlist_item, [entry["url"], entry.get("title", "")]
+        )
+        entry_item.setForeground(1, QBrush(QColor("#6d7789")))
+        entry_item.setToolTip(0, "双击解析此条目的全部格式")
+        record = SniffRecord.from_playlist_entry(entry)
+        self.current_task_data[entry["url"]] = record
+        if not self.restoring:
+            self.task_store.save_task(entry["url"], record, parent_url=playlist_url)
+        playlist_item.setExpanded(True)
+
+    def expand_playlist_entry(self, item, column):
+        url = item.text(0)
+        record = self.current_task_data.get(url)
+        if not record or record.engine != "yt-dlp-entry":
+            return
+        self.log_output.append(f"<b>展开播放列表条目: {url}</b>")
+        self.sniff_url(url, select=True)
 
-    def on_sniff_finished(self, data, url):
+    def on_sniff_finished(self, record, url):
         """这个槽只负责处理嗅探结果的UI更新。"""
-        existing_items = self.task_tree.findItems(url, Qt.MatchFlag.MatchExactly, 0)
-        task_item = (
-            existing_items[0] if existing_items else QTreeWidgetItem(self.task_tree)
-        )
+        existing_item = self.find_task_item(url)
+        task_item = existing_item or QTreeWidgetItem(self.task_tree)
         task_item.setText(0, url)
-        self.current_task_data[url] = data
-        if data.get("error"):
-            task_item.setText(1, f"[嗅探失败] {data['error']}")
+        self.current_task_data[url] = record
+        if not self.restoring and not self.closing:
+            self.task_store.save_task(url, record)
+        if record.error:
+            task_item.setText(1, f"[嗅探失败] {record.error}")
             task_item.setForeground(1, QBrush(QColor("#ffc107")))
+        elif record.engine == "yt-dlp-playlist":
+            task_item.setText(
+                1,
+                f"[播放列表] {record.title} ({record.entry_count} 项)",
+            )
+            task_item.setForeground(1, QBrush(self.palette().text().color()))
         else:
-            task_item.setText(1, data.get("title", "无标题"))
+            task_item.setText(1, record.title)
             task_item.setForeground(1, QBrush(self.palette().text().color()))
-        if not existing_items:
+        if not existing_item:
             self.task_tree.addTopLevelItem(task_item)
-        self.task_tree.setCurrentItem(task_item)
-
-    def on_single_download_finished(self, success, message):
-        """这个槽只负责记录下载结果的日志。"""
-        is_cancelled = "被用户取消" in message
-        if not is_cancelled:
-            if success:
-                self.log_output.append(f"<font color='#98c379'>项目下载成功。</font>")
-            else:
-                self.log_output.append(
-                    f"<font color='#e06c75'>项目下载失败: {message}</font>"
-                )
-        else:
-            self.download_queue.clear()  # 如果是取消，则清空队列
-            self.log_output.append(
-                "<font color='orange'><b>下载队列已清空，操作被用户取消。</b></font>"
-            )
-
-    def on_thread_finished(self):
-        """当一个 worker 线程确认完全结束后，此槽被调用。"""
-        # 清理对旧 worker 和 thread 的引用
-        self.clear_worker_references()
-
-        if self.download_queue:
-            self.process_next_in_queue()
-        else:
-            if self.is_busy:
-                was_download_task = (
-                    self.progress_bar.value() > 0
-                    or "下载" in self.statusBar().currentMessage()
-                )
-                was_cancelled = self.stop_button.text() == "正在停止..."
-
-                if was_download_task and not was_cancelled:
-                    self.log_output.append(
-                        "<font color='#98c379'><b>所有下载任务已处理完毕！</b></font>"
-                    )
-                    QMessageBox.information(self, "完成", "所有下载任务已处理完毕！")
-
-            self.is_busy = False
-            self.set_controls_for_idle()
+        if self.task_tree.currentItem() is task_item:
+            # 当前项的结果到达或被更新时，当前项不变，需要手动刷新资源列表
+            self.display_resources(task_item, None)
+        elif self.task_tree.currentItem() is None:
+            # 批量嗅探时不打断用户当前查看的任务
+            self.task_tree.setCurrentItem(task_item)
 
     def prepare_downloads(self):
-        if self.is_busy:
-            return
         current_task_item = self.task_tree.currentItem()
         if not current_task_item:
             QMessageBox.warning(self, "提示", "请先在左侧选择一个任务。")
             return
 
         self.current_download_base_url = current_task_item.text(0)
-        self.download_queue.clear()
+        download_queue = []
 
         checked_directs = []
         checked_yt_dlp_items = []
-        iterator = QTreeWidgetItemIterator(self.resource_tree)
-        while iterator.value():
-            item = iterator.value()
-            if item.checkState(0) == Qt.CheckState.Checked:
-                data = item.data(0, Qt.ItemDataRole.UserRole)
-                if not data:
-                    continue
-                if data["type"] == "direct":
-                    checked_directs.append(data)
-                elif data["type"] == "yt-dlp":
-                    checked_yt_dlp_items.append(data)
-            iterator += 1
+        for data in self.resource_view.model().checked_payloads():
+            if data["type"] == "direct":
+                checked_directs.append(data)
+            elif data["type"] == "yt-dlp":
+                checked_yt_dlp_items.append(data)
 
         if self.merge_audio_checkbox.isChecked():
             for item_data in checked_yt_dlp_items:
@@ -327,217 +504,448 @@ class AppWindow(QMainWindow):
                     "is_audio_only", False
                 ):
                     if is_video_stream:
-                        self.download_queue.append(
+                        download_queue.append(
                             {
                                 "type": "yt-dlp",
                                 "format_id": f"{item_data['format_id']}+bestaudio",
                             }
                         )
                     else:  # 混合流
-                        self.download_queue.append(
+                        download_queue.append(
                             {"type": "yt-dlp", "format_id": item_data["format_id"]}
                         )
         else:
             for item_data in checked_yt_dlp_items:
-                self.download_queue.append(
+                download_queue.append(
                     {"type": "yt-dlp", "format_id": item_data["format_id"]}
                 )
 
-        self.download_queue.extend(checked_directs)
+        download_queue.extend(checked_directs)
 
         unique_tasks = []
         seen_tasks = set()
-        for task in self.download_queue:
+        for task in download_queue:
             task_repr = frozenset(task.items())
             if task_repr not in seen_tasks:
                 unique_tasks.append(task)
                 seen_tasks.add(task_repr)
-        self.download_queue = unique_tasks
 
-        if not self.download_queue:
+        if not unique_tasks:
             QMessageBox.warning(self, "提示", "请在资源列表中勾选要下载的项目。")
             return
 
-        self.log_output.append(f"<b>准备下载 {len(self.download_queue)} 个项目...</b>")
-        self.process_next_in_queue()
-
-    def process_next_in_queue(self):
-        if not self.download_queue:
-            # 这个检查是冗余的，因为 on_thread_finished 会处理，但保留无害
-            if self.is_busy:
-                self.is_busy = False
-                self.set_controls_for_idle()
-            return
-
-        task = self.download_queue.pop(0)
-        self.set_controls_for_busy(
-            f"正在下载 (队列剩余 {len(self.download_queue)} 个)..."
-        )
-
-        worker_kwargs = {}
         download_dir = self.path_input.text()
         if not os.path.exists(download_dir):
             try:
                 os.makedirs(download_dir)
             except OSError as e:
                 self.log_output.append(
-                    f"<font color='red'>错误：无法创建下载目录: {e}</font>"
+                    f"<font color='red'>错误：无法创建下载目录: {e}</font>",
+                    logging.ERROR,
                 )
-                if self.worker_thread:
-                    self.worker_thread.quit()  # 触发 on_thread_finished
                 return
 
+        self.log_output.append(f"<b>准备下载 {len(unique_tasks)} 个项目...</b>")
+        if not self.download_scheduler.has_active_jobs():
+            self.downloads_cancelled = False
+            self.progress_bar.setValue(0)
+        for task in unique_tasks:
+            self.submit_download(task, download_dir)
+
+    def submit_download(self, task, download_dir, priority=0):
+        """把一个勾选的资源转换为下载任务并交给调度器。"""
         if task["type"] == "direct":
             filename = (
                 os.path.basename(urlparse(task["url"]).path)
                 or f"download_{int(time.time())}"
             )
-            filepath = os.path.join(download_dir, filename)
-            worker_kwargs.update(
-                {
-                    "resource_type": "direct",
-                    "direct_url": task["url"],
-                    "download_path": filepath,
-                }
+            is_hls = filename.lower().endswith(".m3u8")
+            if is_hls:
+                filename = os.path.splitext(filename)[0] + ".ts"
+            download_path = self.unique_download_path(
+                os.path.join(download_dir, filename)
             )
-            self.log_output.append(f"<b>开始直接下载: {task['url']}</b>")
+            filename = os.path.basename(download_path)
+            worker_kwargs = {
+                "resource_type": "hls" if is_hls else "direct",
+                "direct_url": task["url"],
+                "download_path": download_path,
+                "remux": self.remux_hls_checkbox.isChecked(),
+                "size": task.get("size"),
+                "digest": task.get("digest"),
+            }
+            label = filename
         else:
-            worker_kwargs.update(
-                {
-                    "resource_type": "yt-dlp",
-                    "url": self.current_download_base_url,
-                    "formats": task["format_id"],
-                    "download_path": download_dir,
-                }
-            )
-            self.log_output.append(
-                f"<b>开始yt-dlp下载: ...，格式: {task['format_id']}</b>"
-            )
+            worker_kwargs = {
+                "resource_type": "yt-dlp",
+                "url": self.current_download_base_url,
+                "formats": task["format_id"],
+                "download_path": download_dir,
+            }
+            label = f"{self.current_download_base_url} [{task['format_id']}]"
+        worker_kwargs["queue_id"] = self.task_store.add_download(
+            worker_kwargs, label, priority
+        )
+        return self.download_scheduler.submit(
+            worker_kwargs, priority=priority, label=label
+        )
 
-        self.start_task("download", **worker_kwargs)
+    def unique_download_path(self, download_path):
+        """
+        并发下载时，同名文件 (如各发布版本都附带的 app.zip、镜像链接) 不能写入同一个
+        .part 文件；已有排队或运行中的任务占用该路径时追加序号。
+        """
+        taken = {
+            os.path.normcase(os.path.abspath(job.kwargs.get("download_path", "")))
+            for job in self.download_scheduler.jobs.values()
+            if job.status in ("queued", "running")
+        }
+        base, ext = os.path.splitext(download_path)
+        candidate = download_path
+        index = 1
+        while os.path.normcase(os.path.abspath(candidate)) in taken:
+            index += 1
+            candidate = f"{base} ({index}){ext}"
+        return candidate
 
     def stop_task(self):
-        if self.worker and self.is_busy:
-            self.log_output.append("<b>[用户操作] 发送停止信号...</b>")
+        if self.sniff_scheduler.has_active_jobs():
+            self.log_output.append("<b>[用户操作] 停止所有嗅探任务...</b>")
             self.stop_button.setEnabled(False)
             self.stop_button.setText("正在停止...")
-            self.worker.stop()
-
-    def clear_worker_references(self):
-        self.worker = None
-        self.worker_thread = None
+            self.sniff_scheduler.cancel_all()
 
     def closeEvent(self, event):
         self.save_settings()
-        if self.worker_thread is not None and self.worker_thread.isRunning():
+        if (
+            self.sniff_scheduler.has_active_jobs()
+            or self.download_scheduler.has_active_jobs()
+        ):
             reply = QMessageBox.question(
                 self,
                 "确认退出",
-                "任务仍在进行中，确定要退出吗？\n程序将尝试安全地停止任务。",
+                "任务仍在进行中，确定要退出吗？\n未完成的下载会在下次启动时继续。",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                 QMessageBox.StandardButton.No,
             )
-            if reply == QMessageBox.StandardButton.Yes:
-                self.log_output.append("<b>[程序关闭] 正在停止后台任务...</b>")
-                if self.worker:
-                    self.stop_task()
-                if not self.worker_thread.wait(5000):
-                    self.log_output.append(
-                        "<font color='red'>警告：线程在5秒内未响应退出，程序将强制关闭。</font>"
-                    )
-                else:
-                    self.log_output.append("后台任务已安全停止。")
-                event.accept()
-            else:
+            if reply != QMessageBox.StandardButton.Yes:
                 event.ignore()
+                return
+            self.log_output.append("<b>[程序关闭] 正在停止后台任务...</b>")
+        self.closing = True
+        # 排队和运行中的任务都留在任务库中，下次启动时恢复
+        self.sniff_scheduler.interrupt_all()
+        self.download_scheduler.interrupt_all()
+        if not self.worker_pool.shutdown(5000):
+            self.log_output.append(
+                "<font color='red'>警告：线程在5秒内未响应退出，程序将强制关闭。</font>",
+                logging.WARNING,
+            )
         else:
-            super().closeEvent(event)
+            self.log_output.append("后台任务已安全停止。")
+        # 处理停止前已经发出的结束信号，让刚好完成的下载从队列中移除
+        QApplication.processEvents()
+        self.task_store.mark_interrupted()
+        super().closeEvent(event)
+
+    def restore_session(self):
+        """恢复上次退出 (或崩溃) 时的任务列表和下载队列；已有结果的任务不重新嗅探。"""
+        tasks = self.task_store.load_tasks()
+        downloads = self.task_store.load_downloads()
+        unfinished = []
+        self.restoring = True
+        try:
+            for url, parent_url, record in tasks:
+                if parent_url:
+                    title = record.title if record else ""
+                    self.on_sniff_entry({"url": url, "title": title}, parent_url)
+                    if record and record.engine != "yt-dlp-entry":
+                        self.on_sniff_finished(record, url)
+                elif record:
+                    self.on_sniff_finished(record, url)
+                else:
+                    unfinished.append(url)
+        finally:
+            self.restoring = False
+        if tasks:
+            self.log_output.append(f"<b>已恢复上次的 {len(tasks)} 个任务。</b>")
+        for url in unfinished:
+            self.sniff_url(url)
+        if downloads:
+            self.log_output.append(
+                f"<b>恢复 {len(downloads)} 个未完成的下载，已下载的部分将继续传输。</b>"
+            )
+            self.downloads_cancelled = False
+        for queue_id, worker_kwargs, label, priority, _ in downloads:
+            worker_kwargs.update(queue_id=queue_id, resume=True)
+            self.download_scheduler.submit(
+                worker_kwargs, priority=priority, label=label
+            )
 
     def display_resources(self, current_item, previous_item):
-        self.resource_tree.clear()
-        if not current_item:
+        url = current_item.text(0) if current_item else None
+        record = self.current_task_data.get(url)
+        if not record or record.error:
+            self.set_resource_model(self.empty_resource_model)
             return
-        url = current_item.text(0)
-        data = self.current_task_data.get(url)
-        if not data or data.get("error"):
+        if record.engine == "yt-dlp-entry":
+            self.statusBar().showMessage("双击该条目以解析可下载的格式。", 3000)
+        self.set_resource_model(self.resource_models.get(url, record))
+
+    def set_resource_model(self, model):
+        """切换资源列表的模型；模型按任务缓存，排序、筛选和勾选状态随模型保留。"""
+        view = self.resource_view
+        if view.model() is model:
             return
-        engine = data.get("engine")
-        if engine == "yt-dlp":
-            self.display_yt_dlp_resources(data)
-        elif engine in ["html", "github_api", "direct_link_checker", "browser"]:
-            self.display_html_resources(data)
+        previous_selection = view.selectionModel()
+        view.model().modelReset.disconnect(self.expand_resource_groups)
+        view.setModel(model)
+        previous_selection.deleteLater()
+        model.set_filter(self.resource_filter_input.text())
+        model.modelReset.connect(self.expand_resource_groups)
+        self.expand_resource_groups()
+
+    def expand_resource_groups(self):
+        # 只有分组一层可展开，逐个展开比 expandAll 少遍历一遍所有子行
+        view = self.resource_view
+        model = view.model()
+        for row in range(model.rowCount()):
+            view.expand(model.index(row, 0))
+
+    def filter_resources(self, text):
+        self.resource_view.model().set_filter(text)
+
+    def show_resource_context_menu(self, position: QPoint):
+        model = self.resource_view.model()
+        if not model.rowCount():
+            return
+        menu = QMenu()
+        selected = self.resource_view.selectionModel().selectedRows(0)
+        check_selected_action = menu.addAction("勾选选中项")
+        uncheck_selected_action = menu.addAction("取消勾选选中项")
+        check_selected_action.setEnabled(bool(selected))
+        uncheck_selected_action.setEnabled(bool(selected))
+        menu.addSeparator()
+        check_all_action = menu.addAction("全部勾选")
+        uncheck_all_action = menu.addAction("全部取消勾选")
+        action = menu.exec(self.resource_view.viewport().mapToGlobal(position))
+        if action == check_selected_action:
+            model.set_checked(selected, True)
+        elif action == uncheck_selected_action:
+            model.set_checked(selected, False)
+        elif action == check_all_action:
+            model.set_all_checked(True)
+        elif action == uncheck_all_action:
+            model.set_all_checked(False)
+
+    def on_download_queued(self, job):
+        item = QTreeWidgetItem(self.download_tree, [job.label, "排队中", "0%"])
+        item.setData(0, Qt.ItemDataRole.UserRole, job.job_id)
+        item.setToolTip(0, job.kwargs.get("direct_url") or job.kwargs.get("url"))
+        self.download_items[job.job_id] = (item, job)
+        self.update_download_status()
+
+    def on_download_started(self, job):
+        self.task_store.update_download(job.kwargs.get("queue_id"), status="running")
+        if entry := self.download_items.get(job.job_id):
+            entry[0].setText(1, "下载中")
+        kind = {"hls": "HLS分片", "direct": "直接", "yt-dlp": "yt-dlp"}.get(
+            job.kwargs.get("resource_type"), ""
+        )
+        self.log_output.append(f"<b>开始{kind}下载: {job.label}</b>")
+        self.update_download_status()
+
+    def on_download_progress(self, job, snapshot):
+        if entry := self.download_items.get(job.job_id):
+            item = entry[0]
+            if snapshot["percent"] is not None:
+                item.setText(2, f"{snapshot['percent']:.0f}%")
+                item.setToolTip(
+                    2,
+                    f"{format_bytes(snapshot['done'])} / {format_bytes(snapshot['total'])}",
+                )
+            else:
+                # 总大小未知时显示已下载量
+                item.setText(2, format_bytes(snapshot["done"]))
+            item.setText(3, format_speed(snapshot["speed"]))
+            item.setToolTip(3, f"平均速度: {format_speed(snapshot['avg_speed'])}")
+            item.setText(4, format_eta(snapshot["eta"]))
+        self.update_download_status()
+
+    def on_download_finished(self, job):
+        """单个下载任务结束 (成功、失败、取消或因退出而中断)。"""
+        queue_id = job.kwargs.get("queue_id")
+        if job.status == "interrupted":
+            self.task_store.update_download(queue_id, status="interrupted")
+        else:
+            self.task_store.remove_download(queue_id)
+        entry = self.download_items.get(job.job_id)
+        if entry:
+            status_text = {
+                "finished": "已完成",
+                "failed": "失败",
+                "cancelled": "已取消",
+                "interrupted": "已中断",
+            }.get(job.status, job.status)
+            entry[0].setText(1, status_text)
+            entry[0].setText(4, "")
+            if job.status == "finished":
+                entry[0].setText(2, "100%")
+                if job.telemetry and job.telemetry["avg_speed"]:
+                    # 完成后速度列显示平均速度
+                    entry[0].setText(3, format_speed(job.telemetry["avg_speed"]))
+                entry[0].setForeground(1, QBrush(QColor("#98c379")))
+            else:
+                entry[0].setText(3, "")
+                entry[0].setForeground(1, QBrush(QColor("#e06c75")))
+            entry[0].setToolTip(1, job.message)
+        if job.status == "finished":
+            self.log_output.append(
+                f"<font color='#98c379'>项目下载成功: {job.label}</font>"
+            )
+        elif job.status == "failed":
+            self.log_output.append(
+                f"<font color='#e06c75'>项目下载失败: {job.label} - {job.message}</font>",
+                logging.ERROR,
+            )
+        self.update_download_status()
 
-    def display_yt_dlp_resources(self, data):
+    def on_downloads_idle(self):
+        if self.closing or not self.download_items:
+            return
+        finished = [
+            job for _, job in self.download_items.values() if job.status == "finished"
+        ]
+        if self.downloads_cancelled:
+            self.log_output.append(
+                "<font color='orange'><b>下载队列已清空，操作被用户取消。</b></font>",
+                logging.WARNING,
+            )
+        elif finished:
+            self.log_output.append(
+                "<font color='#98c379'><b>所有下载任务已处理完毕！</b></font>"
+            )
+            QMessageBox.information(self, "完成", "所有下载任务已处理完毕！")
+        self.downloads_cancelled = False
+        # 本批次结束，下次提交时重新统计总进度
+        self.download_items = {
+            job_id: entry
+            for job_id, entry in self.download_items.items()
+            if entry[1].status in ("queued", "running")
+        }
+        self.update_download_status()
+
+    def update_download_status(self):
+        """根据本批次所有任务的进度更新总进度条和状态栏。"""
+        jobs = [job for _, job in self.download_items.values()]
+        active = bool(jobs) and self.download_scheduler.has_active_jobs()
+        self.cancel_downloads_button.setVisible(active)
+        self.progress_bar.setVisible(active)
+        if not active:
+            if not self.sniff_scheduler.has_active_jobs():
+                self.statusBar().showMessage("准备就绪")
+            return
+        total = sum(
+            100 if job.status in ("finished", "failed", "cancelled") else job.progress
+            for job in jobs
+        )
+        self.progress_bar.setValue(int(total / len(jobs)))
+        if self.sniff_scheduler.has_active_jobs():
+            # 嗅探进行中时状态栏显示嗅探状态
+            return
+        speed = sum(
+            job.telemetry["speed"] or 0
+            for job in self.download_scheduler.running.values()
+            if job.telemetry
+        )
+        self.statusBar().showMessage(
+            f"正在下载: {len(self.download_scheduler.running)} 个进行中，"
+            f"{self.download_scheduler.pending_count()} 个排队中"
+            + (f"，总速度 {format_speed(speed)}" if speed else "")
+        )
+
+    def apply_download_limits(self):
+        self.download_scheduler.set_limits(
+            self.max_downloads_spinbox.value(), self.per_host_spinbox.value()
+        )
+
+    def cancel_all_downloads(self):
+        if not self.download_scheduler.has_active_jobs():
+            return
+        self.log_output.append("<b>[用户操作] 取消全部下载...</b>")
+        self.downloads_cancelled = True
+        self.download_scheduler.cancel_all()
+
+    def show_download_context_menu(self, position: QPoint):
+        item = self.download_tree.itemAt(position)
+        if not item:
+            return
+        job_id = item.data(0, Qt.ItemDataRole.UserRole)
+        entry = self.download_items.get(job_id)
+        active = entry is not None and entry[1].status in ("queued", "running")
+        menu = QMenu()
         style = self.style()
-        video_icon = style.standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
-        audio_icon = style.standardIcon(QStyle.StandardPixmap.SP_MediaVolume)
-        video_root = QTreeWidgetItem(self.resource_tree, ["视频流"])
-        video_root.setIcon(0, video_icon)
-        audio_root = QTreeWidgetItem(self.resource_tree, ["音频流"])
-        audio_root.setIcon(0, audio_icon)
-
-        for f in data.get("formats", []):
-            is_video = f.get("vcodec") != "none"
-            is_audio = f.get("acodec") != "none"
-            is_video_only = is_video and not is_audio
-            is_audio_only = is_audio and not is_video
-
-            filesize_str = "N/A"
-            if f.get("filesize") or f.get("filesize_approx"):
-                filesize = f.get("filesize") or f.get("filesize_approx", 0)
-                filesize_str = f"{filesize / 1024 / 1024:.2f} MB"
-            item_text = [
-                f.get("format_note", f.get("format_id", "N/A")),
-                f"{f.get('vcodec', 'none')} / {f.get('acodec', 'none')}",
-                f.get("resolution", "纯音频"),
-                filesize_str,
-                f.get("ext", "N/A"),
-            ]
-            parent = video_root if is_video else audio_root
-            item = QTreeWidgetItem(parent, item_text)
-            item.setData(
-                0,
-                Qt.ItemDataRole.UserRole,
-                {
-                    "type": "yt-dlp",
-                    "format_id": f.get("format_id"),
-                    "is_video_only": is_video_only,
-                    "is_audio_only": is_audio_only,
-                },
+        cancel_action = menu.addAction(
+            style.standardIcon(QStyle.StandardPixmap.SP_DialogCancelButton),
+            "取消此下载",
+        )
+        cancel_action.setEnabled(active)
+        priority_action = menu.addAction(
+            style.standardIcon(QStyle.StandardPixmap.SP_ArrowUp), "优先下载"
+        )
+        priority_action.setEnabled(active and entry[1].status == "queued")
+        rate_limit_action = menu.addAction("设置此任务限速...")
+        rate_limit_action.setEnabled(active)
+        clear_action = menu.addAction("清除已结束的任务")
+        action = menu.exec(self.download_tree.mapToGlobal(position))
+        if action == cancel_action:
+            self.download_scheduler.cancel(job_id)
+        elif action == priority_action:
+            top = max(
+                (job.priority for _, job in self.download_items.values()), default=0
             )
-            item.setCheckState(0, Qt.CheckState.Unchecked)
-        self.resource_tree.expandAll()
-
-    def display_html_resources(self, data):
-        category_roots = {}
-        for link in data.get("links", []):
-            category_name = link.get("category", "其他")
-            if category_name not in category_roots:
-                category_roots[category_name] = QTreeWidgetItem(
-                    self.resource_tree, [category_name]
-                )
-            filesize_mb = (
-                f"{link.get('size') / 1024 / 1024:.2f} MB"
-                if isinstance(link.get("size"), int)
-                else "未知"
+            self.download_scheduler.set_priority(job_id, top + 1)
+            self.task_store.update_download(
+                entry[1].kwargs.get("queue_id"), priority=top + 1
             )
-            item_text = [
-                link.get("filename", "N/A"),
-                link.get("mime", link.get("ext")),
-                "",
-                filesize_mb,
-                link.get("url"),
-            ]
-            item = QTreeWidgetItem(category_roots[category_name], item_text)
-            item.setCheckState(0, Qt.CheckState.Unchecked)
-            item.setData(
-                0, Qt.ItemDataRole.UserRole, {"type": "direct", "url": link.get("url")}
+        elif action == rate_limit_action:
+            self.set_job_rate_limit(entry[1])
+        elif action == clear_action:
+            for index in reversed(range(self.download_tree.topLevelItemCount())):
+                tree_item = self.download_tree.topLevelItem(index)
+                tree_job_id = tree_item.data(0, Qt.ItemDataRole.UserRole)
+                tree_entry = self.download_items.get(tree_job_id)
+                if tree_entry is None or tree_entry[1].status not in (
+                    "queued",
+                    "running",
+                ):
+                    self.download_tree.takeTopLevelItem(index)
+
+    def apply_bandwidth_limit(self):
+        bandwidth.governor.set_global_rate(self.bandwidth_spinbox.value() * 1024)
+
+    def set_job_rate_limit(self, job):
+        current = job.kwargs.get("rate_limit") or 0
+        value, ok = QInputDialog.getInt(
+            self,
+            "设置任务限速",
+            f"{job.label}\n限速 (KB/s，0 表示只受总限速约束):",
+            current // 1024,
+            0,
+            1000000,
+            100,
+        )
+        if not ok:
+            return
+        rate = value * 1024 or None
+        applied = self.download_scheduler.set_rate_limit(job.job_id, rate)
+        self.task_store.update_download(job.kwargs.get("queue_id"), kwargs=job.kwargs)
+        if not applied:
+            self.log_output.append(
+                f"<font color='orange'>yt-dlp 任务运行中无法修改限速，"
+                f"新的限速将在下次启动时生效: {job.label}</font>",
+                logging.WARNING,
             )
-        self.resource_tree.expandAll()
-
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
-        self.statusBar().showMessage(f"下载进度: {value}%")
 
     def show_task_context_menu(self, position: QPoint):
         item = self.task_tree.itemAt(position)
@@ -552,57 +960,52 @@ class AppWindow(QMainWindow):
         copy_url_action = menu.addAction(
             style.standardIcon(QStyle.StandardPixmap.SP_FileLinkIcon), "复制URL"
         )
+        resniff_action = menu.addAction(
+            style.standardIcon(QStyle.StandardPixmap.SP_BrowserReload), "强制重新嗅探"
+        )
+        sniff_job = self.sniff_jobs.get(item.text(0))
+        resniff_action.setEnabled(sniff_job is None)
+        stop_sniff_action = menu.addAction(
+            style.standardIcon(QStyle.StandardPixmap.SP_MediaStop), "停止嗅探"
+        )
+        stop_sniff_action.setEnabled(sniff_job is not None)
         action = menu.exec(self.task_tree.mapToGlobal(position))
         if action == remove_action:
             self.remove_task(item)
+        elif action == resniff_action:
+            self.sniff_url(item.text(0), force=True, select=True)
+        elif action == stop_sniff_action and sniff_job is not None:
+            self.sniff_scheduler.cancel(sniff_job.job_id)
         elif action == copy_url_action:
             QApplication.clipboard().setText(item.text(0))
             self.statusBar().showMessage("URL已复制到剪贴板", 2000)
 
     def remove_task(self, item):
-        url_to_remove = item.text(0)
-        self.task_tree.takeTopLevelItem(self.task_tree.indexOfTopLevelItem(item))
-        if url_to_remove in self.current_task_data:
-            del self.current_task_data[url_to_remove]
-        self.resource_tree.clear()
-
-    def set_controls_for_idle(self):
-        self.stop_button.setVisible(False)
-        self.sniff_button.setVisible(True)
-        self.download_button.setVisible(True)
-        self.merge_audio_checkbox.setVisible(True)
-        for w in [
-            self.url_input,
-            self.browse_button,
-            self.task_tree,
-            self.resource_tree,
-            self.merge_audio_checkbox,
-            self.sniff_button,
-            self.download_button,
-        ]:
-            w.setEnabled(True)
-        self.statusBar().showMessage("准备就绪")
-        self.progress_bar.setVisible(False)
-        self.stop_button.setText("停止操作")
-
-    def set_controls_for_busy(self, message):
-        self.sniff_button.setVisible(False)
-        self.download_button.setVisible(False)
-        self.merge_audio_checkbox.setVisible(False)
-        self.stop_button.setVisible(True)
-        self.stop_button.setEnabled(True)
-        for w in [
-            self.url_input,
-            self.browse_button,
-            self.task_tree,
-            self.resource_tree,
-            self.sniff_button,
-            self.download_button,
-        ]:
-            w.setEnabled(False)
-        self.statusBar().showMessage(message)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
+        self.set_resource_model(self.empty_resource_model)
+        urls = [item.child(index).text(0) for index in range(item.childCount())]
+        for url in urls + [item.text(0)]:
+            self.current_task_data.pop(url, None)
+            self.resource_models.discard(url)
+        self.task_store.remove_tasks(urls + [item.text(0)])
+        if item.parent():
+            item.parent().removeChild(item)
+        else:
+            self.task_tree.takeTopLevelItem(self.task_tree.indexOfTopLevelItem(item))
+
+    def update_sniff_controls(self):
+        """嗅探在后台并发进行，界面保持可用，只切换停止按钮和状态栏。"""
+        active = self.sniff_scheduler.has_active_jobs()
+        bandwidth.governor.set_interactive(active)
+        self.stop_button.setVisible(active)
+        if not active:
+            self.stop_button.setEnabled(True)
+            self.stop_button.setText("停止嗅探")
+            self.update_download_status()
+            return
+        self.statusBar().showMessage(
+            f"正在嗅探: {len(self.sniff_scheduler.running)} 个进行中，"
+            f"{self.sniff_scheduler.pending_count()} 个排队中"
+        )
 
     def browse_path(self):
         path = QFileDialog.getExistingDirectory(
@@ -617,7 +1020,25 @@ class AppWindow(QMainWindow):
         self.merge_audio_checkbox.setChecked(
             self.settings.value("autoMergeAudio", True, type=bool)
         )
+        self.remux_hls_checkbox.setChecked(
+            self.settings.value("remuxHls", False, type=bool)
+        )
+        self.max_downloads_spinbox.setValue(
+            self.settings.value("maxDownloads", DEFAULT_MAX_CONCURRENT, type=int)
+        )
+        self.per_host_spinbox.setValue(
+            self.settings.value("perHostDownloads", DEFAULT_PER_HOST_LIMIT, type=int)
+        )
+        self.bandwidth_spinbox.setValue(
+            self.settings.value("bandwidthLimit", 0, type=int)
+        )
+        self.apply_download_limits()
+        self.apply_bandwidth_limit()
 
     def save_settings(self):
         self.settings.setValue("downloadPath", self.path_input.text())
         self.settings.setValue("autoMergeAudio", self.merge_audio_checkbox.isChecked())
+        self.settings.setValue("remuxHls", self.remux_hls_checkbox.isChecked())
+        self.settings.setValue("maxDownloads", self.max_downloads_spinbox.value())
+        self.settings.setValue("perHostDownloads", self.per_host_spinbox.value())
+        self.settings.setValue("bandwidthLimit", self.bandwidth_spinbox.value())
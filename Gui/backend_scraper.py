@@ -1,20 +1,34 @@
 # backend_scraper.py
 
+import json
 import logging
 import os
 import sys
 import re
 import subprocess
 import time
+from collections import OrderedDict
 from urllib.parse import urljoin, urlparse
 import shutil
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import certifi
 import undetected_chromedriver as uc
 
+import download_index
+from integrity import INDEX_HASH_ALGORITHM, StreamVerifier
+from progress import ProgressTracker, YT_DLP_PROGRESS_TEMPLATE
+
 logger = logging.getLogger(__name__)
 
+# 直链下载未完成时的临时文件后缀
+PARTIAL_SUFFIX = ".part"
+
 if os.name == "nt":
     CREATION_FLAGS = subprocess.CREATE_NO_WINDOW
 else:
@@ -29,6 +43,157 @@ RESOURCE_CATEGORIES = {
     "文档": (".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".txt", ".md"),
 }
 
+# --- 无头浏览器请求拦截配置 ---
+# 链接发现只依赖渲染后的 DOM，图片、字体、样式、统计与广告请求都可以拦截，
+# 以减少加载时间和代理流量。被拦截的媒体请求仍会作为发现的链接记录下来。
+BROWSER_BLOCK_PROFILE = "balanced"
+BROWSER_BLOCK_PROFILES = {
+    "off": {"resource_types": (), "hosts": ()},
+    "balanced": {
+        "resource_types": ("Image", "Font", "Media"),
+        "hosts": (
+            "google-analytics.com",
+            "googletagmanager.com",
+            "doubleclick.net",
+            "googlesyndication.com",
+            "facebook.net",
+            "hotjar.com",
+            "scorecardresearch.com",
+            "hm.baidu.com",
+            "cnzz.com",
+        ),
+    },
+    "aggressive": {
+        "resource_types": ("Image", "Font", "Media", "Stylesheet"),
+        "hosts": (
+            "google-analytics.com",
+            "googletagmanager.com",
+            "doubleclick.net",
+            "googlesyndication.com",
+            "googleadservices.com",
+            "adservice.google.com",
+            "facebook.net",
+            "connect.facebook.net",
+            "hotjar.com",
+            "scorecardresearch.com",
+            "criteo.com",
+            "taboola.com",
+            "outbrain.com",
+            "hm.baidu.com",
+            "cnzz.com",
+            "pos.baidu.com",
+        ),
+    },
+}
+# Network.setBlockedURLs 只支持 URL 通配，因此资源类型按扩展名映射；
+# 通配只锚定在路径结尾 (或查询串之前)，不会误伤域名或路径中间含有这些字样的页面
+BROWSER_RESOURCE_TYPE_PATTERNS = {
+    "Image": (
+        ".jpg",
+        ".jpeg",
+        ".png",
+        ".gif",
+        ".bmp",
+        ".webp",
+        ".svg",
+        ".ico",
+        ".avif",
+    ),
+    "Font": (".woff", ".woff2", ".ttf", ".otf", ".eot"),
+    "Media": (".mp4", ".webm", ".m3u8", ".ts", ".m4s", ".mp3", ".m4a", ".ogg", ".flv"),
+    "Stylesheet": (".css",),
+}
+# 被拦截请求的平均体积估算 (字节)。被拦截的请求没有实际传输，节省的流量只能按此估算
+BROWSER_BLOCKED_SIZE_ESTIMATES = {
+    "Image": 60 * 1024,
+    "Font": 40 * 1024,
+    "Media": 512 * 1024,
+    "Stylesheet": 30 * 1024,
+    "Script": 50 * 1024,
+}
+BROWSER_MAX_WAIT = 7
+BROWSER_IDLE_WINDOW = 1.5
+BROWSER_BLOCKED_MEDIA_CATEGORIES = {"Image": "图片", "Media": "视频"}
+
+# --- 网络会话池配置 ---
+SESSION_POOL_CONNECTIONS = 16
+SESSION_POOL_MAXSIZE = 32
+SESSION_IDLE_TIMEOUT = 300
+_session_pool = {}
+_session_pool_lock = threading.Lock()
+_ssl_context = None
+_ssl_context_lock = threading.Lock()
+
+# --- 链接探测 (HEAD / Range) 配置 ---
+LINK_PROBE_MAX_WORKERS = 16
+LINK_PROBE_TIMEOUT = 8
+LINK_PROBE_CACHE_TTL = 600
+LINK_PROBE_SNIFF_BYTES = 32
+# 每次嗅探最多探测的链接数和总耗时上限 (秒)；超出的链接保留按扩展名猜测的类型
+LINK_PROBE_MAX_LINKS = 64
+LINK_PROBE_BUDGET = 6
+_link_probe_cache = {}
+_link_probe_cache_lock = threading.Lock()
+
+# (偏移, 魔数, 类别, MIME)
+MAGIC_SIGNATURES = (
+    (0, b"\x89PNG\r\n\x1a\n", "图片", "image/png"),
+    (0, b"\xff\xd8\xff", "图片", "image/jpeg"),
+    (0, b"GIF8", "图片", "image/gif"),
+    (8, b"WEBP", "图片", "image/webp"),
+    (0, b"PK\x03\x04", "压缩包", "application/zip"),
+    (0, b"Rar!\x1a\x07", "压缩包", "application/vnd.rar"),
+    (0, b"7z\xbc\xaf\x27\x1c", "压缩包", "application/x-7z-compressed"),
+    (0, b"\x1f\x8b", "压缩包", "application/gzip"),
+    (0, b"%PDF", "文档", "application/pdf"),
+    (0, b"MZ", "可执行/安装包", "application/x-msdownload"),
+    (0, b"ID3", "音频", "audio/mpeg"),
+    (0, b"fLaC", "音频", "audio/flac"),
+    (0, b"OggS", "音频", "audio/ogg"),
+    (8, b"WAVE", "音频", "audio/wav"),
+    (0, b"\x1aE\xdf\xa3", "视频", "video/webm"),
+    (4, b"ftyp", "视频", "video/mp4"),
+    (0, b"FLV", "视频", "video/x-flv"),
+    (8, b"AVI ", "视频", "video/x-msvideo"),
+    (0, b"#EXTM3U", "视频", "application/vnd.apple.mpegurl"),
+)
+MIME_CATEGORIES = (
+    ("video/", "视频"),
+    ("audio/", "音频"),
+    ("image/", "图片"),
+    ("application/vnd.apple.mpegurl", "视频"),
+    ("application/x-mpegurl", "视频"),
+    ("application/zip", "压缩包"),
+    ("application/x-rar", "压缩包"),
+    ("application/vnd.rar", "压缩包"),
+    ("application/x-7z", "压缩包"),
+    ("application/gzip", "压缩包"),
+    ("application/x-tar", "压缩包"),
+    ("application/pdf", "文档"),
+    ("application/msword", "文档"),
+    ("application/vnd.openxmlformats", "文档"),
+    ("application/x-msdownload", "可执行/安装包"),
+    ("application/x-msi", "可执行/安装包"),
+    ("application/x-apple-diskimage", "可执行/安装包"),
+    ("text/html", "其他"),
+)
+GENERIC_MIME_TYPES = ("", "application/octet-stream", "binary/octet-stream")
+
+# --- GitHub API 配置 ---
+# 可通过 GITHUB_API_BASE 环境变量指向本地替身服务器 (例如测试环境)
+GITHUB_API_BASE = os.environ.get("GITHUB_API_BASE", "https://api.github.com").rstrip(
+    "/"
+)
+GITHUB_ETAG_CACHE_SIZE = 256
+GITHUB_RATE_LIMIT_RESERVE = 5
+GITHUB_RATE_LIMIT_MAX_WAIT = 10
+GITHUB_RELEASE_PAGE_SIZE = 100
+GITHUB_MAX_RELEASE_PAGES = 10
+GITHUB_PAGE_WORKERS = 4
+_github_etag_cache = OrderedDict()
+_github_rate_state = {"remaining": None, "reset": 0}
+_github_lock = threading.Lock()
+
 
 def get_executable_path(filename):
     if hasattr(sys, "_MEIPASS"):
@@ -38,6 +203,27 @@ def get_executable_path(filename):
     return local_path if os.path.exists(local_path) else filename
 
 
+class _PooledHTTPAdapter(HTTPAdapter):
+    """复用进程级 SSL 上下文的适配器，避免每个连接重新加载 CA 证书。"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = _get_ssl_context()
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs.setdefault("ssl_context", _get_ssl_context())
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def _get_ssl_context():
+    global _ssl_context
+    if _ssl_context is None:
+        with _ssl_context_lock:
+            if _ssl_context is None:
+                _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+
 def create_requests_session(proxy_dict=None):
     session = requests.Session()
     session.headers.update(
@@ -47,10 +233,77 @@ def create_requests_session(proxy_dict=None):
     )
     if proxy_dict:
         session.proxies = proxy_dict
-    session.verify = certifi.where()
+    adapter = _PooledHTTPAdapter(
+        pool_connections=SESSION_POOL_CONNECTIONS, pool_maxsize=SESSION_POOL_MAXSIZE
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = True
+    return session
+
+
+def _session_pool_key(proxy_dict):
+    return tuple(sorted((proxy_dict or {}).items()))
+
+
+def get_requests_session(proxy_dict=None):
+    """
+    返回按代理配置共享的长连接 Session，用完后须调用 release_requests_session。
+    同一代理下的嗅探与下载复用 DNS/TCP/TLS 连接；只有没有使用者且闲置过久的 Session 会被回收，
+    正在进行的长时间下载不会被关闭。
+    """
+    key = _session_pool_key(proxy_dict)
+    now = time.monotonic()
+    expired = []
+    with _session_pool_lock:
+        for pool_key, entry in list(_session_pool.items()):
+            if (
+                pool_key != key
+                and entry["users"] == 0
+                and now - entry["last_used"] > SESSION_IDLE_TIMEOUT
+            ):
+                expired.append(_session_pool.pop(pool_key)["session"])
+        entry = _session_pool.get(key)
+        if entry is None:
+            entry = {"session": create_requests_session(proxy_dict), "users": 0}
+            _session_pool[key] = entry
+        entry["users"] += 1
+        entry["last_used"] = now
+        session = entry["session"]
+    for pooled_session in expired:
+        pooled_session.close()
+    if expired:
+        logger.info(f"已回收 {len(expired)} 个闲置的网络会话。")
     return session
 
 
+def release_requests_session(session):
+    """归还 get_requests_session 取得的 Session，从此刻起开始计算闲置时间。"""
+    with _session_pool_lock:
+        for entry in _session_pool.values():
+            if entry["session"] is session:
+                entry["users"] = max(entry["users"] - 1, 0)
+                entry["last_used"] = time.monotonic()
+                break
+
+
+def build_link_info(link_url):
+    """按扩展名识别资源类别，无法识别时返回 None。"""
+    path = urlparse(link_url).path
+    _, ext = os.path.splitext(path)
+    if not ext:
+        return None
+    for category, extensions in RESOURCE_CATEGORIES.items():
+        if ext.lower() in extensions:
+            return {
+                "url": link_url,
+                "filename": os.path.basename(path) or "unknown",
+                "category": category,
+                "ext": ext.lower(),
+            }
+    return None
+
+
 def extract_links_from_html(base_url, html_content):
     soup = BeautifulSoup(html_content, "html.parser")
     found_urls = set()
@@ -68,29 +321,175 @@ def extract_links_from_html(base_url, html_content):
             found_urls.add(urljoin(base_url, src))
     verified_links = []
     for link_url in found_urls:
-        path = urlparse(link_url).path
-        _, ext = os.path.splitext(path)
-        if ext:
-            for category, extensions in RESOURCE_CATEGORIES.items():
-                if ext.lower() in extensions:
-                    verified_links.append(
-                        {
-                            "url": link_url,
-                            "filename": os.path.basename(path) or "unknown",
-                            "category": category,
-                            "ext": ext.lower(),
-                        }
-                    )
-                    break
+        link_info = build_link_info(link_url)
+        if link_info:
+            verified_links.append(link_info)
     return verified_links
 
 
+def _category_from_magic(head):
+    for offset, signature, category, mime in MAGIC_SIGNATURES:
+        if head[offset : offset + len(signature)] == signature:
+            return category, mime
+    return None, None
+
+
+def _category_from_mime(mime):
+    return next(
+        (category for prefix, category in MIME_CATEGORIES if mime.startswith(prefix)),
+        None,
+    )
+
+
+def _probe_link(session, link_url, context_worker=None):
+    """先 HEAD，信息不足时再以 Range 请求读取文件头，返回 size/mime/category。"""
+    if context_worker and not context_worker._is_running:
+        return None
+    probe = {"size": None, "mime": "", "category": None}
+    try:
+        response = session.head(
+            link_url, timeout=LINK_PROBE_TIMEOUT, allow_redirects=True
+        )
+        if response.status_code < 400:
+            if length := response.headers.get("content-length"):
+                probe["size"] = int(length)
+            probe["mime"] = (
+                response.headers.get("content-type", "").split(";")[0].lower()
+            )
+    except (requests.RequestException, ValueError):
+        pass
+    if probe["size"] is not None and probe["mime"] not in GENERIC_MIME_TYPES:
+        probe["category"] = _category_from_mime(probe["mime"])
+        return probe
+    if context_worker and not context_worker._is_running:
+        return None
+    try:
+        with session.get(
+            link_url,
+            headers={"Range": f"bytes=0-{LINK_PROBE_SNIFF_BYTES - 1}"},
+            timeout=LINK_PROBE_TIMEOUT,
+            stream=True,
+        ) as response:
+            if response.status_code >= 400:
+                return probe if probe["size"] is not None else None
+            content_range = response.headers.get("content-range", "")
+            if response.status_code == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                if total.isdigit():
+                    probe["size"] = int(total)
+            elif length := response.headers.get("content-length"):
+                probe["size"] = int(length)
+            if not probe["mime"]:
+                probe["mime"] = (
+                    response.headers.get("content-type", "").split(";")[0].lower()
+                )
+            head = response.raw.read(LINK_PROBE_SNIFF_BYTES, decode_content=True)
+    except (requests.RequestException, ValueError):
+        return probe if probe["size"] is not None else None
+    magic_category, magic_mime = _category_from_magic(head or b"")
+    if magic_category:
+        probe["category"] = magic_category
+        if probe["mime"] in GENERIC_MIME_TYPES:
+            probe["mime"] = magic_mime
+    else:
+        probe["category"] = _category_from_mime(probe["mime"])
+    return probe
+
+
+def _get_cached_probe(link_url):
+    with _link_probe_cache_lock:
+        cached = _link_probe_cache.get(link_url)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        _link_probe_cache.pop(link_url, None)
+    return None
+
+
+def _apply_probe(link, probe):
+    if probe["size"] is not None:
+        link["size"] = probe["size"]
+    if probe["mime"]:
+        link["mime"] = probe["mime"]
+    if probe["category"] and probe["category"] != link.get("category"):
+        logger.debug(
+            f"链接类别修正: {link['url']} {link.get('category')} -> {probe['category']}"
+        )
+        link["category"] = probe["category"]
+
+
+def enrich_links(links, proxy_dict=None, context_worker=None):
+    """
+    并发探测链接的大小与 MIME，并用文件头魔数纠正按扩展名猜测的类别。
+    结果写入 TTL 缓存，重复嗅探同一页面时不再发起请求。
+    最多探测 LINK_PROBE_MAX_LINKS 个链接 (无扩展名、类别无法猜测的优先)，
+    总耗时不超过 LINK_PROBE_BUDGET 秒；其余链接保留按扩展名猜测的类型。
+    """
+    pending = []
+    for link in links:
+        if link.get("size") is not None and link.get("mime"):
+            continue
+        if cached := _get_cached_probe(link["url"]):
+            _apply_probe(link, cached)
+        else:
+            pending.append(link)
+    if not pending:
+        return links
+    unprobed = max(len(pending) - LINK_PROBE_MAX_LINKS, 0)
+    pending.sort(
+        key=lambda link: bool(link.get("ext")) and link.get("category") != "其他"
+    )
+    pending = pending[:LINK_PROBE_MAX_LINKS]
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(
+        max_workers=min(LINK_PROBE_MAX_WORKERS, len(pending)),
+        thread_name_prefix="link-probe",
+    )
+    session = get_requests_session(proxy_dict)
+    try:
+        futures = {
+            executor.submit(_probe_link, session, link["url"], context_worker): link
+            for link in pending
+        }
+        finished = 0
+        try:
+            for future in as_completed(futures, timeout=LINK_PROBE_BUDGET):
+                if context_worker and not context_worker._is_running:
+                    break
+                finished += 1
+                link = futures[future]
+                try:
+                    probe = future.result()
+                except Exception as e:
+                    logger.debug(f"探测链接失败 {link['url']}: {e}")
+                    continue
+                if probe:
+                    with _link_probe_cache_lock:
+                        _link_probe_cache[link["url"]] = (
+                            time.monotonic() + LINK_PROBE_CACHE_TTL,
+                            probe,
+                        )
+                    _apply_probe(link, probe)
+        except FuturesTimeoutError:
+            logger.info(
+                f"链接探测超过 {LINK_PROBE_BUDGET} 秒，"
+                f"{len(futures) - finished} 个链接保留猜测的类型"
+            )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        release_requests_session(session)
+    logger.info(
+        f"链接探测完成: {len(pending)} 个链接，耗时 {time.monotonic() - start:.2f} 秒"
+        + (f"，另有 {unprobed} 个超出上限未探测" if unprobed else "")
+    )
+    return links
+
+
 # --- 嗅探引擎模块 ---
 
 
 def sniff_engine_direct_link_checker(url, proxy_dict=None, context_worker=None):
     logger.info(f"引擎[Direct Checker]: 检查URL -> {url}")
-    session = create_requests_session(proxy_dict)
+    session = get_requests_session(proxy_dict)
     try:
         response = session.head(url, timeout=15, allow_redirects=True)
         if context_worker and not context_worker._is_running:
@@ -133,9 +532,141 @@ def sniff_engine_direct_link_checker(url, proxy_dict=None, context_worker=None):
         if context_worker and not context_worker._is_running:
             return {"error": "操作被用户取消。"}
         return {"error": f"网络请求失败: {e}", "engine": "direct_link_checker"}
+    finally:
+        release_requests_session(session)
+
+
+class GitHubRateLimitError(Exception):
+    def __init__(self, reset_at):
+        super().__init__(f"GitHub API 速率限制已耗尽，将于 {reset_at} 重置。")
+        self.reset_at = reset_at
+
+
+def _update_github_rate_state(response):
+    remaining = response.headers.get("x-ratelimit-remaining")
+    reset = response.headers.get("x-ratelimit-reset")
+    if remaining is None or not remaining.isdigit():
+        return
+    with _github_lock:
+        _github_rate_state["remaining"] = int(remaining)
+        if reset and reset.isdigit():
+            _github_rate_state["reset"] = int(reset)
+
+
+def _wait_for_github_rate_limit(has_cache, context_worker=None):
+    """
+    根据 X-RateLimit-Remaining 决定是否发起请求。
+    返回 False 表示额度耗尽且有缓存可用，应直接使用缓存。
+    """
+    with _github_lock:
+        remaining = _github_rate_state["remaining"]
+        reset = _github_rate_state["reset"]
+    wait = reset - time.time()
+    if remaining is None or remaining > 0 or wait <= 0:
+        return True
+    if has_cache:
+        return False
+    if wait > GITHUB_RATE_LIMIT_MAX_WAIT:
+        raise GitHubRateLimitError(time.strftime("%H:%M:%S", time.localtime(reset)))
+    logger.info(f"引擎[GitHub API]: 速率限制耗尽，等待 {wait:.1f} 秒后重试。")
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if context_worker and not context_worker._is_running:
+            raise InterruptedError("GitHub task was cancelled during rate-limit wait.")
+        time.sleep(0.25)
+    return True
+
+
+def _github_get(session, api_url, headers, context_worker=None):
+    """
+    带 ETag 缓存的 GitHub API GET 请求，返回 (json数据, Link响应头)。
+    304 条件请求不计入速率限制，因此重复嗅探几乎没有成本。
+    """
+    with _github_lock:
+        cached = _github_etag_cache.get(api_url)
+        if cached:
+            _github_etag_cache.move_to_end(api_url)
+    if not _wait_for_github_rate_limit(cached is not None, context_worker):
+        logger.info(f"引擎[GitHub API]: 速率限制耗尽，使用缓存结果 -> {api_url}")
+        return cached[1], cached[2]
+    request_headers = dict(headers)
+    if cached:
+        request_headers["If-None-Match"] = cached[0]
+    response = session.get(api_url, headers=request_headers, timeout=30)
+    _update_github_rate_state(response)
+    if response.status_code == 304 and cached:
+        logger.info(f"引擎[GitHub API]: 命中 ETag 缓存 -> {api_url}")
+        return cached[1], cached[2]
+    response.raise_for_status()
+    data = response.json()
+    link_header = response.headers.get("link", "")
+    if etag := response.headers.get("etag"):
+        with _github_lock:
+            _github_etag_cache[api_url] = (etag, data, link_header)
+            _github_etag_cache.move_to_end(api_url)
+            while len(_github_etag_cache) > GITHUB_ETAG_CACHE_SIZE:
+                _github_etag_cache.popitem(last=False)
+    return data, link_header
+
+
+def _fetch_all_github_releases(session, repo_api_url, headers, context_worker=None):
+    """翻页获取全部发布版本，首页之后的分页并发请求，并为速率限制保留余量。"""
+    releases_url = f"{repo_api_url}/releases?per_page={GITHUB_RELEASE_PAGE_SIZE}"
+    first_page, link_header = _github_get(
+        session, f"{releases_url}&page=1", headers, context_worker
+    )
+    last_page = 1
+    if last_match := re.search(r'[?&]page=(\d+)[^>]*>;\s*rel="last"', link_header):
+        last_page = min(int(last_match.group(1)), GITHUB_MAX_RELEASE_PAGES)
+    with _github_lock:
+        remaining = _github_rate_state["remaining"]
+    if remaining is not None:
+        last_page = min(last_page, 1 + max(remaining - GITHUB_RATE_LIMIT_RESERVE, 0))
+    pages = {1: first_page}
+    if last_page > 1:
+        with ThreadPoolExecutor(
+            max_workers=GITHUB_PAGE_WORKERS, thread_name_prefix="github-page"
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _github_get,
+                    session,
+                    f"{releases_url}&page={page}",
+                    headers,
+                    context_worker,
+                ): page
+                for page in range(2, last_page + 1)
+            }
+            for future in as_completed(futures):
+                pages[futures[future]] = future.result()[0]
+    return [release for page in sorted(pages) for release in pages[page]]
 
 
-def sniff_engine_github_api(url, proxy_dict=None, context_worker=None):
+def _github_release_links(release, with_tag=False):
+    links = []
+    for asset in release.get("assets", []):
+        name = asset.get("name")
+        if not asset.get("browser_download_url") or not name:
+            continue
+        ext = os.path.splitext(name)[1].lower()
+        links.append(
+            {
+                "url": asset.get("browser_download_url"),
+                "filename": f"[{release.get('tag_name')}] {name}" if with_tag else name,
+                "category": next(
+                    (cat for cat, exts in RESOURCE_CATEGORIES.items() if ext in exts),
+                    "其他",
+                ),
+                "size": asset.get("size"),
+                "mime": asset.get("content_type"),
+                "ext": ext,
+                "digest": asset.get("digest"),
+            }
+        )
+    return links
+
+
+def sniff_engine_github_api(url, proxy_dict=None, context_worker=None, list_all=None):
     logger.info(f"引擎[GitHub API]: 开始深度解析GitHub URL -> {url}")
     repo_match = re.search(r"github\.com/([^/]+)/([^/]+)", url)
     if not repo_match:
@@ -143,54 +674,57 @@ def sniff_engine_github_api(url, proxy_dict=None, context_worker=None):
     owner, repo = repo_match.group(1), repo_match.group(2).replace(".git", "").strip(
         "/"
     )
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/releases/latest"
-    if tag_match := re.search(r"/releases/tag/([^/?#]+)", url):
-        api_url = f"https://api.github.com/repos/{owner}/{repo}/releases/tags/{tag_match.group(1)}"
+    repo_api_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}"
+    api_url = f"{repo_api_url}/releases/latest"
+    tag_match = re.search(r"/releases/tag/([^/?#]+)", url)
+    if tag_match:
+        api_url = f"{repo_api_url}/releases/tags/{tag_match.group(1)}"
+    if list_all is None:
+        # 仓库的 /releases 列表页默认列出全部发布版本
+        list_all = bool(re.search(r"/releases/?(?:[?#]|$)", url))
     headers = {
         "Accept": "application/vnd.github.v3+json",
         "User-Agent": "Ultimate-Sniffer-App/1.0",
     }
     if token := os.environ.get("GITHUB_TOKEN"):
         headers["Authorization"] = f"token {token}"
-    session = create_requests_session(proxy_dict)
-    session.headers.update(headers)
+    session = get_requests_session(proxy_dict)
     try:
-        response = session.get(api_url, timeout=30)
-        if context_worker and not context_worker._is_running:
-            return {"error": "操作被用户取消。"}
-        response.raise_for_status()
-        data = response.json()
-        if isinstance(data, list) and not data:
-            return {"error": "该仓库没有任何发布版本。", "engine": "github_api"}
-        if isinstance(data, list):
-            data = data[0]
-        links = [
-            {
-                "url": asset.get("browser_download_url"),
-                "filename": asset.get("name"),
-                "category": next(
-                    (
-                        cat
-                        for cat, exts in RESOURCE_CATEGORIES.items()
-                        if os.path.splitext(asset.get("name"))[1].lower() in exts
-                    ),
-                    "其他",
-                ),
-                "size": asset.get("size"),
-                "mime": asset.get("content_type"),
-                "ext": os.path.splitext(asset.get("name"))[1].lower(),
-            }
-            for asset in data.get("assets", [])
-            if asset.get("browser_download_url") and asset.get("name")
-        ]
+        if list_all and not tag_match:
+            releases = _fetch_all_github_releases(
+                session, repo_api_url, headers, context_worker
+            )
+            if context_worker and not context_worker._is_running:
+                return {"error": "操作被用户取消。"}
+            if not releases:
+                return {"error": "该仓库没有任何发布版本。", "engine": "github_api"}
+            links = [
+                link
+                for release in releases
+                for link in _github_release_links(release, with_tag=True)
+            ]
+            title = f"{owner}/{repo} - 全部发布版本 ({len(releases)})"
+        else:
+            data, _ = _github_get(session, api_url, headers, context_worker)
+            if context_worker and not context_worker._is_running:
+                return {"error": "操作被用户取消。"}
+            if isinstance(data, list) and not data:
+                return {"error": "该仓库没有任何发布版本。", "engine": "github_api"}
+            if isinstance(data, list):
+                data = data[0]
+            links = _github_release_links(data)
+            title = data.get("name", f"{owner}/{repo} - {data.get('tag_name')}")
         if not links:
             return {
                 "error": "此发布版本下未找到任何资源文件(assets)。",
                 "engine": "github_api",
             }
+        return {"links": links, "title": title, "engine": "github_api"}
+    except InterruptedError:
+        return {"error": "操作被用户取消。"}
+    except GitHubRateLimitError as e:
         return {
-            "links": links,
-            "title": data.get("name", f"{owner}/{repo} - {data.get('tag_name')}"),
+            "error": f"{e}请设置 GITHUB_TOKEN 环境变量以提高额度。",
             "engine": "github_api",
         }
     except requests.RequestException as e:
@@ -204,11 +738,13 @@ def sniff_engine_github_api(url, proxy_dict=None, context_worker=None):
         ):
             msg += " 也可能是速率限制已超额，请设置 GITHUB_TOKEN 环境变量。"
         return {"error": msg, "engine": "github_api"}
+    finally:
+        release_requests_session(session)
 
 
 def sniff_engine_html_parser(url, proxy_dict=None, context_worker=None):
     logger.info(f"引擎[HTML]: 开始嗅探 {url}")
-    session = create_requests_session(proxy_dict)
+    session = get_requests_session(proxy_dict)
     try:
         with session.get(url, timeout=20, stream=True) as response:
             if context_worker and not context_worker._is_running:
@@ -225,38 +761,163 @@ def sniff_engine_html_parser(url, proxy_dict=None, context_worker=None):
             links = extract_links_from_html(url, html_content)
             if not links:
                 return {"error": "HTML引擎未发现可识别的链接。", "engine": "html"}
+            enrich_links(links, proxy_dict, context_worker)
+            if context_worker and not context_worker._is_running:
+                return {"error": "操作被用户取消。"}
             return {"links": links, "title": title, "engine": "html"}
     except requests.RequestException as e:
         if context_worker and not context_worker._is_running:
             return {"error": "操作被用户取消。"}
         return {"error": f"网络请求失败: {e}", "engine": "html"}
+    finally:
+        release_requests_session(session)
+
+
+def _url_pattern_matches(url, pattern):
+    """按 Network.setBlockedURLs 的规则匹配：只有 * 是通配符，其余字符 (包括 ?) 按字面匹配。"""
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    return re.fullmatch(regex, url) is not None
+
 
+def _build_blocked_url_patterns(profile, page_url=None):
+    """生成 Network.setBlockedURLs 的通配列表；会匹配到页面本身的通配被剔除。"""
+    patterns = []
+    for resource_type in profile["resource_types"]:
+        for ext in BROWSER_RESOURCE_TYPE_PATTERNS.get(resource_type, ()):
+            patterns += [f"*{ext}", f"*{ext}?*"]
+    for host in profile["hosts"]:
+        patterns += [f"*://{host}/*", f"*.{host}/*"]
+    if page_url:
+        patterns = [p for p in patterns if not _url_pattern_matches(page_url, p)]
+    return patterns
 
-def sniff_engine_browser(url, proxy_dict=None, context_worker=None):
-    logger.info(f"引擎[浏览器]: 启动无头浏览器嗅探 {url}")
+
+def _read_browser_network_events(driver, network_state):
+    """消费 performance 日志，返回本次是否观察到新的网络活动。"""
+    had_activity = False
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError, TypeError):
+            continue
+        method, params = message.get("method"), message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            had_activity = True
+            network_state["requests"][params.get("requestId")] = (
+                params.get("request", {}).get("url"),
+                params.get("type", "Other"),
+            )
+        elif method == "Network.loadingFinished":
+            had_activity = True
+            network_state["transferred_bytes"] += int(
+                params.get("encodedDataLength", 0)
+            )
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            request_url, resource_type = network_state["requests"].get(
+                params.get("requestId"), (None, params.get("type", "Other"))
+            )
+            if request_url:
+                network_state["blocked"].append((request_url, resource_type))
+    return had_activity
+
+
+def _wait_for_browser_idle(driver, network_state, context_worker=None):
+    """等待页面加载完成且网络静默，最长 BROWSER_MAX_WAIT 秒，返回实际等待时间。"""
+    start = time.monotonic()
+    last_activity = start
+    while True:
+        if context_worker and not context_worker._is_running:
+            raise InterruptedError("Browser task was cancelled during wait.")
+        now = time.monotonic()
+        if now - start >= BROWSER_MAX_WAIT:
+            break
+        try:
+            if _read_browser_network_events(driver, network_state):
+                last_activity = now
+        except Exception as e:
+            # 无法读取性能日志时退回到固定等待
+            logger.debug(f"读取浏览器性能日志失败: {e}")
+            last_activity = now
+        if (
+            now - last_activity >= BROWSER_IDLE_WINDOW
+            and driver.execute_script("return document.readyState") == "complete"
+        ):
+            break
+        time.sleep(0.25)
+    waited = time.monotonic() - start
+    try:
+        _read_browser_network_events(driver, network_state)
+    except Exception:
+        pass
+    return waited
+
+
+def sniff_engine_browser(url, proxy_dict=None, context_worker=None, block_profile=None):
+    block_profile = block_profile or BROWSER_BLOCK_PROFILE
+    profile = BROWSER_BLOCK_PROFILES.get(block_profile, BROWSER_BLOCK_PROFILES["off"])
+    logger.info(f"引擎[浏览器]: 启动无头浏览器嗅探 {url} (拦截配置: {block_profile})")
     options = uc.ChromeOptions()
     options.add_argument("--headless=new")
     options.add_argument("--no-sandbox")
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     if proxy_dict and (proxy_url := proxy_dict.get("https://")):
         options.add_argument(f"--proxy-server={proxy_url}")
     driver = None
+    network_state = {"requests": {}, "blocked": [], "transferred_bytes": 0}
     try:
         driver = uc.Chrome(options=options)
         if context_worker:
             context_worker.register_stoppable_resource(driver)
+        if blocked_patterns := _build_blocked_url_patterns(profile, url):
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_patterns})
         driver.get(url)
-        for _ in range(7):
-            if context_worker and not context_worker._is_running:
-                raise InterruptedError("Browser task was cancelled during wait.")
-            time.sleep(1)
+        waited = _wait_for_browser_idle(driver, network_state, context_worker)
         page_source, page_title = driver.page_source, driver.title
         links = extract_links_from_html(url, page_source)
+        known_urls = {link["url"] for link in links}
+        estimated_blocked_bytes = 0
+        for blocked_url, resource_type in network_state["blocked"]:
+            estimated_blocked_bytes += BROWSER_BLOCKED_SIZE_ESTIMATES.get(
+                resource_type, 0
+            )
+            if blocked_url in known_urls or blocked_url.startswith(("data:", "blob:")):
+                continue
+            link_info = build_link_info(blocked_url)
+            if not link_info and resource_type in BROWSER_BLOCKED_MEDIA_CATEGORIES:
+                path = urlparse(blocked_url).path
+                link_info = {
+                    "url": blocked_url,
+                    "filename": os.path.basename(path) or "unknown",
+                    "category": BROWSER_BLOCKED_MEDIA_CATEGORIES[resource_type],
+                    "ext": os.path.splitext(path)[1].lower(),
+                }
+            if link_info:
+                links.append(link_info)
+                known_urls.add(blocked_url)
+        # blocked_requests、transferred_bytes 和 waited 是实测值；
+        # 节省的流量按平均体积估算，节省的时间是相对固定等待 BROWSER_MAX_WAIT 秒而言
+        block_stats = {
+            "profile": block_profile,
+            "blocked_requests": len(network_state["blocked"]),
+            "transferred_bytes": network_state["transferred_bytes"],
+            "waited": waited,
+            "estimated_blocked_bytes": estimated_blocked_bytes,
+            "estimated_time_saved": max(BROWSER_MAX_WAIT - waited, 0),
+        }
+        logger.info(f"引擎[浏览器]: 拦截统计 {block_stats}")
         if not links:
             return {
                 "error": "浏览器成功渲染页面，但未发现可识别的链接。",
                 "engine": "browser",
             }
-        return {"links": links, "title": page_title, "engine": "browser"}
+        enrich_links(links, proxy_dict, context_worker)
+        return {
+            "links": links,
+            "title": page_title,
+            "engine": "browser",
+            "block_stats": block_stats,
+        }
     except Exception as e:
         if context_worker and not context_worker._is_running:
             return {"error": "操作被用户取消。"}
@@ -273,7 +934,14 @@ def sniff_engine_browser(url, proxy_dict=None, context_worker=None):
 # --- 下载相关函数 ---
 
 
-def build_download_command(url, format_codes, download_dir, proxy_dict=None):
+def build_download_command(
+    url,
+    format_codes,
+    download_dir,
+    proxy_dict=None,
+    info_json_path=None,
+    rate_limit=None,
+):
     yt_dlp_exe = get_executable_path("yt-dlp.exe")
     output_template = os.path.join(download_dir, "%(title)s.f%(format_id)s.%(ext)s")
     if "+" in format_codes:
@@ -291,7 +959,7 @@ def build_download_command(url, format_codes, download_dir, proxy_dict=None):
         "--no-warnings",
         "--progress",
         "--progress-template",
-        "download-stream:%(progress._percent_str)s",
+        YT_DLP_PROGRESS_TEMPLATE,
     ]
     ffmpeg_on_path = shutil.which("ffmpeg")
     if ffmpeg_on_path:
@@ -307,50 +975,143 @@ def build_download_command(url, format_codes, download_dir, proxy_dict=None):
             )
     if proxy_dict and (proxy_url := proxy_dict.get("https://")):
         command.extend(["--proxy", proxy_url])
-    command.append(url)
+    if rate_limit:
+        # yt-dlp 在独立进程中下载，无法共享令牌桶，按预留的份额限速 (字节/秒)
+        command.extend(["--limit-rate", str(int(rate_limit))])
+    if info_json_path:
+        # 复用嗅探阶段缓存的元数据，省去一次完整的解析
+        command.extend(["--load-info-json", info_json_path])
+    else:
+        command.append(url)
     logger.info(f"生成的 yt-dlp 命令: {' '.join(command)}")
     return command
 
 
+def partial_path(download_path):
+    return download_path + PARTIAL_SUFFIX
+
+
+def remove_partial_download(download_path):
+    try:
+        os.remove(partial_path(download_path))
+    except OSError:
+        pass
+
+
+def _resumed_from(response, offset):
+    """服务器按 Range 从 offset 处返回了剩余内容时返回 True。"""
+    if response.status_code != 206:
+        return False
+    match = re.match(r"bytes (\d+)-", response.headers.get("content-range", ""))
+    return bool(match) and int(match.group(1)) == offset
+
+
+def remote_unchanged(url, etag, proxy_dict=None):
+    """用 If-None-Match 条件请求确认远端内容与上次下载时相同 (304)，不传输内容。"""
+    session = get_requests_session(proxy_dict)
+    try:
+        with session.get(
+            url, stream=True, timeout=(10, 30), headers={"If-None-Match": etag}
+        ) as r:
+            return r.status_code == 304
+    except requests.RequestException as e:
+        logger.info(f"条件请求失败，将重新下载: {e}")
+        return False
+    finally:
+        release_requests_session(session)
+
+
 def download_direct_link(
-    url, download_path, progress_callback=None, stop_callback=None, proxy_dict=None
+    url,
+    download_path,
+    progress_callback=None,
+    stop_callback=None,
+    proxy_dict=None,
+    throttle=None,
+    resume=False,
+    expected_size=None,
+    expected_digest=None,
 ):
+    """
+    下载到 download_path + PARTIAL_SUFFIX，完成后再改名。
+    resume=True 时若存在未完成的文件，则用 Range 请求续传 (服务器不支持时从头下载)。
+    被取消时保留未完成的文件，由调用方决定是删除还是留待续传；下载失败时删除。
+    写入时同步计算哈希，改名前核对大小和嗅探引擎提供的摘要 (如 "sha256:...")，
+    不一致时删除文件并返回失败。完成的文件连同哈希登记到下载索引，
+    与已有文件内容相同时替换为硬链接。
+    """
     logger.info(f"直接下载链接: {url}")
-    filepath = download_path
+    part_path = partial_path(download_path)
+    offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+    session = get_requests_session(proxy_dict)
     try:
-        session = create_requests_session(proxy_dict)
-        with session.get(url, stream=True, timeout=(10, 300)) as r:
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        with session.get(url, stream=True, timeout=(10, 300), headers=headers) as r:
+            if offset and r.status_code == 416:
+                # 请求的范围无效 (文件已变化或已下载完整)，从头下载
+                r.close()
+                remove_partial_download(download_path)
+                return download_direct_link(
+                    url,
+                    download_path,
+                    progress_callback,
+                    stop_callback,
+                    proxy_dict,
+                    throttle,
+                    expected_size=expected_size,
+                    expected_digest=expected_digest,
+                )
             r.raise_for_status()
-            total_size = int(r.headers.get("content-length", 0))
-            downloaded_size = 0
-            with open(filepath, "wb") as f:
+            if offset and not _resumed_from(r, offset):
+                logger.info("服务器不支持断点续传，从头下载。")
+                offset = 0
+            elif offset:
+                logger.info(f"从 {offset} 字节处续传: {download_path}")
+            etag = r.headers.get("etag")
+            content_length = int(r.headers.get("content-length", 0))
+            total_size = content_length + offset if content_length else 0
+            tracker = ProgressTracker(progress_callback, total_size, done=offset)
+            # 压缩传输时 Content-Length 是压缩后的大小，只能核对摘要
+            encoded = r.headers.get("content-encoding", "identity") != "identity"
+            verifier = StreamVerifier(
+                None if encoded else expected_size, expected_digest
+            )
+            if offset:
+                verifier.absorb_file(part_path, offset)
+            with open(part_path, "ab" if offset else "wb") as f:
                 for chunk in r.iter_content(chunk_size=8192):
                     if stop_callback and stop_callback():
-                        f.close()
-                        if os.path.exists(filepath):
-                            os.remove(filepath)
                         return False, "下载被用户取消"
                     if chunk:
                         f.write(chunk)
-                        downloaded_size += len(chunk)
-                        if total_size > 0 and progress_callback:
-                            progress_callback(int((downloaded_size / total_size) * 100))
+                        verifier.update(chunk)
+                        if progress_callback:
+                            tracker.advance(len(chunk))
+                        if throttle:
+                            throttle.consume(len(chunk), stop_callback)
+        if error := verifier.verify(None if encoded else total_size):
+            logger.error(f"下载校验失败: {download_path} - {error}")
+            remove_partial_download(download_path)
+            return False, f"校验失败: {error}"
+        os.replace(part_path, download_path)
         if progress_callback:
-            progress_callback(100)
+            tracker.finish()
+        sha256 = verifier.hexdigest(INDEX_HASH_ALGORITHM)
+        logger.info(f"下载完成: {download_path} (SHA-256: {sha256})")
+        notes = ["摘要校验通过"] if verifier.has_digest else []
+        if linked := download_index.record_download(download_path, url, etag, sha256):
+            logger.info(f"与已有文件内容相同，已替换为硬链接: {linked}")
+            notes.append(f"与 {os.path.basename(linked)} 相同，已硬链接")
+        if notes:
+            return True, f"下载成功完成 ({'，'.join(notes)})。"
         return True, "下载成功完成。"
     except requests.RequestException as e:
         if stop_callback and stop_callback():
-            if os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except OSError:
-                    pass
             return False, "下载被用户取消"
+        remove_partial_download(download_path)
         return False, f"网络请求失败: {e}"
     except Exception as e:
-        if os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except OSError:
-                pass
+        remove_partial_download(download_path)
         return False, f"下载过程中发生未知错误: {e}"
+    finally:
+        release_requests_session(session)
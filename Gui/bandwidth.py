@@ -0,0 +1,165 @@
+# bandwidth.py
+
+import threading
+import time
+
+# 令牌桶容量 = 速率 * BANDWIDTH_BURST_SECONDS
+BANDWIDTH_BURST_SECONDS = 1.0
+# 有嗅探进行时为其预留的全局带宽比例 (仅在设置了全局限速时生效)
+SNIFF_HEADROOM = 0.25
+# yt-dlp 子进程占用预留带宽后，进程内下载至少保留的全局带宽比例
+MIN_IN_PROCESS_SHARE = 0.1
+# 等待令牌时检查取消请求的间隔 (秒)
+WAIT_SLICE = 0.2
+
+
+class TokenBucket:
+    """线程安全的令牌桶，rate 单位为字节/秒，0 或 None 表示不限速。"""
+
+    def __init__(self, rate=None):
+        self._condition = threading.Condition()
+        self.rate = rate or None
+        self._tokens = self._capacity()
+        self._updated = time.monotonic()
+
+    def _capacity(self):
+        return self.rate * BANDWIDTH_BURST_SECONDS if self.rate else 0
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(
+                self._capacity(), self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def set_rate(self, rate):
+        with self._condition:
+            self._refill(time.monotonic())
+            self.rate = rate or None
+            self._tokens = min(self._tokens, self._capacity())
+            self._condition.notify_all()
+
+    def consume(self, nbytes, stop_callback=None):
+        """
+        取走 nbytes 个令牌，必要时阻塞等待；被取消时返回 False。
+        令牌可以透支 (一次取走超过容量的数据块)，之后的调用会等到余额回正。
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if not self.rate or self._tokens > 0:
+                    if self.rate:
+                        self._tokens -= nbytes
+                    return True
+                if stop_callback and stop_callback():
+                    return False
+                wait = min(WAIT_SLICE, -self._tokens / self.rate + 0.001)
+                self._condition.wait(wait)
+
+
+class JobThrottle:
+    """单个进程内下载任务的限速句柄：先按任务自身限速，再从全局令牌桶取令牌。"""
+
+    def __init__(self, governor, rate=None):
+        self.governor = governor
+        self.bucket = TokenBucket(rate)
+
+    def set_rate(self, rate):
+        self.bucket.set_rate(rate)
+
+    def consume(self, nbytes, stop_callback=None):
+        return self.bucket.consume(
+            nbytes, stop_callback
+        ) and self.governor.bucket.consume(nbytes, stop_callback)
+
+    def close(self):
+        self.governor._close_job(self)
+
+
+class ExternalReservation:
+    """为 yt-dlp 子进程预留的带宽。rate 为传给 --limit-rate 的字节/秒，None 表示不限速。"""
+
+    def __init__(self, governor, rate):
+        self.governor = governor
+        self.rate = rate
+
+    def close(self):
+        self.governor._close_reservation(self)
+
+
+class BandwidthGovernor:
+    """
+    所有下载共享的带宽调度器。
+    进程内下载 (直链、HLS) 通过 JobThrottle 从全局令牌桶取令牌；yt-dlp 子进程无法共享令牌桶，
+    启动时按当前份额换算为 --limit-rate 并从全局速率中扣除。有嗅探进行时为其预留一部分带宽。
+    全局和单任务限速都可以在运行中修改，进程内下载立即生效，yt-dlp 任务在下次启动时生效。
+    """
+
+    def __init__(self, rate=None):
+        self._lock = threading.Lock()
+        self.global_rate = rate or None
+        self.interactive = False
+        self.bucket = TokenBucket()
+        self._jobs = set()
+        self._reservations = set()
+        self._update()
+
+    def _download_rate(self):
+        if not self.global_rate:
+            return None
+        if self.interactive:
+            return self.global_rate * (1 - SNIFF_HEADROOM)
+        return self.global_rate
+
+    def _update(self):
+        download_rate = self._download_rate()
+        if download_rate:
+            reserved = sum(r.rate or 0 for r in self._reservations)
+            download_rate = max(
+                download_rate - reserved, download_rate * MIN_IN_PROCESS_SHARE
+            )
+        self.bucket.set_rate(download_rate)
+
+    def set_global_rate(self, rate):
+        with self._lock:
+            self.global_rate = rate or None
+            self._update()
+
+    def set_interactive(self, active):
+        """有嗅探任务进行时调用 set_interactive(True)，下载让出 SNIFF_HEADROOM 的带宽。"""
+        with self._lock:
+            if self.interactive != bool(active):
+                self.interactive = bool(active)
+                self._update()
+
+    def open_job(self, rate=None):
+        throttle = JobThrottle(self, rate)
+        with self._lock:
+            self._jobs.add(throttle)
+        return throttle
+
+    def _close_job(self, throttle):
+        with self._lock:
+            self._jobs.discard(throttle)
+
+    def reserve_external(self, rate=None):
+        """为 yt-dlp 任务按当前份额预留带宽，返回 ExternalReservation。"""
+        with self._lock:
+            download_rate = self._download_rate()
+            if download_rate:
+                active = len(self._jobs) + len(self._reservations) + 1
+                share = download_rate / active
+                rate = min(rate, share) if rate else share
+            reservation = ExternalReservation(self, int(rate) if rate else None)
+            self._reservations.add(reservation)
+            self._update()
+        return reservation
+
+    def _close_reservation(self, reservation):
+        with self._lock:
+            self._reservations.discard(reservation)
+            self._update()
+
+
+governor = BandwidthGovernor()
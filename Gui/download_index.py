@@ -0,0 +1,299 @@
+# download_index.py
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from integrity import HASH_CHUNK_SIZE
+from sniff_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_INDEX_DB_FILE = "download_index.db"
+# 扫描下载目录时跳过的未完成文件 (直链/yt-dlp 的临时文件)
+TEMP_SUFFIXES = (".part", ".ytdl", ".temp", ".tmp")
+
+_connection = None
+_index_lock = threading.Lock()
+# 目录 -> 上次扫描时目录的 mtime；目录内增删文件时 mtime 改变，才需要重新扫描
+_scanned_dirs = {}
+
+
+class IndexedFile:
+    """索引中的一个本地文件。"""
+
+    __slots__ = ("path", "size", "mtime", "sha256", "url_key", "etag")
+
+    def __init__(self, path, size, mtime, sha256=None, url_key=None, etag=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.sha256 = sha256
+        self.url_key = url_key
+        self.etag = etag
+
+    def is_current(self):
+        """文件仍存在且大小、修改时间与建立索引时一致。"""
+        return _stat(self.path) == (self.size, self.mtime)
+
+
+def _get_connection():
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(
+            DOWNLOAD_INDEX_DB_FILE, check_same_thread=False, timeout=10
+        )
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT,
+                url_key TEXT,
+                etag TEXT,
+                indexed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_url ON files (url_key);
+            CREATE INDEX IF NOT EXISTS files_size ON files (size);
+            """)
+    return _connection
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _select(where, params):
+    rows = (
+        _get_connection()
+        .execute(
+            "SELECT path, size, mtime, sha256, url_key, etag FROM files "
+            f"WHERE {where}",
+            params,
+        )
+        .fetchall()
+    )
+    return [IndexedFile(*row) for row in rows]
+
+
+def _forget(paths):
+    _get_connection().executemany(
+        "DELETE FROM files WHERE path = ?", [(path,) for path in paths]
+    )
+
+
+def rescan(directory):
+    """
+    增量更新一个下载目录的索引：新增或变化的文件只记录大小和修改时间，哈希在需要比对时才计算；
+    已删除的文件从索引中移除。目录内容没有变化时直接返回。
+    """
+    directory = os.path.abspath(directory)
+    dir_stat = _stat(directory)
+    if dir_stat is None or _scanned_dirs.get(directory) == dir_stat[1]:
+        return
+    try:
+        names = os.listdir(directory)
+    except OSError as e:
+        logger.warning(f"无法扫描下载目录 {directory}: {e}")
+        return
+    try:
+        with _index_lock:
+            conn = _get_connection()
+            known = {
+                entry.path: entry
+                for entry in _select(
+                    "path LIKE ? ESCAPE '\\'",
+                    (_like_prefix(directory),),
+                )
+                if os.path.dirname(entry.path) == directory
+            }
+            now = time.time()
+            with conn:
+                for name in names:
+                    path = os.path.join(directory, name)
+                    if name.endswith(TEMP_SUFFIXES) or not os.path.isfile(path):
+                        continue
+                    stat = _stat(path)
+                    entry = known.pop(path, None)
+                    if stat is None or (entry and (entry.size, entry.mtime) == stat):
+                        continue
+                    # 内容变化后原来的来源和哈希都不再可信
+                    conn.execute(
+                        "INSERT OR REPLACE INTO files "
+                        "(path, size, mtime, sha256, url_key, etag, indexed) "
+                        "VALUES (?, ?, ?, NULL, NULL, NULL, ?)",
+                        (path, stat[0], stat[1], now),
+                    )
+                _forget(known)
+        _scanned_dirs[directory] = dir_stat[1]
+    except sqlite3.Error as e:
+        logger.error(f"更新下载索引失败: {e}")
+
+
+def _like_prefix(directory):
+    escaped = directory.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + os.sep.replace("\\", "\\\\") + "%"
+
+
+def _save(entry):
+    with _index_lock:
+        with _get_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, size, mtime, sha256, url_key, etag, indexed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.path,
+                    entry.size,
+                    entry.mtime,
+                    entry.sha256,
+                    entry.url_key,
+                    entry.etag,
+                    time.time(),
+                ),
+            )
+
+
+def _hash_entry(entry):
+    """返回文件的哈希，尚未计算时计算并保存；文件已变化或无法读取时返回 None。"""
+    if not entry.is_current():
+        return None
+    if entry.sha256 is None:
+        try:
+            entry.sha256 = file_sha256(entry.path)
+        except OSError:
+            return None
+        with _index_lock:
+            with _get_connection() as conn:
+                conn.execute(
+                    "UPDATE files SET sha256 = ? "
+                    "WHERE path = ? AND size = ? AND mtime = ?",
+                    (entry.sha256, entry.path, entry.size, entry.mtime),
+                )
+    return entry.sha256
+
+
+def find(url=None, size=None, sha256=None, hash_missing=False):
+    """
+    查找与待下载资源相同的本地文件，返回 IndexedFile 或 None。
+    依次按 URL (大小已知时须一致) 和内容哈希匹配；hash_missing=True 时会为大小相同、
+    尚无哈希的文件计算哈希 (需要读取文件，只应在后台线程使用)。
+    """
+    try:
+        with _index_lock:
+            by_url = _select("url_key = ?", (normalize_url(url),)) if url else []
+            by_hash = _select("sha256 = ?", (sha256,)) if sha256 else []
+            unhashed = (
+                _select("size = ? AND sha256 IS NULL", (size,))
+                if sha256 and size is not None and hash_missing
+                else []
+            )
+    except sqlite3.Error as e:
+        logger.error(f"查询下载索引失败: {e}")
+        return None
+    for entry in by_url:
+        if (size is None or entry.size == size) and entry.is_current():
+            if sha256 and (entry.sha256 or hash_missing):
+                if _hash_entry(entry) != sha256:
+                    continue
+            return entry
+    for entry in by_hash:
+        if (size is None or entry.size == size) and entry.is_current():
+            return entry
+    for entry in unhashed:
+        if _hash_entry(entry) == sha256:
+            return entry
+    return None
+
+
+def record_download(path, url=None, etag=None, sha256=None):
+    """
+    登记一个刚下载完成的文件。若索引中已有内容相同的文件，把新文件替换为指向它的硬链接，
+    返回被链接的已有文件路径；否则返回 None。
+    """
+    path = os.path.abspath(path)
+    stat = _stat(path)
+    if stat is None:
+        return None
+    entry = IndexedFile(
+        path, stat[0], stat[1], sha256, normalize_url(url) if url else None, etag
+    )
+    linked = None
+    try:
+        with _index_lock:
+            candidates = (
+                _select("size = ? AND path != ?", (entry.size, path))
+                if entry.size
+                else []
+            )
+        for other in candidates:
+            if sha256 and other.sha256 and other.sha256 != sha256:
+                continue
+            if _hash_entry(other) and _hash_entry(entry) == other.sha256:
+                if _replace_with_link(other.path, path):
+                    linked = other.path
+                    entry.mtime = _stat(path)[1]
+                break
+        _save(entry)
+    except sqlite3.Error as e:
+        logger.error(f"更新下载索引失败: {e}")
+    return linked
+
+
+def _replace_with_link(source, target):
+    """用指向 source 的硬链接原子地替换 target；文件系统不支持硬链接时返回 False。"""
+    temp_path = f"{target}.link{os.getpid()}"
+    try:
+        os.link(source, temp_path)
+        os.replace(temp_path, target)
+        return True
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+
+def reuse(entry, download_path):
+    """
+    用已有的相同文件代替一次下载：目标就是该文件时什么都不做，否则建立硬链接
+    (不支持硬链接时复制)。返回 True 表示目标文件已就绪。
+    """
+    download_path = os.path.abspath(download_path)
+    if os.path.normcase(entry.path) == os.path.normcase(download_path):
+        return True
+    if not _replace_with_link(entry.path, download_path):
+        try:
+            shutil.copy2(entry.path, download_path)
+        except OSError as e:
+            logger.warning(f"复用已下载文件失败，将重新下载: {e}")
+            return False
+    stat = _stat(download_path)
+    if stat is not None:
+        try:
+            _save(
+                IndexedFile(
+                    download_path, *stat, entry.sha256, entry.url_key, entry.etag
+                )
+            )
+        except sqlite3.Error as e:
+            logger.error(f"更新下载索引失败: {e}")
+    return True
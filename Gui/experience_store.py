@@ -0,0 +1,149 @@
+# experience_store.py
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+EXPERIENCE_DB_FILE = "strategy_experience.db"
+EXPERIENCE_FLUSH_INTERVAL = 2.0
+EXPERIENCE_FLUSH_BATCH = 64
+STATS_FIELDS = ("successes", "failures", "time_total", "time_count", "updated")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS experience (
+    domain TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    successes REAL NOT NULL DEFAULT 0,
+    failures REAL NOT NULL DEFAULT 0,
+    time_total REAL NOT NULL DEFAULT 0,
+    time_count REAL NOT NULL DEFAULT 0,
+    updated REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (domain, strategy)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_UPSERT = """
+INSERT INTO experience (domain, strategy, successes, failures, time_total, time_count, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (domain, strategy) DO UPDATE SET
+    successes = excluded.successes,
+    failures = excluded.failures,
+    time_total = excluded.time_total,
+    time_count = excluded.time_count,
+    updated = excluded.updated
+"""
+
+
+class ExperienceStore:
+    """
+    基于 SQLite (WAL) 的策略经验存储。
+    读取全部走内存镜像；写入只标记脏键，由后台线程批量 UPSERT，在单个事务中提交。
+    """
+
+    def __init__(self, path=None, flush_interval=EXPERIENCE_FLUSH_INTERVAL):
+        path = path or EXPERIENCE_DB_FILE
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._wake = threading.Event()
+        self._closed = False
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="experience-flush", daemon=True
+        )
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def load_all(self):
+        """读取全部经验数据，返回 {域名: {策略: 统计}} 形式的内存镜像。"""
+        data = {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT domain, strategy, {', '.join(STATS_FIELDS)} FROM experience"
+            ).fetchall()
+        for domain, strategy, *values in rows:
+            data.setdefault(domain, {})[strategy] = dict(zip(STATS_FIELDS, values))
+        return data
+
+    def import_json(self, json_path, convert=None):
+        """
+        一次性导入旧版 JSON 经验文件。已导入过 (meta 中有记录) 时跳过，返回导入的条目数。
+        convert 用于把旧格式的值转换为统计字典。
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with self._lock:
+            if self._conn.execute(
+                "SELECT 1 FROM meta WHERE key = 'json_imported'"
+            ).fetchone():
+                return 0
+        try:
+            with open(json_path, "r") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"导入旧版经验数据失败: {e}")
+            return 0
+        rows = []
+        for domain, strategies in data.items():
+            for strategy, stats in strategies.items():
+                stats = convert(stats) if convert else stats
+                rows.append(
+                    (domain, strategy, *(stats.get(f, 0) for f in STATS_FIELDS))
+                )
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)",
+                (os.path.abspath(json_path),),
+            )
+        logger.info(f"已从 {json_path} 导入 {len(rows)} 条经验数据。")
+        return len(rows)
+
+    def put(self, domain, strategy, stats):
+        """登记一条更新，由后台线程批量写入。"""
+        with self._lock:
+            self._dirty[(domain, strategy)] = dict(stats)
+            pending = len(self._dirty)
+        if pending >= EXPERIENCE_FLUSH_BATCH:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty or self._closed:
+                return
+            rows = [
+                (domain, strategy, *(stats.get(f, 0) for f in STATS_FIELDS))
+                for (domain, strategy), stats in self._dirty.items()
+            ]
+            try:
+                with self._conn:
+                    self._conn.executemany(_UPSERT, rows)
+                self._dirty.clear()
+            except sqlite3.Error as e:
+                # 保留脏键，下一轮重试
+                logger.error(f"保存经验数据失败: {e}")
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+        self._wake.set()
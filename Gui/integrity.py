@@ -0,0 +1,82 @@
+# integrity.py
+
+import hashlib
+
+# 下载索引使用的哈希算法，每个直链下载都会计算
+INDEX_HASH_ALGORITHM = "sha256"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def parse_digest(digest):
+    """
+    解析 "算法:十六进制摘要" 形式的摘要 (如 GitHub 资产的 "sha256:...")，
+    返回 (算法, 小写摘要)；格式不对或算法不受支持时返回 None。
+    """
+    if not digest or ":" not in digest:
+        return None
+    algorithm, value = digest.split(":", 1)
+    algorithm = algorithm.strip().lower().replace("-", "")
+    if algorithm not in hashlib.algorithms_guaranteed:
+        return None
+    return algorithm, value.strip().lower()
+
+
+def expected_sha256(digest):
+    parsed = parse_digest(digest)
+    return parsed[1] if parsed and parsed[0] == INDEX_HASH_ALGORITHM else None
+
+
+class StreamVerifier:
+    """
+    在写入下载数据的同一遍中计算哈希，结束时核对大小和摘要，不需要再读一遍文件。
+    总是计算 INDEX_HASH_ALGORITHM；嗅探引擎提供了其他算法的摘要时同时计算该算法。
+    """
+
+    def __init__(self, expected_size=None, expected_digest=None):
+        self.expected_size = expected_size
+        self.expected = parse_digest(expected_digest)
+        algorithms = {INDEX_HASH_ALGORITHM}
+        if self.expected:
+            algorithms.add(self.expected[0])
+        self._hashes = {name: hashlib.new(name) for name in algorithms}
+        self.size = 0
+
+    def update(self, chunk):
+        for digest in self._hashes.values():
+            digest.update(chunk)
+        self.size += len(chunk)
+
+    def absorb_file(self, path, length):
+        """续传时先把已下载部分计入哈希 (只读取这一部分，新数据仍在写入时计算)。"""
+        with open(path, "rb") as f:
+            while length > 0:
+                chunk = f.read(min(HASH_CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                self.update(chunk)
+                length -= len(chunk)
+
+    def hexdigest(self, algorithm=INDEX_HASH_ALGORITHM):
+        return self._hashes[algorithm].hexdigest()
+
+    def verify(self, transferred_size=None):
+        """
+        核对下载结果，返回错误说明；全部一致时返回 None。
+        transferred_size 为服务器声明的总大小，用于发现连接提前断开导致的截断。
+        """
+        for label, size in (
+            ("服务器声明", transferred_size),
+            ("预期", self.expected_size),
+        ):
+            if size and self.size != size:
+                return f"文件大小不符 ({label} {size} 字节，实际 {self.size} 字节)"
+        if self.expected:
+            algorithm, value = self.expected
+            actual = self.hexdigest(algorithm)
+            if actual != value:
+                return f"{algorithm.upper()} 不符 (预期 {value}，实际 {actual})"
+        return None
+
+    @property
+    def has_digest(self):
+        return self.expected is not None
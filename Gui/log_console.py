@@ -0,0 +1,224 @@
+# log_console.py
+
+import html
+import logging
+import logging.handlers
+import queue
+import re
+import time
+from collections import OrderedDict, deque
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QHBoxLayout,
+    QLabel,
+    QPlainTextEdit,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+logger = logging.getLogger(__name__)
+console_logger = logging.getLogger("console")
+
+LOG_FILE = "sniffer_gui.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+LOG_FLUSH_INTERVAL_MS = 200
+# 每次刷新最多渲染的行数；更早的行仍保存在历史和日志文件中
+LOG_FLUSH_MAX_LINES = 500
+# 日志视图最多显示的行数；历史环形缓冲区保留更多行，用于切换筛选条件后重新显示
+LOG_MAX_LINES = 3000
+LOG_HISTORY_LINES = 20000
+# 任务筛选下拉框最多保留的任务数，超出时移除最久没有日志的任务
+LOG_TASK_FILTER_MAX = 30
+
+LEVEL_FILTERS = (
+    ("全部级别", logging.DEBUG),
+    ("警告及以上", logging.WARNING),
+    ("仅错误", logging.ERROR),
+)
+ALL_TASKS = "全部任务"
+
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+_listener = None
+
+
+def setup_file_logging(path=LOG_FILE):
+    """
+    把根日志器接到滚动日志文件。
+    日志通过队列交给后台监听线程写盘，调用方 (包括 GUI 线程) 只做一次入队。
+    """
+    global _listener
+    if _listener is not None:
+        return
+    try:
+        file_handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=LOG_FILE_MAX_BYTES,
+            backupCount=LOG_FILE_BACKUPS,
+            encoding="utf-8",
+        )
+    except OSError as e:
+        logger.warning(f"无法打开日志文件 {path}: {e}")
+        return
+    file_handler.setFormatter(
+        logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    )
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _listener.start()
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+
+def stop_file_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def plain_text(message):
+    return html.unescape(_TAG_PATTERN.sub("", message))
+
+
+class LogEntry:
+    __slots__ = ("created", "level", "task", "message")
+
+    def __init__(self, message, level, task):
+        self.created = time.time()
+        self.level = level
+        self.task = task
+        self.message = message
+
+
+class LogConsole(QWidget):
+    """
+    带缓冲的日志控制台。
+    write() 可在任意线程调用，只把日志放入待显示队列并转交文件日志；
+    GUI 线程由定时器批量取出显示，视图行数有上限，日志量再大也不会拖慢界面。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pending = deque()
+        self._history = deque(maxlen=LOG_HISTORY_LINES)
+        # 任务标签 -> None，按最近一次出现日志的顺序排列
+        self._tasks = OrderedDict()
+        self._min_level = LEVEL_FILTERS[0][1]
+        self._task_filter = None
+
+        self.view = QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setMaximumBlockCount(LOG_MAX_LINES)
+        self.view.setFont(QFont("Courier New", 9))
+
+        self.level_combo = QComboBox()
+        for label, _ in LEVEL_FILTERS:
+            self.level_combo.addItem(label)
+        self.task_combo = QComboBox()
+        self.task_combo.addItem(ALL_TASKS)
+        self.task_combo.setMinimumContentsLength(24)
+        self.task_combo.setSizeAdjustPolicy(
+            QComboBox.SizeAdjustPolicy.AdjustToMinimumContentsLengthWithIcon
+        )
+        self.clear_button = QPushButton("清空")
+
+        filter_layout = QHBoxLayout()
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+        filter_layout.addWidget(QLabel("日志:"))
+        filter_layout.addStretch()
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addWidget(self.task_combo)
+        filter_layout.addWidget(self.clear_button)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.view)
+
+        self.level_combo.currentIndexChanged.connect(self._on_filter_changed)
+        self.task_combo.currentIndexChanged.connect(self._on_filter_changed)
+        self.clear_button.clicked.connect(self.clear)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(LOG_FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def write(self, message, task=None, level=logging.INFO):
+        """线程安全：登记一条日志，稍后由定时器显示。级别由调用方给出。"""
+        self._pending.append(LogEntry(message, level, task))
+        text = plain_text(message)
+        console_logger.log(level, f"[{task}] {text}" if task else text)
+
+    def append(self, message, level=logging.INFO):
+        """兼容 QTextEdit.append 的接口，供主窗口直接输出全局日志。"""
+        self.write(message, level=level)
+
+    def _accepts(self, entry):
+        if entry.level < self._min_level:
+            return False
+        return self._task_filter is None or entry.task == self._task_filter
+
+    def flush(self):
+        if not self._pending:
+            return
+        batch = []
+        while self._pending:
+            batch.append(self._pending.popleft())
+        self._history.extend(batch)
+        for entry in batch:
+            if entry.task:
+                self._track_task(entry.task)
+        accepted = [entry for entry in batch if self._accepts(entry)]
+        self._render(accepted[-LOG_FLUSH_MAX_LINES:])
+
+    def _track_task(self, task):
+        if task in self._tasks:
+            self._tasks.move_to_end(task)
+            return
+        self._tasks[task] = None
+        self.task_combo.addItem(task)
+        if len(self._tasks) <= LOG_TASK_FILTER_MAX:
+            return
+        # 删除当前项之前的条目会改变下标，屏蔽信号以免触发重新筛选
+        self.task_combo.blockSignals(True)
+        for stale in list(self._tasks)[: len(self._tasks) - LOG_TASK_FILTER_MAX]:
+            if stale != self._task_filter:
+                del self._tasks[stale]
+                self.task_combo.removeItem(self.task_combo.findText(stale))
+        self.task_combo.blockSignals(False)
+
+    def _render(self, entries):
+        if not entries:
+            return
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        # 整批拼成一次 appendHtml，每个 <p> 仍是独立的文本块，受 maximumBlockCount 约束
+        self.view.appendHtml(
+            "".join(
+                f"<p><span style='color:#5c6370'>"
+                f"{time.strftime('%H:%M:%S', time.localtime(entry.created))}"
+                f"</span> {entry.message}</p>"
+                for entry in entries
+            )
+        )
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def _on_filter_changed(self):
+        self._min_level = LEVEL_FILTERS[self.level_combo.currentIndex()][1]
+        task = self.task_combo.currentText()
+        self._task_filter = None if task == ALL_TASKS else task
+        self.view.clear()
+        accepted = [entry for entry in self._history if self._accepts(entry)]
+        self._render(accepted[-LOG_MAX_LINES:])
+
+    def clear(self):
+        self._history.clear()
+        self.view.clear()
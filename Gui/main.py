@@ -1,9 +1,10 @@
 # main.py
+import multiprocessing
 import sys
 from PyQt6.QtWidgets import QApplication
 from app_window import AppWindow
-
-# (日志配置与上一版相同)
+import log_console
+import ytdlp_helper
 
 # --- [全新] 精致Emo朋克 (Polished Emo-Punk) QSS 样式表 ---
 POLISHED_EMO_PUNK_QSS = """
@@ -33,7 +34,7 @@ QLabel {
 }
 
 /* --- 输入框、树、日志 --- */
-QLineEdit, QTextEdit, QTreeWidget {
+QLineEdit, QPlainTextEdit, QTreeView {
     background-color: #282c34;
     color: #dbe0e8;
     border: 1px solid #3a3f4b;
@@ -41,35 +42,43 @@ QLineEdit, QTextEdit, QTreeWidget {
     padding: 8px;
 }
 
-QLineEdit:focus, QTreeWidget:focus {
+QSpinBox {
+    background-color: #282c34;
+    color: #dbe0e8;
+    border: 1px solid #3a3f4b;
+    border-radius: 6px;
+    padding: 4px;
+}
+
+QLineEdit:focus, QTreeView:focus {
     border: 1px solid #61afef; /* 清澈的蓝色焦点 */
     background-color: #2c313a;
 }
 
-QTextEdit {
+QPlainTextEdit {
     font-family: "Consolas", "Courier New", monospace;
     font-size: 9.5pt;
 }
 
 /* --- 树形控件美化 --- */
-QTreeWidget::item {
+QTreeView::item {
     padding: 6px;
     border-radius: 4px;
 }
-QTreeWidget::item:hover {
+QTreeView::item:hover {
     background-color: rgba(97, 175, 239, 0.1); /* 悬停时为蓝色微光 */
 }
-QTreeWidget::item:selected {
+QTreeView::item:selected {
     background-color: #61afef; /* 选中行为清澈蓝 */
     color: #1e2127;
 }
-QTreeWidget::branch:has-children:!has-siblings:closed,
-QTreeWidget::branch:closed:has-children:has-siblings {
+QTreeView::branch:has-children:!has-siblings:closed,
+QTreeView::branch:closed:has-children:has-siblings {
     border-image: none;
     image: url(none); /* 使用自定义或无图标 */
 }
-QTreeWidget::branch:open:has-children:!has-siblings,
-QTreeWidget::branch:open:has-children:has-siblings {
+QTreeView::branch:open:has-children:!has-siblings,
+QTreeView::branch:open:has-children:has-siblings {
     border-image: none;
     image: url(none); /* 使用自定义或无图标 */
 }
@@ -168,8 +177,14 @@ QSplitter::handle:hover {
 """
 
 if __name__ == "__main__":
+    # 打包后 yt-dlp 辅助进程会重新执行本程序，需由 freeze_support 接管
+    multiprocessing.freeze_support()
+    ytdlp_helper.prestart()
+    log_console.setup_file_logging()
     app = QApplication(sys.argv)
     app.setStyleSheet(POLISHED_EMO_PUNK_QSS)
     window = AppWindow()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    exit_code = app.exec()
+    log_console.stop_file_logging()
+    sys.exit(exit_code)
\ No newline at end of file
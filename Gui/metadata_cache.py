@@ -0,0 +1,163 @@
+# metadata_cache.py
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+METADATA_CACHE_DIR = "yt_dlp_metadata_cache"
+# 缓存时长需短于流地址的过期时间 (例如 YouTube 的 expire 参数约 6 小时)
+METADATA_CACHE_TTL = 3 * 3600
+METADATA_EXPIRY_MARGIN = 15 * 60
+METADATA_PURGE_INTERVAL = 3600
+
+_cache_lock = threading.Lock()
+_last_purge = 0
+
+
+def _ensure_cache_dir():
+    os.makedirs(METADATA_CACHE_DIR, exist_ok=True)
+
+
+def make_cache_key(extractor_key, video_id):
+    return re.sub(r"[^\w.-]", "_", f"{extractor_key}_{video_id}")
+
+
+def _data_path(key):
+    return os.path.join(METADATA_CACHE_DIR, f"{key}.json.gz")
+
+
+def _alias_path(url):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(METADATA_CACHE_DIR, f"url_{digest}.key")
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _stream_expiry(info):
+    """从格式地址的 expire 参数推断最早过期时间，无法推断时返回 None。"""
+    expiries = []
+    for fmt in info.get("formats") or []:
+        query = parse_qs(urlparse(fmt.get("url", "")).query)
+        for name in ("expire", "expires", "Expires"):
+            value = query.get(name, [""])[0]
+            if value.isdigit():
+                expiries.append(int(value))
+                break
+    return min(expiries) if expiries else None
+
+
+def store(url, info):
+    """
+    以 提取器+视频ID 为键压缩保存 --dump-json 结果，并为 url 建立别名。
+    返回缓存键，信息不完整时返回 None。
+    """
+    if not info.get("extractor_key") or not info.get("id"):
+        return None
+    key = make_cache_key(info["extractor_key"], info["id"])
+    expires_at = time.time() + METADATA_CACHE_TTL
+    if stream_expiry := _stream_expiry(info):
+        expires_at = min(expires_at, stream_expiry - METADATA_EXPIRY_MARGIN)
+    if expires_at <= time.time():
+        return None
+    payload = json.dumps({"expires_at": expires_at, "info": info}).encode("utf-8")
+    try:
+        with _cache_lock:
+            _ensure_cache_dir()
+            _write_atomic(_data_path(key), gzip.compress(payload, compresslevel=5))
+            for alias in {url, info.get("webpage_url"), info.get("original_url")}:
+                if alias:
+                    _write_atomic(_alias_path(alias), key.encode("utf-8"))
+    except OSError as e:
+        logger.warning(f"写入 yt-dlp 元数据缓存失败: {e}")
+        return None
+    _purge_expired_periodically()
+    return key
+
+
+def resolve_key(url):
+    alias_path = _alias_path(url)
+    if not os.path.exists(alias_path):
+        return None
+    try:
+        with open(alias_path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def load_by_key(key):
+    """读取缓存的完整元数据，已过期或不存在时返回 None。"""
+    path = _data_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rb") as f:
+            entry = json.loads(f.read().decode("utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取 yt-dlp 元数据缓存失败: {e}")
+        return None
+    if entry.get("expires_at", 0) <= time.time():
+        return None
+    return entry["info"]
+
+
+def load(url, key=None):
+    key = key or resolve_key(url)
+    return load_by_key(key) if key else None
+
+
+def materialize_info_json(url, key=None):
+    """
+    为下载步骤生成未压缩的 .info.json (供 yt-dlp --load-info-json 使用)，
+    缓存缺失或过期时返回 None。
+    """
+    key = key or resolve_key(url)
+    if not key:
+        return None
+    info = load_by_key(key)
+    if info is None:
+        return None
+    path = os.path.join(METADATA_CACHE_DIR, f"{key}.info.json")
+    try:
+        with _cache_lock:
+            if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(
+                _data_path(key)
+            ):
+                _write_atomic(path, json.dumps(info).encode("utf-8"))
+    except OSError as e:
+        logger.warning(f"生成 info.json 失败: {e}")
+        return None
+    return os.path.abspath(path)
+
+
+def _purge_expired_periodically():
+    global _last_purge
+    now = time.time()
+    if now - _last_purge < METADATA_PURGE_INTERVAL:
+        return
+    _last_purge = now
+    try:
+        names = os.listdir(METADATA_CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(METADATA_CACHE_DIR, name)
+        try:
+            # 别名和展开的 info.json 均以数据文件的最长寿命为上限
+            if now - os.path.getmtime(path) > METADATA_CACHE_TTL:
+                os.remove(path)
+        except OSError:
+            pass
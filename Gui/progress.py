@@ -0,0 +1,157 @@
+# progress.py
+
+import re
+import threading
+import time
+from collections import deque
+
+# 进度回调的最小间隔 (秒)，无论底层多频繁地报告进度
+PROGRESS_INTERVAL = 0.25
+# 瞬时速度取最近这段时间内的平均值，避免单个分片造成跳动
+SPEED_WINDOW = 3.0
+
+# yt-dlp --progress-template，字段以 "/" 分隔，未知值输出为 NA
+YT_DLP_PROGRESS_TEMPLATE = (
+    "download-stream:%(progress.downloaded_bytes)s/%(progress.total_bytes)s"
+    "/%(progress.total_bytes_estimate)s/%(progress.speed)s/%(progress.eta)s"
+    "/%(progress.elapsed)s"
+)
+_YT_DLP_PROGRESS_PATTERN = re.compile(r"download-stream:(\S+)")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_snapshot(done, total=None, speed=None, avg_speed=None, eta=None):
+    """
+    进度快照，所有下载方式使用同一结构：
+    done/total 为字节数 (total 未知时为 None)，speed/avg_speed 为字节/秒，eta 为秒。
+    """
+    percent = min(100.0, done * 100.0 / total) if total else None
+    return {
+        "done": done,
+        "total": total,
+        "percent": percent,
+        "speed": speed,
+        "avg_speed": avg_speed,
+        "eta": eta,
+    }
+
+
+def parse_yt_dlp_progress(line):
+    """解析 YT_DLP_PROGRESS_TEMPLATE 输出的一行，不是进度行时返回 None。"""
+    match = _YT_DLP_PROGRESS_PATTERN.search(line)
+    if not match:
+        return None
+    fields = match.group(1).split("/")
+    if len(fields) != 6:
+        return None
+    done, total, estimate, speed, eta, elapsed = (_number(f) for f in fields)
+    if done is None:
+        return None
+    total = total or estimate
+    avg_speed = done / elapsed if elapsed else None
+    return make_snapshot(done, total, speed, avg_speed, eta)
+
+
+def format_bytes(size):
+    if size is None:
+        return "未知"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.2f} {unit}"
+        size /= 1024
+
+
+def format_speed(speed):
+    return f"{format_bytes(speed)}/s" if speed else ""
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return (
+        f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+    )
+
+
+class ProgressTracker:
+    """
+    统计下载量并以固定频率向 callback 报告进度快照。
+    advance()/update() 可以每个数据块调用一次，只有间隔超过 interval 时才真正回调；
+    finish() 总是立即报告最终状态。线程安全 (HLS 分片由多个线程写入)。
+    """
+
+    def __init__(self, callback, total=None, interval=PROGRESS_INTERVAL, done=0):
+        self.callback = callback
+        self.total = total or None
+        self.interval = interval
+        # done 为续传时已有的字节数，不计入速度
+        self.done = self._initial = done
+        self._started = time.monotonic()
+        self._last_report = 0.0
+        self._samples = deque([(self._started, done)])
+        self._lock = threading.Lock()
+
+    def advance(self, nbytes):
+        with self._lock:
+            self.done += nbytes
+            snapshot = self._snapshot_if_due()
+        if snapshot:
+            self.callback(snapshot)
+
+    def update(self, done, total=None):
+        with self._lock:
+            self.done = done
+            if total:
+                self.total = total
+            snapshot = self._snapshot_if_due()
+        if snapshot:
+            self.callback(snapshot)
+
+    def report(self, snapshot):
+        """转发外部已经算好的快照 (如 yt-dlp 的进度)，同样受频率限制。"""
+        with self._lock:
+            self.done = snapshot["done"]
+            self.total = snapshot["total"] or self.total
+            now = time.monotonic()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self.callback(snapshot)
+
+    def finish(self):
+        """报告下载完成：已完成量补齐到总量 (总量只是估算值时二者可能略有出入)。"""
+        with self._lock:
+            self.done = self.total = max(self.done, self.total or 0)
+            snapshot = self._snapshot(time.monotonic())
+            snapshot["percent"], snapshot["eta"] = 100.0, 0
+        self.callback(snapshot)
+
+    def _snapshot_if_due(self):
+        now = time.monotonic()
+        if now - self._last_report < self.interval:
+            return None
+        self._last_report = now
+        return self._snapshot(now)
+
+    def _snapshot(self, now):
+        self._samples.append((now, self.done))
+        while len(self._samples) > 2 and now - self._samples[0][0] > SPEED_WINDOW:
+            self._samples.popleft()
+        first_time, first_done = self._samples[0]
+        speed = (
+            (self.done - first_done) / (now - first_time) if now > first_time else None
+        )
+        elapsed = now - self._started
+        avg_speed = (self.done - self._initial) / elapsed if elapsed > 0 else None
+        eta = None
+        if self.total and speed:
+            eta = max(0.0, (self.total - self.done) / speed)
+        return make_snapshot(self.done, self.total, speed, avg_speed, eta)
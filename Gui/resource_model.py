@@ -0,0 +1,362 @@
+# resource_model.py
+
+import re
+from collections import OrderedDict
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt
+
+RESOURCE_HEADERS = ["资源/格式", "类型/编码", "分辨率", "大小", "链接/备注"]
+# 每个分组初始提供给视图的行数，以及每次滚动到底部时追加的行数
+RESOURCE_FETCH_BATCH = 200
+RESOURCE_MODEL_CACHE_SIZE = 20
+LINK_ENGINES = ("html", "github_api", "direct_link_checker", "browser")
+
+_RESOLUTION_PATTERN = re.compile(r"(\d+)x(\d+)")
+# flags() 对每个可见单元格都会调用，预先组合好避免重复的枚举运算
+_GROUP_FLAGS = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+_CHECKABLE_FLAGS = _GROUP_FLAGS | Qt.ItemFlag.ItemIsUserCheckable
+
+
+def _format_size(size, unknown):
+    return f"{size / 1024 / 1024:.2f} MB" if isinstance(size, int) else unknown
+
+
+class _ResourceRow:
+    """一个可勾选的资源行，只引用嗅探记录中的 FormatRecord 或 LinkRecord。"""
+
+    __slots__ = ("record", "order", "checked")
+
+    def __init__(self, record, order):
+        self.record = record
+        self.order = order
+        self.checked = False
+
+
+class _FormatRow(_ResourceRow):
+    __slots__ = ()
+
+    def text(self, column):
+        f = self.record
+        if column == 0:
+            return f.format_note or f.format_id or "N/A"
+        if column == 1:
+            return f"{f.vcodec} / {f.acodec}"
+        if column == 2:
+            return f.resolution or "纯音频"
+        if column == 3:
+            return _format_size(f.filesize, "N/A")
+        return f.ext or "N/A"
+
+    def sort_key(self, column):
+        f = self.record
+        if column == 2:
+            match = _RESOLUTION_PATTERN.search(f.resolution or "")
+            return int(match.group(2)) if match else 0
+        if column == 3:
+            return f.filesize or 0
+        return self.text(column).lower()
+
+    def payload(self):
+        f = self.record
+        return {
+            "type": "yt-dlp",
+            "format_id": f.format_id,
+            "is_video_only": f.is_video and not f.is_audio,
+            "is_audio_only": f.is_audio and not f.is_video,
+        }
+
+    def matches(self, needle):
+        f = self.record
+        return any(
+            needle in (value or "").lower()
+            for value in (f.format_id, f.format_note, f.vcodec, f.acodec, f.ext)
+        )
+
+
+class _LinkRow(_ResourceRow):
+    __slots__ = ()
+
+    def text(self, column):
+        link = self.record
+        if column == 0:
+            return link.filename or "N/A"
+        if column == 1:
+            return link.mime or link.ext or ""
+        if column == 2:
+            return ""
+        if column == 3:
+            return _format_size(link.size, "未知")
+        return link.url
+
+    def sort_key(self, column):
+        if column == 3:
+            return self.record.size if isinstance(self.record.size, int) else -1
+        return self.text(column).lower()
+
+    def payload(self):
+        size = self.record.size
+        return {
+            "type": "direct",
+            "url": self.record.url,
+            "size": size if isinstance(size, int) else None,
+            "digest": self.record.digest,
+        }
+
+    def matches(self, needle):
+        link = self.record
+        return any(
+            needle in (value or "").lower()
+            for value in (link.filename, link.url, link.mime, link.ext)
+        )
+
+
+class _ResourceGroup:
+    """顶层分组 (视频流/音频流或链接类别)。rows 是筛选后的行，loaded 是已提供给视图的行数。"""
+
+    __slots__ = ("name", "icon", "all_rows", "rows", "loaded")
+
+    def __init__(self, name, icon=None):
+        self.name = name
+        self.icon = icon
+        self.all_rows = []
+        self.rows = []
+        self.loaded = 0
+
+    def reset_rows(self, needle):
+        if needle:
+            self.rows = [row for row in self.all_rows if row.matches(needle)]
+        else:
+            self.rows = list(self.all_rows)
+        self.loaded = min(len(self.rows), RESOURCE_FETCH_BATCH)
+
+
+class ResourceModel(QAbstractItemModel):
+    """
+    单个嗅探结果的资源列表模型。
+    行数据直接引用 SniffRecord 中的格式和链接，按批次懒加载；排序、筛选和勾选状态都保存在模型中，
+    切换任务时视图只需更换模型。
+    """
+
+    def __init__(self, record=None, group_icons=None, parent=None):
+        super().__init__(parent)
+        self.record = record
+        self._groups = []
+        self._visible = []
+        self._filter = ""
+        self._sort = (-1, Qt.SortOrder.AscendingOrder)
+        if record is not None and not record.error:
+            self._build(record, group_icons or {})
+        self._visible = [group for group in self._groups]
+        for group in self._groups:
+            group.reset_rows("")
+
+    def _build(self, record, group_icons):
+        if record.engine == "yt-dlp":
+            video = _ResourceGroup("视频流", group_icons.get("video"))
+            audio = _ResourceGroup("音频流", group_icons.get("audio"))
+            self._groups = [video, audio]
+            for order, fmt in enumerate(record.formats):
+                (video if fmt.is_video else audio).all_rows.append(
+                    _FormatRow(fmt, order)
+                )
+        elif record.engine in LINK_ENGINES:
+            groups = {}
+            for order, link in enumerate(record.links):
+                name = link.category or "其他"
+                if name not in groups:
+                    groups[name] = _ResourceGroup(name)
+                    self._groups.append(groups[name])
+                groups[name].all_rows.append(_LinkRow(link, order))
+
+    def _group_of(self, index):
+        # 子行的 internalPointer 指向所属分组，顶层分组的为 None
+        return index.internalPointer() if index.isValid() else None
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not 0 <= column < len(RESOURCE_HEADERS) or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            if row >= len(self._visible):
+                return QModelIndex()
+            return self.createIndex(row, column, None)
+        if parent.internalPointer() is not None or parent.column() != 0:
+            return QModelIndex()
+        group = self._visible[parent.row()]
+        if row >= group.loaded:
+            return QModelIndex()
+        return self.createIndex(row, column, group)
+
+    def parent(self, index):
+        group = self._group_of(index)
+        if group is None:
+            return QModelIndex()
+        return self.createIndex(self._visible.index(group), 0, None)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._visible)
+        if self._group_of(parent) is not None or parent.column() != 0:
+            return 0
+        return self._visible[parent.row()].loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(RESOURCE_HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._visible)
+        if self._group_of(parent) is not None or parent.column() != 0:
+            return False
+        return bool(self._visible[parent.row()].rows)
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or self._group_of(parent) is not None:
+            return False
+        group = self._visible[parent.row()]
+        return group.loaded < len(group.rows)
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        group = self._visible[parent.row()]
+        count = min(RESOURCE_FETCH_BATCH, len(group.rows) - group.loaded)
+        self.beginInsertRows(parent, group.loaded, group.loaded + count - 1)
+        group.loaded += count
+        self.endInsertRows()
+
+    def _row(self, index):
+        group = self._group_of(index)
+        return group.rows[index.row()] if group is not None else None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._row(index)
+        column = index.column()
+        if row is None:
+            group = self._visible[index.row()]
+            if column != 0:
+                return None
+            if role == Qt.ItemDataRole.DisplayRole:
+                return f"{group.name} ({len(group.rows)})"
+            if role == Qt.ItemDataRole.DecorationRole:
+                return group.icon
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return row.text(column)
+        if role == Qt.ItemDataRole.CheckStateRole and column == 0:
+            return Qt.CheckState.Checked if row.checked else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.ToolTipRole and column == 4:
+            return row.text(column)
+        if role == Qt.ItemDataRole.UserRole:
+            return row.payload()
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        row = self._row(index) if index.isValid() else None
+        if row is None or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        row.checked = Qt.CheckState(value) == Qt.CheckState.Checked
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        if index.column() == 0 and index.internalPointer() is not None:
+            return _CHECKABLE_FLAGS
+        return _GROUP_FLAGS
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if (
+            orientation == Qt.Orientation.Horizontal
+            and role == Qt.ItemDataRole.DisplayRole
+        ):
+            return RESOURCE_HEADERS[section]
+        return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """在各分组内排序；column 为 -1 时恢复嗅探结果的原始顺序。"""
+        if (column, order) == self._sort:
+            return
+        self._sort = (column, order)
+        self.beginResetModel()
+        for group in self._groups:
+            if column < 0:
+                group.all_rows.sort(key=lambda row: row.order)
+            else:
+                group.all_rows.sort(
+                    key=lambda row: row.sort_key(column),
+                    reverse=order == Qt.SortOrder.DescendingOrder,
+                )
+            group.reset_rows(self._filter)
+        self.endResetModel()
+
+    def set_filter(self, text):
+        """按文件名、链接或格式信息筛选 (不区分大小写)，勾选状态不受影响。"""
+        needle = text.strip().lower()
+        if needle == self._filter:
+            return
+        self._filter = needle
+        self.beginResetModel()
+        for group in self._groups:
+            group.reset_rows(needle)
+        self._visible = [group for group in self._groups if group.rows or not needle]
+        self.endResetModel()
+
+    def set_checked(self, indexes, checked):
+        """批量设置勾选状态；indexes 中的分组行表示该分组下所有 (筛选后的) 行。"""
+        for index in indexes:
+            if not index.isValid() or index.column() != 0:
+                continue
+            row = self._row(index)
+            if row is not None:
+                row.checked = checked
+            else:
+                for row in self._visible[index.row()].rows:
+                    row.checked = checked
+        self._emit_check_state_changed()
+
+    def set_all_checked(self, checked):
+        """勾选或取消当前筛选结果中的所有行。"""
+        for group in self._visible:
+            for row in group.rows:
+                row.checked = checked
+        self._emit_check_state_changed()
+
+    def _emit_check_state_changed(self):
+        for group_row, group in enumerate(self._visible):
+            if group.loaded:
+                parent = self.index(group_row, 0)
+                self.dataChanged.emit(
+                    self.index(0, 0, parent),
+                    self.index(group.loaded - 1, 0, parent),
+                    [Qt.ItemDataRole.CheckStateRole],
+                )
+
+    def checked_payloads(self):
+        """返回所有勾选行的下载参数，包括当前被筛选隐藏的行，按原始顺序排列。"""
+        rows = [row for group in self._groups for row in group.all_rows if row.checked]
+        return [row.payload() for row in sorted(rows, key=lambda row: row.order)]
+
+
+class ResourceModelCache:
+    """按任务 URL 缓存最近使用的资源模型；嗅探结果更新后对应的模型自动重建。"""
+
+    def __init__(self, group_icons=None, capacity=RESOURCE_MODEL_CACHE_SIZE):
+        self.group_icons = group_icons or {}
+        self.capacity = capacity
+        self._models = OrderedDict()
+
+    def get(self, url, record):
+        model = self._models.get(url)
+        if model is None or model.record is not record:
+            model = ResourceModel(record, self.group_icons)
+            self._models[url] = model
+        self._models.move_to_end(url)
+        while len(self._models) > self.capacity:
+            self._models.popitem(last=False)
+        return model
+
+    def discard(self, url):
+        self._models.pop(url, None)
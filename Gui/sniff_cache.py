@@ -0,0 +1,144 @@
+# sniff_cache.py
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from sniff_records import SniffRecord
+
+logger = logging.getLogger(__name__)
+
+SNIFF_CACHE_DB_FILE = "sniff_cache.db"
+# 各引擎结果的有效期 (秒)：yt-dlp 的流地址很快过期，GitHub 发布资产基本不变
+SNIFF_CACHE_TTL = {
+    "yt-dlp": 30 * 60,
+    "github_api": 24 * 3600,
+    "direct_link_checker": 12 * 3600,
+    "html": 2 * 3600,
+    "browser": 6 * 3600,
+}
+# 过期后在 TTL * SNIFF_CACHE_STALE_FACTOR 内仍可先显示旧结果，同时后台重新嗅探
+SNIFF_CACHE_STALE_FACTOR = 4
+SNIFF_CACHE_PURGE_INTERVAL = 3600
+TRACKING_PARAMS = ("utm_", "spm", "fbclid", "gclid", "share_source", "vd_source")
+
+_connection = None
+_cache_lock = threading.Lock()
+_last_purge = 0
+
+
+def normalize_url(url):
+    """统一大小写、默认端口、片段和跟踪参数，使同一资源的不同写法命中同一条缓存。"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower() or "http"
+    netloc = parsed.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse((scheme, netloc, path, parsed.params, urlencode(query), ""))
+
+
+def _get_connection():
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(
+            SNIFF_CACHE_DB_FILE, check_same_thread=False, timeout=10
+        )
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("""
+            CREATE TABLE IF NOT EXISTS sniff_cache (
+                url_key TEXT PRIMARY KEY,
+                engine TEXT,
+                payload TEXT NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL
+            )
+            """)
+    return _connection
+
+
+def lookup(url):
+    """
+    返回 (记录, 是否新鲜)。过期但仍在可用窗口内的记录返回 (记录, False)，
+    完全失效或不存在时返回 (None, False)。
+    """
+    try:
+        with _cache_lock:
+            row = (
+                _get_connection()
+                .execute(
+                    "SELECT payload, fresh_until, stale_until FROM sniff_cache "
+                    "WHERE url_key = ?",
+                    (normalize_url(url),),
+                )
+                .fetchone()
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"读取嗅探缓存失败: {e}")
+        return None, False
+    if not row:
+        return None, False
+    payload, fresh_until, stale_until = row
+    now = time.time()
+    if now >= stale_until:
+        return None, False
+    try:
+        record = SniffRecord.from_dict(json.loads(payload))
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"嗅探缓存条目损坏，已忽略: {e}")
+        return None, False
+    record.url = url
+    return record, now < fresh_until
+
+
+def store(record):
+    """保存成功的嗅探结果，失败结果和没有配置 TTL 的引擎 (如播放列表) 不缓存。"""
+    ttl = SNIFF_CACHE_TTL.get(record.engine)
+    if record.error or not ttl:
+        return
+    now = time.time()
+    try:
+        with _cache_lock:
+            connection = _get_connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO sniff_cache "
+                    "(url_key, engine, payload, fresh_until, stale_until) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        normalize_url(record.url),
+                        record.engine,
+                        json.dumps(record.to_dict(), ensure_ascii=False),
+                        now + ttl,
+                        now + ttl * SNIFF_CACHE_STALE_FACTOR,
+                    ),
+                )
+    except sqlite3.Error as e:
+        logger.warning(f"写入嗅探缓存失败: {e}")
+        return
+    _purge_expired_periodically()
+
+
+def _purge_expired_periodically():
+    global _last_purge
+    now = time.time()
+    if now - _last_purge < SNIFF_CACHE_PURGE_INTERVAL:
+        return
+    _last_purge = now
+    try:
+        with _cache_lock:
+            connection = _get_connection()
+            with connection:
+                connection.execute(
+                    "DELETE FROM sniff_cache WHERE stale_until <= ?", (now,)
+                )
+    except sqlite3.Error as e:
+        logger.warning(f"清理嗅探缓存失败: {e}")
@@ -0,0 +1,187 @@
+# sniff_records.py
+
+import sys
+
+
+def _intern(value):
+    # 编码、扩展名、类别等取值重复度极高，驻留后所有任务共享同一个字符串对象
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class FormatRecord:
+    """yt-dlp 单个格式中界面展示和下载所需的字段。"""
+
+    __slots__ = (
+        "format_id",
+        "format_note",
+        "vcodec",
+        "acodec",
+        "resolution",
+        "filesize",
+        "ext",
+    )
+
+    def __init__(
+        self, format_id, format_note, vcodec, acodec, resolution, filesize, ext
+    ):
+        self.format_id = format_id
+        self.format_note = format_note
+        self.vcodec = _intern(vcodec)
+        self.acodec = _intern(acodec)
+        self.resolution = _intern(resolution)
+        self.filesize = filesize
+        self.ext = _intern(ext)
+
+    @classmethod
+    def from_yt_dlp(cls, fmt):
+        return cls(
+            fmt.get("format_id"),
+            fmt.get("format_note"),
+            fmt.get("vcodec", "none"),
+            fmt.get("acodec", "none"),
+            fmt.get("resolution", "纯音频"),
+            fmt.get("filesize") or fmt.get("filesize_approx"),
+            fmt.get("ext", "N/A"),
+        )
+
+    def to_list(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+    @property
+    def is_video(self):
+        return self.vcodec != "none"
+
+    @property
+    def is_audio(self):
+        return self.acodec != "none"
+
+
+class LinkRecord:
+    """直接下载链接 (HTML/浏览器/GitHub/直链引擎的结果)。"""
+
+    # digest 为引擎提供的内容摘要 ("算法:十六进制")，放在最后以兼容旧的缓存记录
+    __slots__ = ("url", "filename", "category", "ext", "size", "mime", "digest")
+
+    def __init__(self, url, filename, category, ext, size=None, mime=None, digest=None):
+        self.url = url
+        self.filename = filename
+        self.category = _intern(category)
+        self.ext = _intern(ext)
+        self.size = size
+        self.mime = _intern(mime)
+        self.digest = digest
+
+    @classmethod
+    def from_dict(cls, link):
+        return cls(
+            link.get("url"),
+            link.get("filename", "N/A"),
+            link.get("category", "其他"),
+            link.get("ext"),
+            link.get("size"),
+            link.get("mime"),
+            link.get("digest"),
+        )
+
+    def to_list(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+class SniffRecord:
+    """
+    一次嗅探的精简结果。
+    只保留展示和下载需要的字段，完整的 yt-dlp 元数据通过 metadata_key 引用磁盘缓存。
+    """
+
+    __slots__ = (
+        "url",
+        "engine",
+        "title",
+        "error",
+        "formats",
+        "links",
+        "metadata_key",
+        "entry_count",
+    )
+
+    def __init__(
+        self,
+        url,
+        engine=None,
+        title=None,
+        error=None,
+        formats=(),
+        links=(),
+        metadata_key=None,
+        entry_count=0,
+    ):
+        self.url = url
+        self.engine = _intern(engine)
+        self.title = title
+        self.error = error
+        self.formats = formats
+        self.links = links
+        self.metadata_key = metadata_key
+        self.entry_count = entry_count
+
+    @classmethod
+    def from_result(cls, result, url):
+        """把引擎返回的原始字典转换为精简记录，原始字典随后即可释放。"""
+        if result.get("error"):
+            return cls(url, result.get("engine"), error=result["error"])
+        engine = result.get("engine")
+        if engine == "yt-dlp":
+            return cls(
+                url,
+                engine,
+                result.get("title", "无标题"),
+                formats=tuple(
+                    FormatRecord.from_yt_dlp(f) for f in result.get("formats") or []
+                ),
+                metadata_key=result.get("metadata_key"),
+            )
+        return cls(
+            url,
+            engine,
+            result.get("title", "无标题"),
+            links=tuple(LinkRecord.from_dict(link) for link in result.get("links", [])),
+            entry_count=result.get("entry_count", 0),
+        )
+
+    @classmethod
+    def from_playlist_entry(cls, entry):
+        return cls(entry["url"], "yt-dlp-entry", entry.get("title", ""))
+
+    def to_dict(self):
+        """序列化为可 JSON 保存的字典 (用于嗅探结果缓存)。"""
+        return {
+            "url": self.url,
+            "engine": self.engine,
+            "title": self.title,
+            "error": self.error,
+            "formats": [fmt.to_list() for fmt in self.formats],
+            "links": [link.to_list() for link in self.links],
+            "metadata_key": self.metadata_key,
+            "entry_count": self.entry_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["url"],
+            data.get("engine"),
+            data.get("title"),
+            data.get("error"),
+            tuple(FormatRecord.from_list(f) for f in data.get("formats", [])),
+            tuple(LinkRecord.from_list(link) for link in data.get("links", [])),
+            data.get("metadata_key"),
+            data.get("entry_count", 0),
+        )
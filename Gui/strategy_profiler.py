@@ -5,16 +5,31 @@ from urllib.parse import urlparse
 import re
 import os
 import json
+import random
+import threading
+import time
+from functools import lru_cache
+
+from experience_store import ExperienceStore
 
 logger = logging.getLogger(__name__)
 
 # [最终版] yt-dlp 不再有后端映射，完全由 worker 特殊处理
+# expected_time 为没有实测数据时假定的单次耗时 (秒)
 STRATEGY_METADATA = {
-    "direct_link_checker": {"backend": "sniff_engine_direct_link_checker", "cost": 2},
-    "github_api": {"backend": "sniff_engine_github_api", "cost": 2},
-    "yt_dlp": {"backend": None, "cost": 5},
-    "html_parser": {"backend": "sniff_engine_html_parser", "cost": 3},
-    "browser": {"backend": "sniff_engine_browser", "cost": 10},
+    "direct_link_checker": {
+        "backend": "sniff_engine_direct_link_checker",
+        "cost": 2,
+        "expected_time": 1.5,
+    },
+    "github_api": {"backend": "sniff_engine_github_api", "cost": 2, "expected_time": 2},
+    "yt_dlp": {"backend": None, "cost": 5, "expected_time": 5},
+    "html_parser": {
+        "backend": "sniff_engine_html_parser",
+        "cost": 3,
+        "expected_time": 3,
+    },
+    "browser": {"backend": "sniff_engine_browser", "cost": 10, "expected_time": 15},
 }
 AVAILABLE_STRATEGIES = {
     name: data["backend"]
@@ -22,53 +37,238 @@ AVAILABLE_STRATEGIES = {
     if data["backend"] is not None
 }
 
+# --- 策略竞速配置 ---
+# 同时运行前 RACE_TOP_K 个廉价策略 (相邻两次启动间隔 RACE_HEDGE_DELAY 秒，0 为同时启动)，
+# 首个成功的结果胜出；昂贵策略仅在廉价策略全部失败或停滞超过
+# RACE_BROWSER_STALL_TIMEOUT 秒后才启动。
+RACE_MODE_ENABLED = True
+RACE_TOP_K = 2
+RACE_HEDGE_DELAY = 1.5
+RACE_BROWSER_STALL_TIMEOUT = 8
+EXPENSIVE_STRATEGIES = ("browser",)
+
+# --- 经验学习配置 ---
+# 每个 (域名, 策略) 记录成功/失败次数和实测耗时，按半衰期指数衰减旧观测。
+# 先验由基础得分 (成功率) 和 expected_time (耗时) 给出，强度为 PRIOR_WEIGHT 次观测。
+# 数据保存在 experience_store 的 SQLite 数据库中，EXPERIENCE_FILE 仅作为旧版数据的导入来源。
 EXPERIENCE_FILE = "strategy_experience.json"
+EXPERIENCE_HALF_LIFE = 14 * 24 * 3600
+PRIOR_WEIGHT = 2
+MIN_SUCCESS_PROBABILITY = 0.05
+# 经验按 域名 和 路径模板 (如 example.com/video/{id}) 两级记录；
+# 上一级的后验作为下一级的先验，强度最多为 SCOPE_PRIOR_WEIGHT 次观测
+SCOPE_PRIOR_WEIGHT = 4
+TEMPLATE_MAX_DEPTH = 3
 experience_data = {}
+experience_store = None
+# 竞速线程和批量嗅探线程会同时记录结果，读取-衰减-写回须整体加锁
+_experience_lock = threading.Lock()
+
+
+def _new_stats(successes=0.0):
+    return {
+        "successes": float(successes),
+        "failures": 0.0,
+        "time_total": 0.0,
+        "time_count": 0.0,
+        "updated": time.time(),
+    }
+
+
+def _decayed(stats, now=None):
+    """返回按距上次更新的时间衰减后的统计副本。"""
+    now = now or time.time()
+    factor = 0.5 ** (max(0.0, now - stats.get("updated", now)) / EXPERIENCE_HALF_LIFE)
+    return {
+        "successes": stats.get("successes", 0.0) * factor,
+        "failures": stats.get("failures", 0.0) * factor,
+        "time_total": stats.get("time_total", 0.0) * factor,
+        "time_count": stats.get("time_count", 0.0) * factor,
+        "updated": now,
+    }
+
+
+def _convert_legacy(stats):
+    # 旧格式只记录成功次数: {域名: {策略: 次数}}
+    return _new_stats(stats) if isinstance(stats, (int, float)) else stats
 
 
 def load_experience_data():
-    global experience_data
-    if os.path.exists(EXPERIENCE_FILE):
-        try:
-            with open(EXPERIENCE_FILE, "r") as f:
-                experience_data = json.load(f)
-                logger.info("经验数据加载成功。")
-        except (json.JSONDecodeError, IOError) as e:
-            logger.warning(f"加载经验数据失败: {e}。")
-            experience_data = {}
-    else:
+    """打开经验数据库 (首次运行时导入旧版 JSON 文件)，并加载到内存。"""
+    global experience_data, experience_store
+    try:
+        experience_store = ExperienceStore()
+        experience_store.import_json(EXPERIENCE_FILE, convert=_convert_legacy)
+        experience_data = experience_store.load_all()
+        logger.info("经验数据加载成功。")
+    except Exception as e:
+        logger.warning(f"加载经验数据失败: {e}。")
+        experience_store = None
         experience_data = {}
 
 
 def save_experience_data():
+    """立即提交所有未写入的更新 (平时由后台线程批量提交)。"""
+    if experience_store is not None:
+        experience_store.flush()
+
+
+_NUMERIC_SEGMENT = re.compile(r"^\d+$")
+# 十六进制串须足够长且同时含数字和字母，避免 "deadbeef"、"facade" 这类普通单词被当作哈希
+_HASH_SEGMENT = re.compile(
+    r"^(?:(?=[^/]*\d)(?=[^/]*[a-f])[0-9a-f]{12,}"
+    r"|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12})$",
+    re.I,
+)
+_ID_SEGMENT = re.compile(r"^(?=[^/]*\d)(?=[^/]*[A-Za-z])[\w-]{6,}$")
+_FILENAME_SEGMENT = re.compile(r"^.+(\.[A-Za-z0-9]{1,5})$")
+
+
+def _generalize_segment(segment):
+    if _NUMERIC_SEGMENT.match(segment):
+        return "{n}"
+    if _HASH_SEGMENT.match(segment):
+        return "{h}"
+    if match := _FILENAME_SEGMENT.match(segment):
+        return "{f}" + match.group(1).lower()
+    if _ID_SEGMENT.match(segment):
+        return "{id}"
+    return segment.lower()
+
+
+@lru_cache(maxsize=4096)
+def generalize_url(url):
+    """
+    把 URL 归纳为 (域名, 路径模板)：数字段折叠为 {n}，哈希为 {h}，
+    字母数字混合的 ID 为 {id}，文件名只保留扩展名；超过 TEMPLATE_MAX_DEPTH 的部分记为 *。
+    """
+    url_info = urlparse(url)
+    domain = re.sub(r"^www\.", "", url_info.netloc.lower())
+    segments = [segment for segment in url_info.path.split("/") if segment]
+    template = [
+        _generalize_segment(segment) for segment in segments[:TEMPLATE_MAX_DEPTH]
+    ]
+    if len(segments) > TEMPLATE_MAX_DEPTH:
+        template.append("*")
+    return domain, f"{domain}/{'/'.join(template)}"
+
+
+def record_strategy_outcome(url, strategy, success, elapsed=None):
+    """
+    记录一次策略执行的结果和耗时 (秒)，同时计入域名和路径模板两级。
+    被取消的执行不应记录。
+    """
+    scopes = generalize_url(url)
+    with _experience_lock:
+        for scope in scopes:
+            strategies = experience_data.setdefault(scope, {})
+            stats = _decayed(strategies.get(strategy) or _new_stats())
+            stats["successes" if success else "failures"] += 1
+            if elapsed is not None:
+                stats["time_total"] += elapsed
+                stats["time_count"] += 1
+            strategies[strategy] = stats
+            if experience_store is not None:
+                experience_store.put(scope, strategy, stats)
+    logger.info(
+        f"经验数据已更新: {' 与 '.join(scopes)} / {strategy} "
+        f"({'成功' if success else '失败'}"
+        f"{f', {elapsed:.2f} 秒' if elapsed is not None else ''})"
+    )
+
+
+# --- 嗅探轨迹 (供 strategy_replay.py 离线回放) ---
+SNIFF_TRACE_ENABLED = True
+SNIFF_TRACE_FILE = "sniff_traces.jsonl"
+# 轨迹文件超过该大小时轮转为 SNIFF_TRACE_FILE + ".1" (只保留一个旧文件)
+SNIFF_TRACE_MAX_BYTES = 5 * 1024 * 1024
+_trace_lock = threading.Lock()
+
+
+def record_sniff_trace(url, attempts, mode):
+    """
+    追加一条嗅探轨迹：记录本次嗅探中每个策略的结果和耗时。
+    attempts 中的元素为 {"strategy", "success", "duration"}，被竞速取消的策略 success 为 None。
+    """
+    if not SNIFF_TRACE_ENABLED or not attempts:
+        return
+    line = json.dumps(
+        {"url": url, "timestamp": time.time(), "mode": mode, "attempts": attempts},
+        ensure_ascii=False,
+    )
     try:
-        with open(EXPERIENCE_FILE, "w") as f:
-            json.dump(experience_data, f, indent=2)
+        with _trace_lock:
+            if (
+                os.path.exists(SNIFF_TRACE_FILE)
+                and os.path.getsize(SNIFF_TRACE_FILE) >= SNIFF_TRACE_MAX_BYTES
+            ):
+                os.replace(SNIFF_TRACE_FILE, SNIFF_TRACE_FILE + ".1")
+            with open(SNIFF_TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
     except IOError as e:
-        logger.error(f"保存经验数据失败: {e}")
+        logger.warning(f"写入嗅探轨迹失败: {e}")
+
+
+PLAYLIST_URL_PATTERNS = (
+    re.compile(r"youtube\.com/(?:playlist\?|channel/|c/|user/|@)"),
+    re.compile(r"space\.bilibili\.com/\d+"),
+    re.compile(r"bilibili\.com/(?:medialist|list|favlist)/"),
+    re.compile(r"/playlists?(?:[/?#]|$)"),
+)
+
 
+def is_playlist_url(url: str) -> bool:
+    """播放列表/频道链接使用扁平化流式嗅探。"""
+    return any(pattern.search(url) for pattern in PLAYLIST_URL_PATTERNS)
 
-def update_experience_data(domain, successful_strategy):
-    domain = re.sub(r"^www\.", "", domain)
-    if domain not in experience_data:
-        experience_data[domain] = {}
-    current_weight = experience_data[domain].get(successful_strategy, 0)
-    experience_data[domain][successful_strategy] = current_weight + 1
-    logger.info(f"经验数据已更新: {{'{domain}': {experience_data[domain]}}}")
-    save_experience_data()
 
+def _posterior(scopes, strategy, base_score, now):
+    """
+    逐级合并 全局先验 -> 域名 -> 路径模板 的观测，返回
+    (成功率 Beta 分布参数 alpha/beta, 平均耗时, 域名级成功次数)。
+    """
+    success_rate = min(max(base_score / 100, 0.01), 0.99)
+    mean_time = STRATEGY_METADATA[strategy]["expected_time"]
+    weight = PRIOR_WEIGHT
+    alpha, beta = success_rate * weight, (1 - success_rate) * weight
+    domain_successes = 0.0
+    for level, scope in enumerate(scopes):
+        stats = experience_data.get(scope, {}).get(strategy)
+        if not stats:
+            continue
+        stats = _decayed(stats, now)
+        if level == 0:
+            domain_successes = stats["successes"]
+        alpha = success_rate * weight + stats["successes"]
+        beta = (1 - success_rate) * weight + stats["failures"]
+        mean_time = (mean_time * weight + stats["time_total"]) / (
+            weight + stats["time_count"]
+        )
+        success_rate = alpha / (alpha + beta)
+        weight = min(alpha + beta, SCOPE_PRIOR_WEIGHT)
+    return alpha, beta, mean_time, domain_successes
 
-def select_best_strategy(url: str) -> list[str]:
+
+def select_best_strategy(url: str, rng=None, sample=True) -> list[str]:
+    """
+    强规则优先；其余情况按 Thompson 采样的 期望耗时/成功率 (即期望成功耗时) 升序排列，
+    使排序既跟随实测表现，又保留少量探索。rng 可传入固定种子的 random.Random 以便复现。
+    sample=False 时用后验均值代替采样，排序是确定的 (供离线回放作为静态基线)。
+    """
     logger.info(f"为URL '{url}' 进行智能策略评估...")
+    rng = rng or random
     try:
         url_info = urlparse(url)
-        domain = re.sub(r"^www\.", "", url_info.netloc)
+        scopes = generalize_url(url)
+        domain = scopes[0]
         path = url_info.path
     except Exception as e:
         logger.error(f"URL解析失败: {e}")
         return []
 
     # 强规则匹配
+    if is_playlist_url(url):
+        return ["yt_dlp"]
     if "github.com" in domain and "/releases" in path:
         return ["github_api", "browser", "html_parser"]
     known_exts = (
@@ -91,7 +291,7 @@ def select_best_strategy(url: str) -> list[str]:
     if "bilibili.com" in domain and "/video/" in path:
         return ["yt_dlp"]
 
-    # 评分系统
+    # 基础得分作为成功率先验
     scores = {
         "yt_dlp": (
             70
@@ -103,22 +303,28 @@ def select_best_strategy(url: str) -> list[str]:
         "direct_link_checker": 25,
         "github_api": 10,
     }
-    final_scores = {}
+    now = time.time()
+    evaluated = []
     for strategy, base_score in scores.items():
-        experience_weight = 0
-        if domain in experience_data and strategy in experience_data[domain]:
-            experience_weight = min(experience_data[domain][strategy], 10) * 5
-        cost = STRATEGY_METADATA[strategy]["cost"]
-        cost_penalty = (11 - cost) / 10
-        final_scores[strategy] = base_score * cost_penalty + experience_weight
-
-    sorted_strategies = sorted(
-        final_scores.items(), key=lambda item: item[1], reverse=True
-    )
+        alpha, beta, mean_time, successes = _posterior(
+            scopes, strategy, base_score, now
+        )
+        # 准入门槛沿用原有的静态得分 (实测成功可以让昂贵策略入选)
+        cost_penalty = (11 - STRATEGY_METADATA[strategy]["cost"]) / 10
+        admission = base_score * cost_penalty + min(successes, 10) * 5
+        if admission <= 20 or alpha / (alpha + beta) < MIN_SUCCESS_PROBABILITY:
+            continue
+        sampled_success = max(
+            rng.betavariate(alpha, beta) if sample else alpha / (alpha + beta), 1e-3
+        )
+        evaluated.append((strategy, mean_time / sampled_success, sampled_success))
+
+    evaluated.sort(key=lambda item: item[1])
     logger.info(
-        f"策略评估结果 (策略, 最终得分): {[(s, f'{v:.2f}') for s, v in sorted_strategies]}"
+        "策略评估结果 (策略, 期望成功耗时, 采样成功率): "
+        f"{[(s, f'{t:.2f}s', f'{p:.2f}') for s, t, p in evaluated]}"
     )
-    return [strategy for strategy, score in sorted_strategies if score > 20]
+    return [strategy for strategy, _, _ in evaluated]
 
 
 load_experience_data()
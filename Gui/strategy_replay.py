@@ -0,0 +1,264 @@
+# strategy_replay.py
+"""
+离线回放嗅探轨迹 (sniff_traces.jsonl)，比较不同策略排序方式的效果：
+
+    python strategy_replay.py sniff_traces.jsonl --policy static bandit race --seed 1
+    python strategy_replay.py --check
+
+static 按先验得分的均值确定性排序 (不学习、不采样)；bandit 在回放过程中逐条学习；
+race 使用与 bandit 相同的排序，并按 worker 的对冲竞速规则并行尝试。
+--check 用随附的小型轨迹 (REPLAY_SAMPLE_FILE) 回放并做自检。
+完全离线运行，不访问网络，也不读写真实的经验数据库。
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+import experience_store
+
+# 回放只使用内存中的经验数据，必须在导入 strategy_profiler 之前设置
+experience_store.EXPERIENCE_DB_FILE = ":memory:"
+
+import strategy_profiler  # noqa: E402
+
+POLICIES = ("static", "bandit", "race")
+REPLAY_SAMPLE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "replay_sample_traces.jsonl"
+)
+CHECK_SEEDS = range(5)
+
+
+def load_traces(path):
+    traces = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                trace = json.loads(line)
+            except ValueError as e:
+                print(f"跳过第 {line_number} 行 (JSON 无效): {e}", file=sys.stderr)
+                continue
+            if trace.get("url") and trace.get("attempts"):
+                traces.append(trace)
+    return traces
+
+
+def build_outcome_table(traces):
+    """
+    汇总每个 URL 上各策略最近一次的完整结果 {url: {策略: (成功, 耗时)}}。
+    被竞速取消的尝试没有结果，不计入。
+    """
+    table = {}
+    for trace in traces:
+        outcomes = table.setdefault(trace["url"], {})
+        for attempt in trace["attempts"]:
+            if attempt.get("success") is not None:
+                outcomes[attempt["strategy"]] = (
+                    bool(attempt["success"]),
+                    float(attempt["duration"]),
+                )
+    return table
+
+
+def _outcome(outcomes, strategy, stats):
+    # 轨迹中没有的策略按失败处理，耗时取先验，结果偏保守
+    if strategy in outcomes:
+        return outcomes[strategy]
+    stats["unobserved"] += 1
+    return False, strategy_profiler.STRATEGY_METADATA[strategy]["expected_time"]
+
+
+def simulate_sequential(order, outcomes, stats):
+    """按顺序逐个尝试，返回 (首个结果耗时或 None, 各策略结果列表)。"""
+    elapsed = 0.0
+    observed = []
+    for strategy in order:
+        success, duration = _outcome(outcomes, strategy, stats)
+        observed.append((strategy, success, duration))
+        elapsed += duration
+        if strategy in strategy_profiler.EXPENSIVE_STRATEGIES:
+            stats["browser_launches"] += 1
+        if success:
+            return elapsed, observed
+        stats["wasted_seconds"] += duration
+    return None, observed
+
+
+def simulate_race(order, outcomes, stats):
+    """按 worker 的对冲竞速规则做离散事件模拟，返回值同 simulate_sequential。"""
+    cheap = [s for s in order if s not in strategy_profiler.EXPENSIVE_STRATEGIES]
+    expensive = [s for s in order if s in strategy_profiler.EXPENSIVE_STRATEGIES]
+    running = {}
+    observed = []
+    now = last_launch = 0.0
+    slot_freed = False
+
+    def launch(strategy):
+        success, duration = _outcome(outcomes, strategy, stats)
+        running[strategy] = (now, now + duration, success)
+        if strategy in strategy_profiler.EXPENSIVE_STRATEGIES:
+            stats["browser_launches"] += 1
+
+    while True:
+        running_cheap = sum(
+            1 for s in running if s not in strategy_profiler.EXPENSIVE_STRATEGIES
+        )
+        if (
+            cheap
+            and running_cheap < strategy_profiler.RACE_TOP_K
+            and (
+                running_cheap == 0
+                or slot_freed
+                or now >= last_launch + strategy_profiler.RACE_HEDGE_DELAY
+            )
+        ):
+            launch(cheap.pop(0))
+            last_launch, slot_freed = now, False
+            continue
+        if expensive and (
+            (not cheap and running_cheap == 0)
+            or now >= strategy_profiler.RACE_BROWSER_STALL_TIMEOUT
+        ):
+            launch(expensive.pop(0))
+            continue
+        if not running:
+            return None, observed
+        events = [end for _, end, _ in running.values()]
+        if cheap and running_cheap < strategy_profiler.RACE_TOP_K:
+            events.append(last_launch + strategy_profiler.RACE_HEDGE_DELAY)
+        if expensive and now < strategy_profiler.RACE_BROWSER_STALL_TIMEOUT:
+            events.append(strategy_profiler.RACE_BROWSER_STALL_TIMEOUT)
+        now = min(events)
+        for strategy, (start, end, success) in sorted(
+            running.items(), key=lambda item: item[1][1]
+        ):
+            if end > now:
+                continue
+            del running[strategy]
+            observed.append((strategy, success, end - start))
+            if success:
+                # 其余仍在运行的策略被取消，已消耗的时间计为浪费
+                stats["wasted_seconds"] += sum(now - s for s, _, _ in running.values())
+                return now, observed
+            stats["wasted_seconds"] += end - start
+            slot_freed = True
+
+
+def replay(traces, policy, seed=0):
+    """按轨迹顺序回放所有嗅探，返回该策略的汇总指标。"""
+    strategy_profiler.experience_store = None
+    strategy_profiler.experience_data = {}
+    rng = random.Random(seed)
+    outcome_table = build_outcome_table(traces)
+    stats = {
+        "sniffs": 0,
+        "resolved": 0,
+        "time_to_first_result": 0.0,
+        "wasted_seconds": 0.0,
+        "browser_launches": 0,
+        "unobserved": 0,
+    }
+    for trace in traces:
+        url = trace["url"]
+        outcomes = outcome_table[url]
+        order = strategy_profiler.select_best_strategy(
+            url, rng=rng, sample=policy != "static"
+        )
+        if policy == "race" and len(order) > 1:
+            first_result, observed = simulate_race(order, outcomes, stats)
+        else:
+            first_result, observed = simulate_sequential(order, outcomes, stats)
+        stats["sniffs"] += 1
+        if first_result is not None:
+            stats["resolved"] += 1
+            stats["time_to_first_result"] += first_result
+        if policy != "static":
+            for strategy, success, duration in observed:
+                strategy_profiler.record_strategy_outcome(
+                    url, strategy, success, duration
+                )
+    return stats
+
+
+def recorded_browser_launches(traces):
+    return sum(
+        1
+        for trace in traces
+        for attempt in trace["attempts"]
+        if attempt["strategy"] in strategy_profiler.EXPENSIVE_STRATEGIES
+    )
+
+
+def check(traces):
+    """
+    自检：static 基线不受随机种子影响；各策略的指标自洽。返回发现的问题列表。
+    """
+    problems = []
+    static_runs = {json.dumps(replay(traces, "static", seed)) for seed in CHECK_SEEDS}
+    if len(static_runs) != 1:
+        problems.append(f"static 基线随种子变化: {len(static_runs)} 种结果")
+    for policy in POLICIES:
+        for seed in CHECK_SEEDS:
+            stats = replay(traces, policy, seed)
+            if stats["sniffs"] != len(traces):
+                problems.append(f"{policy}/seed={seed}: 回放条数 {stats['sniffs']}")
+            if not 0 <= stats["resolved"] <= stats["sniffs"]:
+                problems.append(f"{policy}/seed={seed}: 成功数 {stats['resolved']}")
+            if stats["time_to_first_result"] < 0 or stats["wasted_seconds"] < 0:
+                problems.append(f"{policy}/seed={seed}: 耗时为负")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线回放嗅探轨迹，评估策略排序方式。")
+    parser.add_argument(
+        "traces",
+        nargs="?",
+        default=REPLAY_SAMPLE_FILE,
+        help="sniff_traces.jsonl 文件路径 (默认使用随附的示例轨迹)",
+    )
+    parser.add_argument("--policy", nargs="+", choices=POLICIES, default=list(POLICIES))
+    parser.add_argument("--seed", type=int, default=0, help="Thompson 采样的随机种子")
+    parser.add_argument(
+        "--check", action="store_true", help="回放轨迹并自检，发现问题时返回非零"
+    )
+    args = parser.parse_args(argv)
+
+    traces = load_traces(args.traces)
+    if not traces:
+        print("没有可回放的轨迹。", file=sys.stderr)
+        return 1
+    if args.check:
+        problems = check(traces)
+        for problem in problems:
+            print(f"自检失败: {problem}", file=sys.stderr)
+        if problems:
+            return 1
+        print(f"自检通过: {len(traces)} 条轨迹，{len(CHECK_SEEDS)} 个随机种子")
+    recorded = recorded_browser_launches(traces)
+    print(f"轨迹: {len(traces)} 条，实际启动浏览器 {recorded} 次")
+    print(
+        f"{'策略':<8}{'成功率':>8}{'平均首个结果(秒)':>18}"
+        f"{'浪费策略秒':>12}{'浏览器启动':>10}{'少启动':>8}{'未观测':>8}"
+    )
+    for policy in args.policy:
+        stats = replay(traces, policy, args.seed)
+        mean_time = (
+            stats["time_to_first_result"] / stats["resolved"]
+            if stats["resolved"]
+            else float("nan")
+        )
+        print(
+            f"{policy:<8}{stats['resolved'] / stats['sniffs']:>8.1%}{mean_time:>18.2f}"
+            f"{stats['wasted_seconds']:>12.1f}{stats['browser_launches']:>10}"
+            f"{recorded - stats['browser_launches']:>8}{stats['unobserved']:>8}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
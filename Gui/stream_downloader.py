@@ -0,0 +1,312 @@
+# stream_downloader.py
+
+import logging
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+from backend_scraper import (
+    CREATION_FLAGS,
+    get_executable_path,
+    get_requests_session,
+    release_requests_session,
+)
+from progress import ProgressTracker
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # 仅加密的 HLS 流需要
+    Cipher = None
+
+logger = logging.getLogger(__name__)
+
+HLS_MAX_WORKERS = 8
+HLS_SEGMENT_RETRIES = 3
+HLS_SEGMENT_TIMEOUT = (10, 60)
+HLS_ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def _parse_attributes(line):
+    return {
+        key: value.strip('"')
+        for key, value in HLS_ATTRIBUTE_PATTERN.findall(line.split(":", 1)[1])
+    }
+
+
+def parse_m3u8(text, base_url):
+    """
+    解析 HLS 播放列表。
+    主播放列表返回 variants (码率/分辨率/地址)，媒体播放列表返回 segments。
+    """
+    playlist = {
+        "variants": [],
+        "segments": [],
+        "init": None,
+        "ended": False,
+        "has_audio_group": False,
+    }
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith("#EXTM3U"):
+        raise ValueError("不是有效的 m3u8 播放列表。")
+    sequence = 0
+    key = None
+    byterange_offset = 0
+    pending_stream = None
+    pending_byterange = None
+    for line in lines[1:]:
+        if line.startswith("#EXT-X-STREAM-INF"):
+            pending_stream = _parse_attributes(line)
+        elif line.startswith("#EXT-X-MEDIA:") and "TYPE=AUDIO" in line:
+            playlist["has_audio_group"] = True
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE"):
+            sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-KEY"):
+            attributes = _parse_attributes(line)
+            method = attributes.get("METHOD", "NONE")
+            key = (
+                None
+                if method == "NONE"
+                else {
+                    "method": method,
+                    "uri": urljoin(base_url, attributes.get("URI", "")),
+                    "iv": attributes.get("IV"),
+                }
+            )
+        elif line.startswith("#EXT-X-MAP"):
+            attributes = _parse_attributes(line)
+            playlist["init"] = urljoin(base_url, attributes.get("URI", ""))
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            length, _, offset = line.split(":", 1)[1].partition("@")
+            start = int(offset) if offset else byterange_offset
+            pending_byterange = (start, start + int(length) - 1)
+            byterange_offset = start + int(length)
+        elif line.startswith("#EXT-X-ENDLIST"):
+            playlist["ended"] = True
+        elif line.startswith("#"):
+            continue
+        elif pending_stream is not None:
+            resolution = pending_stream.get("RESOLUTION", "")
+            height = int(resolution.split("x")[1]) if "x" in resolution else 0
+            playlist["variants"].append(
+                {
+                    "url": urljoin(base_url, line),
+                    "bandwidth": int(pending_stream.get("BANDWIDTH", 0)),
+                    "height": height,
+                    "audio": pending_stream.get("AUDIO"),
+                }
+            )
+            pending_stream = None
+        else:
+            playlist["segments"].append(
+                {
+                    "url": urljoin(base_url, line),
+                    "sequence": sequence,
+                    "key": key,
+                    "byterange": pending_byterange,
+                }
+            )
+            sequence += 1
+            pending_byterange = None
+    return playlist
+
+
+def select_variant(variants, max_height=None):
+    """选择不超过 max_height 的最高码率变体，没有符合条件的则取最低码率。"""
+    candidates = [
+        v
+        for v in variants
+        if not max_height or not v["height"] or v["height"] <= max_height
+    ]
+    if not candidates:
+        return min(variants, key=lambda v: v["bandwidth"])
+    return max(candidates, key=lambda v: (v["bandwidth"], v["height"]))
+
+
+def _fetch_bytes(session, url, byterange=None, stop_callback=None):
+    headers = {"Range": f"bytes={byterange[0]}-{byterange[1]}"} if byterange else None
+    last_error = None
+    for attempt in range(HLS_SEGMENT_RETRIES):
+        if stop_callback and stop_callback():
+            raise InterruptedError("下载被用户取消")
+        try:
+            response = session.get(url, headers=headers, timeout=HLS_SEGMENT_TIMEOUT)
+            response.raise_for_status()
+            return response.content
+        except requests.RequestException as e:
+            last_error = e
+            time.sleep(min(2**attempt, 8))
+    raise IOError(f"分片下载失败 ({HLS_SEGMENT_RETRIES} 次重试): {url} - {last_error}")
+
+
+def _decrypt_segment(data, segment, key_bytes):
+    if Cipher is None:
+        raise RuntimeError("该流使用 AES-128 加密，需要安装 cryptography 库。")
+    if segment["key"]["iv"]:
+        iv = bytes.fromhex(segment["key"]["iv"][2:].zfill(32))
+    else:
+        iv = segment["sequence"].to_bytes(16, "big")
+    decryptor = Cipher(algorithms.AES(key_bytes), modes.CBC(iv)).decryptor()
+    plain = decryptor.update(data) + decryptor.finalize()
+    # 去除 PKCS7 填充
+    padding = plain[-1] if plain else 0
+    if 0 < padding <= 16 and plain.endswith(bytes([padding]) * padding):
+        plain = plain[:-padding]
+    return plain
+
+
+def _remux_with_ffmpeg(source_path):
+    """
+    转封装为 mp4，先写入临时文件，成功后再替换目标并删除源文件。
+    失败时抛出 OSError/RuntimeError，源文件保持不变。
+    """
+    base = os.path.splitext(source_path)[0]
+    target_path = base + ".mp4"
+    temp_path = base + ".remux.mp4"
+    ffmpeg = get_executable_path("ffmpeg.exe")
+    if not os.path.exists(ffmpeg):
+        ffmpeg = "ffmpeg"
+    command = [ffmpeg, "-y", "-loglevel", "error", "-i", source_path]
+    command += ["-c", "copy", temp_path]
+    try:
+        completed = subprocess.run(
+            command, capture_output=True, creationflags=CREATION_FLAGS
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.decode("utf-8", errors="ignore").strip()
+            raise RuntimeError(f"ffmpeg 转封装失败: {error}")
+        os.replace(temp_path, target_path)
+    except BaseException:
+        _remove_partial(temp_path)
+        raise
+    os.remove(source_path)
+    return target_path
+
+
+def download_hls(
+    url,
+    download_path,
+    progress_callback=None,
+    stop_callback=None,
+    proxy_dict=None,
+    max_workers=HLS_MAX_WORKERS,
+    max_height=None,
+    remux=False,
+    throttle=None,
+    warning_callback=None,
+):
+    """
+    进程内 HLS 下载：解析主/媒体播放列表，并发下载分片 (含重试和 AES-128 解密)，
+    按顺序写入单个文件。仅在 remux=True 时调用 ffmpeg 转封装为 mp4；
+    转封装失败不影响下载结果，通过 warning_callback 报告并保留原文件。
+    """
+    logger.info(f"HLS 下载: {url}")
+    session = get_requests_session(proxy_dict)
+    filepath = download_path
+    try:
+        response = session.get(url, timeout=HLS_SEGMENT_TIMEOUT)
+        response.raise_for_status()
+        playlist = parse_m3u8(response.text, response.url)
+        if playlist["variants"]:
+            variant = select_variant(playlist["variants"], max_height)
+            logger.info(
+                f"HLS 选择变体: {variant['height'] or '?'}p, {variant['bandwidth']} bps"
+            )
+            if playlist["has_audio_group"] and variant["audio"]:
+                logger.warning("该变体的音轨为独立播放列表，当前仅下载视频轨。")
+            response = session.get(variant["url"], timeout=HLS_SEGMENT_TIMEOUT)
+            response.raise_for_status()
+            playlist = parse_m3u8(response.text, response.url)
+        segments = playlist["segments"]
+        if not segments:
+            return False, "播放列表中没有可下载的分片。"
+        if not playlist["ended"]:
+            return False, "暂不支持直播 (未结束的) HLS 流。"
+        if playlist["init"] and filepath.lower().endswith(".ts"):
+            # fMP4 分片与初始化段拼接后即为 mp4 文件
+            filepath = os.path.splitext(filepath)[0] + ".mp4"
+
+        keys = {}
+        for segment in segments:
+            if segment["key"] and segment["key"]["uri"] not in keys:
+                if segment["key"]["method"] != "AES-128":
+                    return False, f"不支持的加密方式: {segment['key']['method']}"
+                keys[segment["key"]["uri"]] = _fetch_bytes(
+                    session, segment["key"]["uri"], stop_callback=stop_callback
+                )
+
+        def fetch_segment(segment):
+            data = _fetch_bytes(
+                session, segment["url"], segment["byterange"], stop_callback
+            )
+            if throttle:
+                throttle.consume(len(data), stop_callback)
+            if segment["key"]:
+                data = _decrypt_segment(data, segment, keys[segment["key"]["uri"]])
+            return data
+
+        total = len(segments)
+        window = max_workers * 2
+        tracker = ProgressTracker(progress_callback) if progress_callback else None
+        with open(filepath, "wb") as f, ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hls-segment"
+        ) as executor:
+            if playlist["init"]:
+                f.write(_fetch_bytes(session, playlist["init"], None, stop_callback))
+            futures = {}
+            next_to_submit = 0
+            try:
+                for index in range(total):
+                    # 保持有限的预取窗口并按顺序写出，内存占用与列表长度无关
+                    while next_to_submit < min(total, index + window):
+                        futures[next_to_submit] = executor.submit(
+                            fetch_segment, segments[next_to_submit]
+                        )
+                        next_to_submit += 1
+                    if stop_callback and stop_callback():
+                        raise InterruptedError("下载被用户取消")
+                    data = futures.pop(index).result()
+                    f.write(data)
+                    if tracker:
+                        # 分片大小未知，按已下载分片的平均大小估算总字节数
+                        done = tracker.done + len(data)
+                        tracker.update(done, done * total // (index + 1))
+            except BaseException:
+                for future in futures.values():
+                    future.cancel()
+                raise
+        if tracker:
+            tracker.finish()
+    except InterruptedError:
+        _remove_partial(filepath)
+        return False, "下载被用户取消"
+    except requests.RequestException as e:
+        _remove_partial(filepath)
+        return False, f"网络请求失败: {e}"
+    except Exception as e:
+        _remove_partial(filepath)
+        return False, f"HLS 下载失败: {e}"
+    finally:
+        release_requests_session(session)
+    # fMP4 流已经是 mp4，无需转封装；转封装失败时保留已下载的文件
+    if remux and not filepath.lower().endswith(".mp4"):
+        try:
+            filepath = _remux_with_ffmpeg(filepath)
+        except (OSError, RuntimeError) as e:
+            warning = f"HLS 转封装失败，已保留原文件 {os.path.basename(filepath)}: {e}"
+            logger.warning(warning)
+            if warning_callback:
+                warning_callback(warning)
+    return True, f"HLS 下载完成: {os.path.basename(filepath)}"
+
+
+def _remove_partial(filepath):
+    if os.path.exists(filepath):
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
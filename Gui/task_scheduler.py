@@ -0,0 +1,232 @@
+# task_scheduler.py
+
+import heapq
+import itertools
+import logging
+from urllib.parse import urlparse
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+
+from worker import Worker
+from worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT = 3
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_SNIFF_CONCURRENT = 4
+
+
+class ScheduledJob:
+    """调度器中的一个任务：保存启动 Worker 所需的参数及其运行状态。"""
+
+    def __init__(self, job_id, task_type, kwargs, priority, host, label):
+        self.job_id = job_id
+        self.task_type = task_type
+        self.kwargs = kwargs
+        self.priority = priority
+        self.host = host
+        self.label = label
+        # queued / running / finished / failed / cancelled / interrupted
+        self.status = "queued"
+        self.progress = 0
+        self.telemetry = None
+        self.success = False
+        self.message = ""
+        self.worker = None
+
+
+class TaskScheduler(QObject):
+    """
+    带优先级的任务调度器。
+    同时运行的任务数受全局上限和单站点上限约束，每个任务在独立的 Worker 中执行，
+    并单独报告进度和结果；支持取消单个任务或整个队列。
+    Worker 由共享的 WorkerPool 中的常驻线程执行，调度任务时不再创建线程。
+    """
+
+    job_queued = pyqtSignal(object)
+    job_started = pyqtSignal(object)
+    # (任务, 进度快照)，快照结构见 progress.make_snapshot
+    job_progress = pyqtSignal(object, object)
+    job_finished = pyqtSignal(object)
+    # (日志, 任务标签, 级别)；在 Worker 所在线程发出，接收方需线程安全
+    log = pyqtSignal(str, str, int)
+    idle = pyqtSignal()
+
+    def __init__(
+        self,
+        task_type="download",
+        max_concurrent=DEFAULT_MAX_CONCURRENT,
+        per_host_limit=DEFAULT_PER_HOST_LIMIT,
+        pool=None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.task_type = task_type
+        self.pool = pool or WorkerPool(self)
+        self.max_concurrent = max_concurrent
+        self.per_host_limit = per_host_limit
+        self._queue = []
+        self._sequence = itertools.count()
+        self._job_ids = itertools.count(1)
+        self.jobs = {}
+        self.running = {}
+
+    def submit(self, kwargs, priority=0, url=None, label=None):
+        """加入一个任务并尝试立即调度，返回 ScheduledJob。priority 越大越先执行。"""
+        url = url or kwargs.get("direct_url") or kwargs.get("url") or ""
+        job = ScheduledJob(
+            next(self._job_ids),
+            self.task_type,
+            kwargs,
+            priority,
+            urlparse(url).netloc.lower(),
+            label or url,
+        )
+        self.jobs[job.job_id] = job
+        heapq.heappush(self._queue, (-priority, next(self._sequence), job))
+        self.job_queued.emit(job)
+        self._schedule()
+        return job
+
+    def set_priority(self, job_id, priority):
+        job = self.jobs.get(job_id)
+        if not job or job.status != "queued":
+            return
+        job.priority = priority
+        self._queue = [(-j.priority, sequence, j) for _, sequence, j in self._queue]
+        heapq.heapify(self._queue)
+        self._schedule()
+
+    def set_rate_limit(self, job_id, rate):
+        """
+        修改单个任务的限速。排队中的任务在启动时生效；运行中的进程内下载立即生效，
+        返回 False 表示该任务 (如 yt-dlp) 要到下次启动才会按新限速运行。
+        """
+        job = self.jobs.get(job_id)
+        if not job:
+            return False
+        job.kwargs["rate_limit"] = rate
+        if job.status == "running" and job.worker is not None:
+            return job.worker.set_rate_limit(rate)
+        return True
+
+    def set_limits(self, max_concurrent=None, per_host_limit=None):
+        if max_concurrent:
+            self.max_concurrent = max_concurrent
+        if per_host_limit:
+            self.per_host_limit = per_host_limit
+        self._schedule()
+
+    def pending_count(self):
+        return sum(1 for _, _, job in self._queue if job.status == "queued")
+
+    def has_active_jobs(self):
+        return bool(self.running) or self.pending_count() > 0
+
+    def _host_count(self, host):
+        return sum(1 for job in self.running.values() if job.host == host)
+
+    def _schedule(self):
+        """按优先级启动可运行的任务；因单站点上限暂时无法运行的任务保留在队列中。"""
+        deferred = []
+        while self._queue and len(self.running) < self.max_concurrent:
+            entry = heapq.heappop(self._queue)
+            job = entry[2]
+            if job.status != "queued":
+                continue
+            if job.host and self._host_count(job.host) >= self.per_host_limit:
+                deferred.append(entry)
+                continue
+            self._start(job)
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+        if not self.running and not self.pending_count():
+            self.idle.emit()
+
+    def _start(self, job):
+        job.status = "running"
+        job.worker = Worker(job.task_type, **job.kwargs)
+        self.running[job.job_id] = job
+
+        # 日志直接在工作线程转发，不为每行日志向 GUI 线程投递事件
+        job.worker.log.connect(
+            lambda message, level, job=job: self.log.emit(message, job.label, level),
+            Qt.ConnectionType.DirectConnection,
+        )
+        job.worker.download_progress.connect(
+            lambda snapshot, job=job: self._on_progress(job, snapshot)
+        )
+        job.worker.download_finished.connect(
+            lambda success, message, job=job: self._on_result(job, success, message)
+        )
+        job.worker.sniff_finished.connect(
+            lambda record, url, job=job: self._on_result(
+                job, not record.error, record.error or ""
+            )
+        )
+        # 让调用方在任务开始前连接 Worker 的其他信号 (如 sniff_finished)
+        self.job_started.emit(job)
+        # 结束处理最后连接，保证调用方的结果槽先于 job_finished 执行
+        job.worker.download_finished.connect(lambda *_, job=job: self._on_done(job))
+        job.worker.sniff_finished.connect(lambda *_, job=job: self._on_done(job))
+        self.pool.start(job.worker)
+
+    def _on_progress(self, job, snapshot):
+        if snapshot["percent"] is not None:
+            job.progress = int(snapshot["percent"])
+        job.telemetry = snapshot
+        self.job_progress.emit(job, snapshot)
+
+    def _on_result(self, job, success, message):
+        job.success, job.message = success, message
+
+    def _on_done(self, job):
+        if self.running.pop(job.job_id, None) is None:
+            return
+        self.jobs.pop(job.job_id, None)
+        self.pool.release(job.worker)
+        job.worker = None
+        if job.status == "running":
+            job.status = "finished" if job.success else "failed"
+        self.job_finished.emit(job)
+        self._schedule()
+
+    def _cancel_queued(self, job):
+        job.status = "cancelled"
+        job.message = "任务在启动前被用户取消。"
+        self.jobs.pop(job.job_id, None)
+        self.job_finished.emit(job)
+
+    def cancel(self, job_id):
+        """取消单个任务：排队中的直接移除，运行中的通知 Worker 停止。"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        if job.status == "queued":
+            self._cancel_queued(job)
+            self._schedule()
+        elif job.status == "running" and job.worker is not None:
+            job.status = "cancelled"
+            job.worker.stop()
+
+    def interrupt_all(self):
+        """
+        程序退出时调用：排队中的任务保持原状 (由调用方持久化后下次恢复)，
+        运行中的任务标记为 interrupted 并停止，保留已下载的部分。
+        """
+        self._queue = []
+        for job in self.running.values():
+            job.status = "interrupted"
+            if job.worker is not None:
+                job.worker.interrupt()
+
+    def cancel_all(self):
+        queued = [job for _, _, job in self._queue if job.status == "queued"]
+        self._queue = []
+        for job in queued:
+            self._cancel_queued(job)
+        for job_id in list(self.running):
+            self.cancel(job_id)
+        if not self.running:
+            self.idle.emit()
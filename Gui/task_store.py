@@ -0,0 +1,161 @@
+# task_store.py
+
+import json
+import logging
+import sqlite3
+import time
+
+from sniff_records import SniffRecord
+
+logger = logging.getLogger(__name__)
+
+TASK_DB_FILE = "sniffer_tasks.db"
+# 下载任务在队列中的状态；结束 (成功、失败、取消) 的任务直接从表中删除
+PENDING_STATUSES = ("queued", "running", "interrupted")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    url TEXT PRIMARY KEY,
+    parent_url TEXT,
+    record TEXT,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kwargs TEXT NOT NULL,
+    label TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    updated REAL NOT NULL
+);
+"""
+
+
+class TaskStore:
+    """
+    任务列表、嗅探结果和下载队列的本地持久化 (SQLite, WAL)。
+    每次变更立即写入，程序关闭或崩溃后重新启动即可恢复，无需重新嗅探。
+    所有方法只在 GUI 线程调用；写入失败只记录日志，不影响界面操作。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or TASK_DB_FILE
+        self._conn = sqlite3.connect(self.path, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _write(self, sql, params=()):
+        try:
+            with self._conn:
+                return self._conn.execute(sql, params)
+        except sqlite3.Error as e:
+            logger.error(f"保存任务数据失败: {e}")
+            return None
+
+    # --- 任务列表与嗅探结果 ---
+
+    def add_task(self, url, parent_url=None):
+        """登记一个尚无结果的任务 (已存在时保留原有结果)。"""
+        self._write(
+            "INSERT OR IGNORE INTO tasks (url, parent_url, record, updated) "
+            "VALUES (?, ?, NULL, ?)",
+            (url, parent_url, time.time()),
+        )
+
+    def save_task(self, url, record, parent_url=None):
+        """保存任务的嗅探结果；已存在的任务保留原有位置和父任务。"""
+        self._write(
+            "INSERT INTO tasks (url, parent_url, record, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET record = excluded.record, "
+            "updated = excluded.updated",
+            (
+                url,
+                parent_url,
+                json.dumps(record.to_dict(), ensure_ascii=False),
+                time.time(),
+            ),
+        )
+
+    def remove_tasks(self, urls):
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM tasks WHERE url = ? OR parent_url = ?",
+                    [(url, url) for url in urls],
+                )
+        except sqlite3.Error as e:
+            logger.error(f"删除任务数据失败: {e}")
+
+    def load_tasks(self):
+        """按加入顺序返回 [(url, 父任务URL, SniffRecord 或 None)]。"""
+        tasks = []
+        rows = self._conn.execute(
+            "SELECT url, parent_url, record FROM tasks ORDER BY rowid"
+        ).fetchall()
+        for url, parent_url, payload in rows:
+            record = None
+            if payload:
+                try:
+                    record = SniffRecord.from_dict(json.loads(payload))
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"任务 {url} 的嗅探结果已损坏，将重新嗅探: {e}")
+            tasks.append((url, parent_url, record))
+        return tasks
+
+    # --- 下载队列 ---
+
+    def add_download(self, kwargs, label, priority=0):
+        """登记一个下载任务，返回其队列 ID。"""
+        cursor = self._write(
+            "INSERT INTO downloads (kwargs, label, priority, status, updated) "
+            "VALUES (?, ?, ?, 'queued', ?)",
+            (json.dumps(kwargs, ensure_ascii=False), label, priority, time.time()),
+        )
+        return cursor.lastrowid if cursor else None
+
+    def update_download(self, queue_id, status=None, priority=None, kwargs=None):
+        fields = {"status": status, "priority": priority}
+        if kwargs is not None:
+            fields["kwargs"] = json.dumps(kwargs, ensure_ascii=False)
+        fields = {name: value for name, value in fields.items() if value is not None}
+        if queue_id is None or not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._write(
+            f"UPDATE downloads SET {assignments}, updated = ? WHERE id = ?",
+            (*fields.values(), time.time(), queue_id),
+        )
+
+    def remove_download(self, queue_id):
+        if queue_id is not None:
+            self._write("DELETE FROM downloads WHERE id = ?", (queue_id,))
+
+    def mark_interrupted(self):
+        """程序退出时调用：正在运行的下载标记为中断，下次启动时续传。"""
+        self._write(
+            "UPDATE downloads SET status = 'interrupted', updated = ? "
+            "WHERE status = 'running'",
+            (time.time(),),
+        )
+
+    def load_downloads(self):
+        """返回未完成的下载 [(队列ID, kwargs, 标签, 优先级, 状态)]，按加入顺序排列。"""
+        downloads = []
+        rows = self._conn.execute(
+            "SELECT id, kwargs, label, priority, status FROM downloads "
+            f"WHERE status IN ({', '.join('?' * len(PENDING_STATUSES))}) ORDER BY id",
+            PENDING_STATUSES,
+        ).fetchall()
+        for queue_id, payload, label, priority, status in rows:
+            try:
+                kwargs = json.loads(payload)
+            except ValueError as e:
+                logger.warning(f"下载任务 {queue_id} 的参数已损坏，已丢弃: {e}")
+                self.remove_download(queue_id)
+                continue
+            downloads.append((queue_id, kwargs, label, priority, status))
+        return downloads
+
+    def close(self):
+        self._conn.close()
@@ -1,44 +1,117 @@
 # worker.py
 
 import logging
-import re
 import os
 import json
-from urllib.parse import urlparse
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from PyQt6.QtCore import QObject, pyqtSignal, QProcess
 import undetected_chromedriver as uc
 
 import backend_scraper
+import bandwidth
+import download_index
+import integrity
+import metadata_cache
+import progress
+import sniff_cache
+import stream_downloader
+import ytdlp_helper
+from sniff_records import SniffRecord
 from strategy_profiler import (
     select_best_strategy,
     AVAILABLE_STRATEGIES,
-    update_experience_data,
+    record_strategy_outcome,
+    record_sniff_trace,
+    is_playlist_url,
+    RACE_MODE_ENABLED,
+    RACE_TOP_K,
+    RACE_HEDGE_DELAY,
+    RACE_BROWSER_STALL_TIMEOUT,
+    EXPENSIVE_STRATEGIES,
 )
 
 logger = logging.getLogger(__name__)
 
 
+def _yt_dlp_line_level(line):
+    """yt-dlp 的输出行自带 "ERROR:" / "WARNING:" 前缀，按前缀确定日志级别。"""
+    line = line.lstrip()
+    if line.startswith("ERROR:"):
+        return logging.ERROR
+    if line.startswith("WARNING:"):
+        return logging.WARNING
+    return logging.INFO
+
+
+class _StrategyAttempt:
+    """
+    竞速模式下单个策略的执行上下文，作为 context_worker 传给后端引擎，
+    可以单独取消 (同时关闭它注册的浏览器驱动)。
+    """
+
+    def __init__(self, worker, strategy_name):
+        self.worker = worker
+        self.strategy_name = strategy_name
+        self.cancelled = False
+        self.stoppable_resource = None
+        self.started = time.monotonic()
+
+    @property
+    def _is_running(self):
+        return self.worker._is_running and not self.cancelled
+
+    def register_stoppable_resource(self, resource):
+        self.stoppable_resource = resource
+
+    def unregister_stoppable_resource(self):
+        self.stoppable_resource = None
+
+    def cancel(self):
+        self.cancelled = True
+        resource = self.stoppable_resource
+        if resource is not None:
+            try:
+                resource.quit()
+            except Exception as e:
+                logger.error(f"关闭策略 '{self.strategy_name}' 的资源时出错: {e}")
+
+
 class Worker(QObject):
     """
     后台工作线程 (v3.1 - 最终异步版)
     所有外部进程调用均使用 QProcess，保证完全可中断。
     """
 
-    sniff_finished = pyqtSignal(dict, str)
+    sniff_finished = pyqtSignal(object, str)
+    # 过期的缓存结果：先显示，重新嗅探完成后再由 sniff_finished 更新
+    sniff_cached = pyqtSignal(object, str)
+    sniff_entry = pyqtSignal(dict, str)
     download_finished = pyqtSignal(bool, str)
-    download_progress = pyqtSignal(int)
-    log = pyqtSignal(str)
+    # 进度快照 (见 progress.make_snapshot)，已按固定频率合并
+    download_progress = pyqtSignal(object)
+    # (日志, 级别)；级别由发出方明确给出，日志控制台据此筛选
+    log = pyqtSignal(str, int)
 
     def __init__(self, task_type, **kwargs):
         super().__init__()
         self.task_type = task_type
         self.kwargs = kwargs
         self.process = None
+        self.progress_tracker = None
+        self.throttle = None
+        self.bandwidth_reservation = None
+        self.keep_partial = False
         self._is_running = True
         self.stoppable_resource = None
         self.process_output_buffer = ""
         self.original_url = ""
         self.strategy_queue = []
+        self.race_attempts = {}
+        self.strategy_started_at = 0
+        self.stale_record = None
+        self.trace_attempts = []
+        self.trace_mode = "sequential"
 
     def register_stoppable_resource(self, resource):
         self.stoppable_resource = resource
@@ -47,8 +120,7 @@ class Worker(QObject):
         self.stoppable_resource = None
 
     def run(self):
-        if not self._is_running:
-            return
+        # 在启动前被取消的任务也要走到各自的取消分支，发出结束信号，调度器才能回收线程
         if self.task_type == "sniff":
             self._run_intelligent_sniff()
         elif self.task_type == "download":
@@ -56,78 +128,398 @@ class Worker(QObject):
 
     def _run_intelligent_sniff(self):
         self.original_url = self.kwargs.get("url")
-        self.log.emit(f"后台：启动智能策略嗅探 -> {self.original_url}")
+        if not self._is_running:
+            self._emit_sniff_finished({"error": "任务在启动前被取消。"})
+            return
+        self.log.emit(f"后台：启动智能策略嗅探 -> {self.original_url}", logging.INFO)
+
+        if self.kwargs.get("force"):
+            self.log.emit("强制重新嗅探，跳过结果缓存。", logging.INFO)
+        elif not is_playlist_url(self.original_url):
+            record, fresh = sniff_cache.lookup(self.original_url)
+            if record and fresh:
+                self.log.emit(
+                    f"<font color='green'>命中嗅探缓存 ({record.engine})，无需重新嗅探。</font>",
+                    logging.INFO,
+                )
+                self.sniff_finished.emit(record, self.original_url)
+                return
+            if record:
+                self.log.emit(
+                    "嗅探缓存已过期：先显示缓存结果，同时重新嗅探...", logging.INFO
+                )
+                self.stale_record = record
+                self.sniff_cached.emit(record, self.original_url)
 
         self.strategy_queue = select_best_strategy(self.original_url)
         if not self.strategy_queue:
             if self._is_running:
-                self.sniff_finished.emit(
-                    {"error": "没有适用的嗅探策略。"}, self.original_url
-                )
+                self._emit_sniff_finished({"error": "没有适用的嗅探策略。"})
             return
 
-        self._process_next_strategy()
+        if RACE_MODE_ENABLED and self._can_race(self.strategy_queue):
+            self.trace_mode = "race"
+            self._run_strategy_race(self.strategy_queue)
+        else:
+            self._process_next_strategy()
+
+    def _can_race(self, strategies):
+        # yt-dlp 只有经常驻辅助进程时才能在线程中运行和取消；QProcess 回退路径仍按顺序执行
+        if len(strategies) < 2 or is_playlist_url(self.original_url):
+            return False
+        return "yt_dlp" not in strategies or ytdlp_helper.is_available()
+
+    def _run_strategy_blocking(self, strategy_name, context):
+        """在竞速线程中执行单个策略，返回结果字典。"""
+        if strategy_name == "yt_dlp":
+            if cached := self._load_cached_yt_dlp_metadata(self.original_url):
+                return cached
+            try:
+                data = ytdlp_helper.extract_info(
+                    self.original_url,
+                    {"noplaylist": True},
+                    cancel_check=lambda: not context._is_running,
+                )
+            except InterruptedError:
+                return {"error": "操作被用户取消。"}
+            except Exception as e:
+                return {"error": f"yt-dlp 解析失败: {e}"}
+            data["engine"] = "yt-dlp"
+            return data
+        backend_function_name = AVAILABLE_STRATEGIES.get(strategy_name)
+        if not backend_function_name:
+            return {"error": f"配置错误：策略 '{strategy_name}' 没有对应的后端函数。"}
+        backend_function = getattr(backend_scraper, backend_function_name)
+        return backend_function(self.original_url, context_worker=context)
+
+    def _run_strategy_race(self, strategies):
+        """
+        对冲竞速：廉价策略按对冲延迟依次加入 (最多同时 RACE_TOP_K 个)，
+        首个成功结果胜出，其余策略立即取消。
+        """
+        cheap = [s for s in strategies if s not in EXPENSIVE_STRATEGIES]
+        expensive = [s for s in strategies if s in EXPENSIVE_STRATEGIES]
+        executor = ThreadPoolExecutor(
+            max_workers=RACE_TOP_K + len(expensive), thread_name_prefix="strategy-race"
+        )
+        race_start = time.monotonic()
+        last_launch = race_start
+        slot_freed = False
+        winner = None
+
+        def launch(strategy_name):
+            attempt = _StrategyAttempt(self, strategy_name)
+            future = executor.submit(
+                self._run_strategy_blocking, strategy_name, attempt
+            )
+            self.race_attempts[future] = attempt
+            self.log.emit(
+                f"<b>策略竞速: 启动 '{strategy_name}' 引擎...</b>", logging.INFO
+            )
+
+        try:
+            while self._is_running:
+                now = time.monotonic()
+                running_cheap = sum(
+                    1
+                    for attempt in self.race_attempts.values()
+                    if attempt.strategy_name not in EXPENSIVE_STRATEGIES
+                )
+                if (
+                    cheap
+                    and running_cheap < RACE_TOP_K
+                    and (
+                        running_cheap == 0
+                        or slot_freed
+                        or now - last_launch >= RACE_HEDGE_DELAY
+                    )
+                ):
+                    launch(cheap.pop(0))
+                    last_launch, slot_freed = now, False
+                    continue
+                if expensive and (
+                    (not cheap and running_cheap == 0)
+                    or now - race_start >= RACE_BROWSER_STALL_TIMEOUT
+                ):
+                    if running_cheap:
+                        self.log.emit(
+                            "廉价策略停滞，启动昂贵策略参与竞速。", logging.INFO
+                        )
+                    launch(expensive.pop(0))
+                    continue
+                if not self.race_attempts:
+                    break
+                done, _ = wait(
+                    list(self.race_attempts), timeout=0.2, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    attempt = self.race_attempts.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"error": f"执行后端函数时发生意外错误: {e}"}
+                    if result and not result.get("error"):
+                        winner = (result, attempt.strategy_name, attempt.started)
+                        break
+                    error_msg = (
+                        result.get("error", "未知错误") if result else "未知错误"
+                    )
+                    self.log.emit(
+                        f"策略 '{attempt.strategy_name}' 失败: {error_msg}",
+                        logging.INFO,
+                    )
+                    self._record_outcome(
+                        attempt.strategy_name, False, time.monotonic() - attempt.started
+                    )
+                    slot_freed = True
+                if winner:
+                    break
+        finally:
+            for attempt in self.race_attempts.values():
+                self.log.emit(
+                    f"取消落后的策略 '{attempt.strategy_name}'。", logging.INFO
+                )
+                attempt.cancel()
+                self.trace_attempts.append(
+                    {
+                        "strategy": attempt.strategy_name,
+                        "success": None,
+                        "duration": round(time.monotonic() - attempt.started, 3),
+                    }
+                )
+            self.race_attempts = {}
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if winner:
+            self.log.emit(
+                f"策略竞速耗时 {time.monotonic() - race_start:.2f} 秒，由 '{winner[1]}' 胜出。",
+                logging.INFO,
+            )
+            if winner[0].get("metadata_key"):
+                self.log.emit(
+                    "<font color='green'>命中 yt-dlp 元数据缓存，跳过重复解析。</font>",
+                    logging.INFO,
+                )
+                self._emit_sniff_finished(winner[0])
+            else:
+                self._handle_sniff_result(winner[0], winner[1], started_at=winner[2])
+        else:
+            self.strategy_queue = []
+            self._process_next_strategy()
 
     def _process_next_strategy(self):
         if not self._is_running:
-            self.sniff_finished.emit({"error": "操作被用户取消。"}, self.original_url)
+            self._emit_sniff_finished({"error": "操作被用户取消。"})
             return
 
         if not self.strategy_queue:
-            self.sniff_finished.emit(
-                {"error": "所有推荐的嗅探策略均已尝试。"}, self.original_url
-            )
+            self._emit_sniff_finished({"error": "所有推荐的嗅探策略均已尝试。"})
             return
 
         strategy_name = self.strategy_queue.pop(0)
-        self.log.emit(f"<b>策略执行: 尝试使用 '{strategy_name}' 引擎...</b>")
+        self.strategy_started_at = time.monotonic()
+        self.log.emit(
+            f"<b>策略执行: 尝试使用 '{strategy_name}' 引擎...</b>", logging.INFO
+        )
 
-        if strategy_name == "yt_dlp":
-            self._run_yt_dlp_sniff_qprocess(self.original_url)
+        if strategy_name == "yt_dlp" and is_playlist_url(self.original_url):
+            if ytdlp_helper.is_available():
+                self._run_yt_dlp_playlist_sniff_inprocess(self.original_url)
+            else:
+                self._run_yt_dlp_sniff_qprocess(self.original_url, playlist=True)
+        elif strategy_name == "yt_dlp":
+            if cached := self._load_cached_yt_dlp_metadata(self.original_url):
+                self.log.emit(
+                    "<font color='green'>命中 yt-dlp 元数据缓存，跳过重复解析。</font>",
+                    logging.INFO,
+                )
+                self._emit_sniff_finished(cached)
+            elif ytdlp_helper.is_available():
+                self._run_yt_dlp_sniff_inprocess(self.original_url)
+            else:
+                self._run_yt_dlp_sniff_qprocess(self.original_url)
         else:
             backend_function_name = AVAILABLE_STRATEGIES.get(strategy_name)
             if not backend_function_name:
                 self.log.emit(
-                    f"<font color='red'>配置错误：策略 '{strategy_name}' 没有对应的后端函数。</font>"
+                    f"<font color='red'>配置错误：策略 '{strategy_name}' 没有对应的后端函数。</font>",
+                    logging.ERROR,
                 )
                 self._process_next_strategy()
                 return
             try:
-                backend_function = getattr(backend_scraper, backend_function_name)
-                result = backend_function(self.original_url, context_worker=self)
+                result = self._run_strategy_blocking(strategy_name, self)
                 self._handle_sniff_result(result, strategy_name)
             except Exception as e:
                 self._handle_sniff_result(
                     {"error": f"执行后端函数时发生意外错误: {e}"}, strategy_name
                 )
 
-    def _handle_sniff_result(self, result, strategy_name):
+    def _emit_sniff_finished(self, result):
+        # 在工作线程中完成精简，界面线程只接收 SniffRecord
+        record = SniffRecord.from_result(result, self.original_url)
+        if record.error and self.stale_record is not None:
+            self.log.emit("重新嗅探失败，保留缓存中的结果。", logging.WARNING)
+            record = self.stale_record
+        elif record.error:
+            if self._is_running:
+                # 单个策略失败只是回退，全部策略都失败才记为错误
+                self.log.emit(
+                    f"<font color='red'>嗅探失败: {record.error}</font>", logging.ERROR
+                )
+        else:
+            sniff_cache.store(record)
+        if self.trace_attempts and self._is_running:
+            record_sniff_trace(self.original_url, self.trace_attempts, self.trace_mode)
+            self.trace_attempts = []
+        self.sniff_finished.emit(record, self.original_url)
+
+    def _load_cached_yt_dlp_metadata(self, url):
+        key = metadata_cache.resolve_key(url)
+        if not key and ytdlp_helper.is_available():
+            try:
+                if resolved := ytdlp_helper.resolve_video_id(
+                    url, cancel_check=lambda: not self._is_running
+                ):
+                    key = metadata_cache.make_cache_key(*resolved)
+            except Exception as e:
+                logger.debug(f"解析视频ID失败: {e}")
+        info = metadata_cache.load_by_key(key) if key else None
+        if info:
+            info["engine"] = "yt-dlp"
+            info["metadata_key"] = key
+        return info
+
+    def _record_outcome(self, strategy_name, success, elapsed):
+        # 用户取消导致的失败不代表策略本身的表现
+        if not success and not self._is_running:
+            return
+        self.trace_attempts.append(
+            {
+                "strategy": strategy_name,
+                "success": success,
+                "duration": round(elapsed, 3),
+            }
+        )
+        try:
+            record_strategy_outcome(self.original_url, strategy_name, success, elapsed)
+        except Exception as e:
+            logger.warning(f"更新经验数据失败: {e}")
+
+    def _handle_sniff_result(self, result, strategy_name, started_at=None):
+        elapsed = time.monotonic() - (started_at or self.strategy_started_at)
         if result and not result.get("error"):
+            if result.get("engine") == "yt-dlp":
+                result["metadata_key"] = metadata_cache.store(self.original_url, result)
             self.log.emit(
-                f"<font color='green'>策略 '{strategy_name}' 成功找到资源！</font>"
+                f"<font color='green'>策略 '{strategy_name}' 成功找到资源！</font>",
+                logging.INFO,
             )
-            try:
-                update_experience_data(
-                    urlparse(self.original_url).netloc, strategy_name
+            if block_stats := result.get("block_stats"):
+                self.log.emit(
+                    f"浏览器拦截统计: 拦截 {block_stats['blocked_requests']} 个请求，"
+                    f"实际传输 {block_stats['transferred_bytes'] / 1024:.0f} KB，"
+                    f"等待 {block_stats['waited']:.1f} 秒 (估算: 少传输约 "
+                    f"{block_stats['estimated_blocked_bytes'] / 1024:.0f} KB，"
+                    f"比固定等待快约 {block_stats['estimated_time_saved']:.1f} 秒)",
+                    logging.INFO,
                 )
-            except Exception as e:
-                logger.warning(f"更新经验数据失败: {e}")
-            self.sniff_finished.emit(result, self.original_url)
+            self._record_outcome(strategy_name, True, elapsed)
+            self._emit_sniff_finished(result)
         else:
             error_msg = result.get("error", "未知错误") if result else "未知错误"
-            self.log.emit(f"策略 '{strategy_name}' 失败: {error_msg}")
+            self.log.emit(f"策略 '{strategy_name}' 失败: {error_msg}", logging.INFO)
+            self._record_outcome(strategy_name, False, elapsed)
             self._process_next_strategy()
 
-    def _run_yt_dlp_sniff_qprocess(self, url):
+    def _run_yt_dlp_sniff_inprocess(self, url):
+        try:
+            data = ytdlp_helper.extract_info(
+                url, {"noplaylist": True}, cancel_check=lambda: not self._is_running
+            )
+            data["engine"] = "yt-dlp"
+            result = data
+        except ytdlp_helper.HelperUnavailableError as e:
+            self.log.emit(
+                f"yt-dlp 辅助进程不可用 ({e})，回退到子进程模式。", logging.WARNING
+            )
+            self._run_yt_dlp_sniff_qprocess(url)
+            return
+        except InterruptedError:
+            result = {"error": "操作被用户取消。"}
+        except Exception as e:
+            result = {"error": f"yt-dlp 解析失败: {e}"}
+        self._handle_sniff_result(result, "yt_dlp")
+
+    def _run_yt_dlp_playlist_sniff_inprocess(self, url):
+        entry_count = 0
+        try:
+            for kind, payload in ytdlp_helper.iter_playlist(
+                url, cancel_check=lambda: not self._is_running
+            ):
+                if kind == "entry":
+                    entry_count += 1
+                    self.sniff_entry.emit(payload, url)
+                else:
+                    result = self._build_playlist_result(payload, entry_count)
+        except ytdlp_helper.HelperUnavailableError as e:
+            if entry_count:
+                result = {"error": f"yt-dlp 辅助进程中断: {e}"}
+            else:
+                self.log.emit(
+                    f"yt-dlp 辅助进程不可用 ({e})，回退到子进程模式。", logging.WARNING
+                )
+                self._run_yt_dlp_sniff_qprocess(url, playlist=True)
+                return
+        except InterruptedError:
+            result = {"error": "操作被用户取消。"}
+        except Exception as e:
+            result = {"error": f"yt-dlp 播放列表解析失败: {e}"}
+        self._handle_sniff_result(result, "yt_dlp")
+
+    def _build_playlist_result(self, summary, entry_count):
+        if not entry_count:
+            return {"error": "播放列表中没有任何条目。"}
+        return {
+            "engine": "yt-dlp-playlist",
+            "title": summary.get("title") or self.original_url,
+            "entry_count": entry_count,
+        }
+
+    def _run_yt_dlp_sniff_qprocess(self, url, playlist=False):
         yt_dlp_exe = backend_scraper.get_executable_path("yt-dlp.exe")
         if not os.path.exists(yt_dlp_exe):
             self._handle_sniff_result({"error": "yt-dlp.exe 未找到"}, "yt_dlp")
             return
 
-        command = [yt_dlp_exe, "--dump-json", "--no-warnings", url]
+        if playlist:
+            command = [yt_dlp_exe, "--flat-playlist", "--dump-json"]
+        else:
+            command = [yt_dlp_exe, "--dump-json", "--no-playlist"]
+        command += ["--no-warnings", url]
         self.process = QProcess()
         self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        # 只缓存未完成的一行，逐行解析，内存占用与输出长度无关
         self.process_output_buffer = ""
+        state = {"first_json": None, "entry_count": 0, "playlist_title": None}
+
+        def handle_line(line):
+            if not line.startswith("{"):
+                return
+            if not playlist and state["first_json"] is not None:
+                return
+            try:
+                data = json.loads(line)
+            except ValueError:
+                return
+            if playlist:
+                state["entry_count"] += 1
+                state["playlist_title"] = state["playlist_title"] or data.get(
+                    "playlist_title"
+                )
+                self.sniff_entry.emit(ytdlp_helper.compact_playlist_entry(data), url)
+            else:
+                state["first_json"] = data
 
         def handle_output():
             self.process_output_buffer += (
@@ -135,20 +527,26 @@ class Worker(QObject):
                 .data()
                 .decode("utf-8", errors="ignore")
             )
+            *lines, self.process_output_buffer = self.process_output_buffer.split("\n")
+            for line in lines:
+                handle_line(line.strip())
 
         def handle_finish(exit_code, exit_status):
             handle_output()
+            handle_line(self.process_output_buffer.strip())
+            self.process_output_buffer = ""
             result = {}
             if not self._is_running:
                 result = {"error": "操作被用户取消。"}
+            elif playlist and state["entry_count"]:
+                result = self._build_playlist_result(
+                    {"title": state["playlist_title"]}, state["entry_count"]
+                )
+            elif exit_code == 0 and state["first_json"] is not None:
+                result = state["first_json"]
+                result["engine"] = "yt-dlp"
             elif exit_code == 0:
-                try:
-                    json_line = self.process_output_buffer.strip().split("\n")[0]
-                    data = json.loads(json_line)
-                    data["engine"] = "yt-dlp"
-                    result = data
-                except Exception as e:
-                    result = {"error": f"解析yt-dlp输出失败: {e}"}
+                result = {"error": "解析yt-dlp输出失败: 未找到JSON结果"}
             else:
                 result = {"error": f"yt-dlp 执行失败 (代码: {exit_code})"}
             self.process = None
@@ -162,6 +560,8 @@ class Worker(QObject):
         resource_type = self.kwargs.get("resource_type")
         if resource_type == "yt-dlp":
             self._run_yt_dlp_download_qprocess()
+        elif resource_type == "hls":
+            self._run_hls_download()
         else:
             self._run_direct_download()
 
@@ -174,9 +574,20 @@ class Worker(QObject):
             self.kwargs.get("formats"),
             self.kwargs.get("download_path"),
         )
+        info_json_path = metadata_cache.materialize_info_json(url)
+        if info_json_path:
+            self.log.emit("使用缓存的 yt-dlp 元数据下载，跳过重复解析。", logging.INFO)
+        self.bandwidth_reservation = bandwidth.governor.reserve_external(
+            self.kwargs.get("rate_limit")
+        )
         command_list = backend_scraper.build_download_command(
-            url, formats, download_path
+            url,
+            formats,
+            download_path,
+            info_json_path=info_json_path,
+            rate_limit=self.bandwidth_reservation.rate,
         )
+        self.progress_tracker = progress.ProgressTracker(self.download_progress.emit)
         self.process = QProcess()
         self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
         self.process.readyReadStandardOutput.connect(self._on_yt_dlp_output)
@@ -189,24 +600,23 @@ class Worker(QObject):
         output = (
             self.process.readAllStandardOutput().data().decode("utf-8", errors="ignore")
         )
-        progress_pattern = re.compile(r"download-stream:(\s*\d+\.?\d*%)")
         for line in output.splitlines():
-            if line.strip():
-                self.log.emit(f"[yt-dlp] {line.strip()}")
-            if match := progress_pattern.search(line):
-                try:
-                    self.download_progress.emit(
-                        int(float(match.group(1).strip().replace("%", "")))
-                    )
-                except (ValueError, IndexError):
-                    pass
+            snapshot = progress.parse_yt_dlp_progress(line)
+            if snapshot:
+                # 进度行只更新进度显示，不写入日志
+                self.progress_tracker.report(snapshot)
+            elif line.strip():
+                self.log.emit(f"[yt-dlp] {line.strip()}", _yt_dlp_line_level(line))
 
     def _on_yt_dlp_finished(self, exit_code, exit_status):
         self._on_yt_dlp_output()
+        if self.bandwidth_reservation:
+            self.bandwidth_reservation.close()
+            self.bandwidth_reservation = None
         if not self._is_running:
             self.download_finished.emit(False, "操作被用户取消。")
         elif exit_code == 0:
-            self.download_progress.emit(100)
+            self.progress_tracker.finish()
             self.download_finished.emit(True, "下载成功完成。")
         else:
             status_msg = (
@@ -223,38 +633,128 @@ class Worker(QObject):
             return
         direct_url = self.kwargs.get("direct_url")
         download_path = self.kwargs.get("download_path")
+        if self._reuse_existing(direct_url, download_path):
+            return
         stop_callback = lambda: not self._is_running
-        success, msg = backend_scraper.download_direct_link(
-            direct_url,
-            download_path,
-            progress_callback=self.download_progress.emit,
-            stop_callback=stop_callback,
+        self.throttle = bandwidth.governor.open_job(self.kwargs.get("rate_limit"))
+        try:
+            success, msg = backend_scraper.download_direct_link(
+                direct_url,
+                download_path,
+                progress_callback=self.download_progress.emit,
+                stop_callback=stop_callback,
+                throttle=self.throttle,
+                resume=self.kwargs.get("resume", False),
+                expected_size=self.kwargs.get("size"),
+                expected_digest=self.kwargs.get("digest"),
+            )
+        finally:
+            self.throttle.close()
+            self.throttle = None
+        if self._is_running:
+            self.download_finished.emit(success, msg)
+        elif self.keep_partial:
+            self.download_finished.emit(False, "下载已中断，下次启动时续传。")
+        else:
+            backend_scraper.remove_partial_download(download_path)
+            self.download_finished.emit(False, "操作被用户取消。")
+
+    def _reuse_existing(self, url, download_path):
+        """
+        在后台线程查询下载索引 (先增量扫描下载目录)，确认本地已有相同内容时直接复用，不再传输。
+        只有两种情况视为相同：嗅探引擎提供的 SHA-256 与本地文件一致；或同一 URL 的本地文件大小与
+        嗅探到的大小一致、记录了 ETag，且条件请求确认远端未变化。仅 URL 相同不足以判断。
+        """
+        download_index.rescan(os.path.dirname(download_path) or ".")
+        sha256 = integrity.expected_sha256(self.kwargs.get("digest"))
+        size = self.kwargs.get("size")
+        existing = download_index.find(
+            url=url, size=size, sha256=sha256, hash_missing=True
         )
+        if not existing:
+            return False
+        if sha256:
+            reason = "摘要一致"
+        elif (
+            size is not None
+            and existing.etag
+            and backend_scraper.remote_unchanged(url, existing.etag)
+        ):
+            reason = "服务器确认内容未变化"
+        else:
+            return False
+        if not download_index.reuse(existing, download_path):
+            return False
+        self.log.emit(f"{reason}，复用已下载的文件: {existing.path}", logging.INFO)
+        self.download_finished.emit(True, f"{reason}，已复用本地文件。")
+        return True
+
+    def _run_hls_download(self):
+        if not self._is_running:
+            self.download_finished.emit(False, "任务在启动前被取消。")
+            return
+        self.throttle = bandwidth.governor.open_job(self.kwargs.get("rate_limit"))
+        try:
+            success, msg = stream_downloader.download_hls(
+                self.kwargs.get("direct_url"),
+                self.kwargs.get("download_path"),
+                progress_callback=self.download_progress.emit,
+                stop_callback=lambda: not self._is_running,
+                remux=self.kwargs.get("remux", False),
+                throttle=self.throttle,
+                warning_callback=lambda message: self.log.emit(
+                    f"<font color='orange'>{message}</font>", logging.WARNING
+                ),
+            )
+        finally:
+            self.throttle.close()
+            self.throttle = None
         if self._is_running:
             self.download_finished.emit(success, msg)
         else:
             self.download_finished.emit(False, "操作被用户取消。")
 
+    def set_rate_limit(self, rate):
+        """修改本任务的限速 (字节/秒，None 为不限)。可从其他线程调用，进程内下载立即生效。"""
+        self.kwargs["rate_limit"] = rate
+        throttle = self.throttle
+        if throttle:
+            throttle.set_rate(rate)
+            return True
+        return False
+
+    def interrupt(self):
+        """程序退出时停止任务，但保留未完成的文件以便下次启动时续传。"""
+        self.keep_partial = True
+        self.stop()
+
     def stop(self):
-        self.log.emit("后台：收到停止请求，正在执行...")
+        self.log.emit("后台：收到停止请求，正在执行...", logging.INFO)
         self._is_running = False
         if (
             isinstance(self.process, QProcess)
             and self.process.state() != QProcess.ProcessState.NotRunning
         ):
             try:
-                self.log.emit(f"正在终止 QProcess (PID: {self.process.processId()})...")
+                self.log.emit(
+                    f"正在终止 QProcess (PID: {self.process.processId()})...",
+                    logging.INFO,
+                )
                 self.process.kill()
             except Exception as e:
                 logger.error(f"终止 QProcess 时发生未知错误: {e}")
+        elif self.race_attempts:
+            self.log.emit("正在取消所有竞速中的策略...", logging.INFO)
+            for attempt in list(self.race_attempts.values()):
+                attempt.cancel()
         elif self.stoppable_resource:
             try:
                 if isinstance(self.stoppable_resource, uc.Chrome):
-                    self.log.emit("正在关闭浏览器驱动...")
+                    self.log.emit("正在关闭浏览器驱动...", logging.INFO)
                     self.stoppable_resource.quit()
             except Exception as e:
                 logger.error(f"停止嗅探资源时出错: {e}")
             finally:
                 self.unregister_stoppable_resource()
         else:
-            self.log.emit("没有活动的嗅探资源或下载子进程需要停止。")
+            self.log.emit("没有活动的嗅探资源或下载子进程需要停止。", logging.INFO)
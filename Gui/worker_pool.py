@@ -0,0 +1,102 @@
+# worker_pool.py
+
+import logging
+import time
+
+from PyQt6 import sip
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+logger = logging.getLogger(__name__)
+
+# 关闭时未能退出的池线程，保持引用直到进程结束
+_abandoned_threads = []
+
+
+class _Executor(QObject):
+    """常驻在池线程中，通过排队连接接收并执行 Worker。"""
+
+    @pyqtSlot(object)
+    def execute(self, worker):
+        try:
+            worker.run()
+        except Exception as e:
+            logger.error(f"Worker 执行时发生未捕获的异常: {e}")
+
+
+class _PoolThread(QObject):
+    dispatch = pyqtSignal(object)
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.thread = QThread()
+        self.thread.setObjectName(f"worker-pool-{index}")
+        self.executor = _Executor()
+        self.executor.moveToThread(self.thread)
+        # executor 位于池线程，dispatch 在主线程发出，自动成为排队连接
+        self.dispatch.connect(self.executor.execute)
+        self.worker = None
+        self.thread.start()
+
+
+class WorkerPool(QObject):
+    """
+    长期存活的工作线程池。
+    线程按需创建、任务结束后归还复用，每个任务不再创建和销毁 QThread。
+    Worker 对象本身就是任务句柄：携带该任务的信号，并通过 stop() 取消。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._threads = []
+
+    def _idle_thread(self):
+        for pool_thread in self._threads:
+            if pool_thread.worker is None:
+                return pool_thread
+        pool_thread = _PoolThread(len(self._threads), self)
+        self._threads.append(pool_thread)
+        logger.info(f"工作线程池扩容至 {len(self._threads)} 个线程。")
+        return pool_thread
+
+    def start(self, worker):
+        """把 Worker 移入一个空闲线程并在该线程中调用其 run()。"""
+        pool_thread = self._idle_thread()
+        pool_thread.worker = worker
+        worker.moveToThread(pool_thread.thread)
+        pool_thread.dispatch.emit(worker)
+
+    def release(self, worker):
+        """任务结束后归还线程；Worker 在其所在线程的事件循环中销毁。"""
+        for pool_thread in self._threads:
+            if pool_thread.worker is worker:
+                pool_thread.worker = None
+                break
+        worker.deleteLater()
+
+    def busy_count(self):
+        return sum(1 for pool_thread in self._threads if pool_thread.worker)
+
+    def shutdown(self, timeout_ms=5000):
+        """
+        退出所有池线程，全部在超时内结束时返回 True。
+        超时仍在运行的线程不强制终止 (可能正持有 GIL、数据库或日志队列的锁)，
+        只记录日志并保留引用，由进程退出时回收，避免 QThread 在运行中被销毁。
+        """
+        for pool_thread in self._threads:
+            pool_thread.thread.quit()
+        deadline = time.monotonic() + timeout_ms / 1000
+        stuck = []
+        for pool_thread in self._threads:
+            remaining_ms = max(int((deadline - time.monotonic()) * 1000), 0)
+            if not pool_thread.thread.wait(remaining_ms):
+                stuck.append(pool_thread)
+        for pool_thread in stuck:
+            logger.warning(
+                f"线程 {pool_thread.thread.objectName()} 未在超时内退出，"
+                "保留至进程退出。"
+            )
+            # 交给 C++ 持有，Python 回收包装对象时不会析构仍在运行的 QThread
+            sip.transferto(pool_thread.thread, None)
+        _abandoned_threads.extend(stuck)
+        self._threads = []
+        return not stuck
@@ -0,0 +1,260 @@
+# ytdlp_helper.py
+
+import importlib.util
+import logging
+import multiprocessing
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+YTDLP_HELPER_POOL_SIZE = 2
+YTDLP_HELPER_MAX_REQUESTS = 200
+YTDLP_EXTRACT_TIMEOUT = 90
+YTDLP_BASE_OPTIONS = {
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True,
+    "skip_download": True,
+}
+
+
+class HelperUnavailableError(Exception):
+    """辅助进程无法启动或意外退出，调用方应回退到 yt-dlp.exe 子进程。"""
+
+
+class ExtractionError(Exception):
+    """yt-dlp 本身解析失败 (不支持的网站、视频不存在等)。"""
+
+
+class _SilentLogger:
+    """错误信息已通过管道返回，辅助进程不再向控制台重复输出。"""
+
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+def _resolve_video_id(url, extractor_classes):
+    for ie in extractor_classes:
+        if ie.ie_key() != "Generic" and ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            return (ie.ie_key(), video_id) if video_id else None
+    return None
+
+
+def compact_playlist_entry(entry):
+    """只保留列表展示和按需展开所需的字段。"""
+    return {
+        "url": entry.get("url") or entry.get("webpage_url"),
+        "title": entry.get("title") or entry.get("id") or "",
+        "id": entry.get("id"),
+        "duration": entry.get("duration"),
+        "playlist_title": entry.get("playlist_title"),
+    }
+
+
+def _stream_playlist(ydl, conn, url):
+    """逐条发送扁平化的播放列表条目，不在辅助进程中累积整个列表。"""
+    result = ydl.extract_info(url, download=False, process=False)
+    while result.get("_type") in ("url", "url_transparent"):
+        result = ydl.extract_info(
+            result["url"], download=False, process=False, ie_key=result.get("ie_key")
+        )
+    if result.get("_type") != "playlist":
+        raise ValueError("该链接不是播放列表或频道。")
+    count = 0
+    for entry in result.get("entries") or []:
+        if entry:
+            conn.send(("entry", compact_playlist_entry(entry)))
+            count += 1
+    return {"title": result.get("title") or result.get("id"), "entry_count": count}
+
+
+def _helper_main(conn):
+    """辅助进程入口：常驻加载 yt-dlp，通过管道逐个处理解析请求。"""
+    import yt_dlp
+    from yt_dlp.extractor import gen_extractor_classes
+
+    extractor_classes = list(gen_extractor_classes())
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        op, url, options = request
+        try:
+            if op == "resolve":
+                conn.send(("ok", _resolve_video_id(url, extractor_classes)))
+                continue
+            ydl_options = {**YTDLP_BASE_OPTIONS, "logger": _SilentLogger(), **options}
+            if op == "playlist":
+                ydl_options["extract_flat"] = "in_playlist"
+            with yt_dlp.YoutubeDL(ydl_options) as ydl:
+                if op == "playlist":
+                    conn.send(("ok", _stream_playlist(ydl, conn, url)))
+                    continue
+                info = ydl.extract_info(url, download=False)
+                conn.send(("ok", ydl.sanitize_info(info)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _HelperProcess:
+    def __init__(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_helper_main, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.requests_served = 0
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def terminate(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+
+
+_idle_helpers = []
+_helper_count = 0
+_pool_condition = threading.Condition()
+
+
+def is_available():
+    return importlib.util.find_spec("yt_dlp") is not None
+
+
+def _acquire_helper(cancel_check=None):
+    global _helper_count
+    with _pool_condition:
+        while True:
+            while _idle_helpers:
+                helper = _idle_helpers.pop()
+                if helper.is_alive():
+                    return helper
+                _helper_count -= 1
+            if _helper_count < YTDLP_HELPER_POOL_SIZE:
+                _helper_count += 1
+                break
+            if cancel_check and cancel_check():
+                raise InterruptedError("yt-dlp extraction was cancelled.")
+            _pool_condition.wait(0.2)
+    try:
+        logger.info("启动 yt-dlp 常驻辅助进程...")
+        return _HelperProcess()
+    except Exception as e:
+        with _pool_condition:
+            _helper_count -= 1
+            _pool_condition.notify()
+        raise HelperUnavailableError(f"无法启动 yt-dlp 辅助进程: {e}")
+
+
+def _release_helper(helper, reusable):
+    global _helper_count
+    if reusable and helper.requests_served >= YTDLP_HELPER_MAX_REQUESTS:
+        # 定期回收，避免长时间运行的辅助进程内存持续增长
+        reusable = False
+    if not reusable:
+        helper.terminate()
+    with _pool_condition:
+        if reusable:
+            _idle_helpers.append(helper)
+        else:
+            _helper_count -= 1
+        _pool_condition.notify()
+
+
+def prestart():
+    """在后台预先启动一个辅助进程，使首次嗅探也无需等待 yt-dlp 加载。"""
+    if not is_available():
+        return
+
+    def warm_up():
+        try:
+            _release_helper(_acquire_helper(), True)
+        except Exception as e:
+            logger.warning(f"预启动 yt-dlp 辅助进程失败: {e}")
+
+    threading.Thread(target=warm_up, name="ytdlp-prestart", daemon=True).start()
+
+
+def _exchange(op, url, options, timeout, cancel_check):
+    """
+    发送一个请求并逐条产出辅助进程的回复，直到收到最终结果。
+    超时按两条消息之间的间隔计算；中途放弃的辅助进程会被终止。
+    """
+    helper = _acquire_helper(cancel_check)
+    reusable = False
+    try:
+        try:
+            helper.conn.send((op, url, options or {}))
+        except (OSError, ValueError) as e:
+            raise HelperUnavailableError(f"无法向 yt-dlp 辅助进程发送请求: {e}")
+        while True:
+            deadline = time.monotonic() + timeout
+            while not helper.conn.poll(0.2):
+                if cancel_check and cancel_check():
+                    raise InterruptedError("yt-dlp extraction was cancelled.")
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"yt-dlp 解析超时 ({timeout} 秒)")
+                if not helper.is_alive():
+                    raise HelperUnavailableError("yt-dlp 辅助进程意外退出。")
+            try:
+                status, payload = helper.conn.recv()
+            except (EOFError, OSError) as e:
+                raise HelperUnavailableError(f"yt-dlp 辅助进程通信失败: {e}")
+            if status != "entry":
+                helper.requests_served += 1
+                reusable = True
+                if status == "error":
+                    raise ExtractionError(payload)
+                yield status, payload
+                return
+            yield status, payload
+    finally:
+        _release_helper(helper, reusable)
+
+
+def _request(op, url, options, timeout, cancel_check):
+    result = None
+    for _, payload in _exchange(op, url, options, timeout, cancel_check):
+        result = payload
+    return result
+
+
+def extract_info(url, options=None, timeout=YTDLP_EXTRACT_TIMEOUT, cancel_check=None):
+    """
+    通过常驻辅助进程执行 yt-dlp 解析，返回与 --dump-json 相同结构的字典。
+    取消或超时会终止该辅助进程，下次请求时自动重建。
+    """
+    return _request("extract", url, options, timeout, cancel_check)
+
+
+def resolve_video_id(url, timeout=10, cancel_check=None):
+    """不发起网络请求，仅按提取器规则解析出 (提取器, 视频ID)，无法识别时返回 None。"""
+    return _request("resolve", url, None, timeout, cancel_check)
+
+
+def iter_playlist(url, timeout=YTDLP_EXTRACT_TIMEOUT, cancel_check=None):
+    """
+    扁平化解析播放列表/频道，逐条产出 ("entry", 条目)，最后产出 ("done", 概要)。
+    条目到达即产出，内存占用与列表长度无关。
+    """
+    for status, payload in _exchange("playlist", url, None, timeout, cancel_check):
+        yield ("entry" if status == "entry" else "done"), payload